@@ -0,0 +1,52 @@
+"""Measure the overhead of entering and exiting a :class:`bistiming.Stopwatch`.
+
+Usage::
+
+    python benchmarks/stopwatch_overhead.py
+"""
+
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import timeit
+
+from bistiming import Stopwatch
+
+
+def measure(stmt, setup="pass", number=200000, repeat=7, namespace=None):
+    timer = timeit.Timer(stmt, setup=setup, globals=namespace)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def main():
+    namespace = {"Stopwatch": Stopwatch}
+    baseline = measure("pass", namespace=namespace)
+    cases = [
+        ("with Stopwatch(verbose=False) (reused)", "with sw:\n    pass"),
+        ("Stopwatch(verbose=False) (construct)", "Stopwatch(verbose=False)"),
+        (
+            "with Stopwatch(verbose=False, sample_every=100) (reused)",
+            "with sampled_sw:\n    pass",
+        ),
+        (
+            "start() + pause() + split(verbose=False)",
+            "sw.start(); sw.pause(); sw.split(verbose=False)",
+        ),
+    ]
+    print("baseline loop overhead: {:.1f} ns".format(baseline))
+    for name, stmt in cases:
+        ns = measure(
+            stmt,
+            setup=(
+                "sw = Stopwatch(verbose=False)\n"
+                "sampled_sw = Stopwatch(verbose=False, sample_every=100)"
+            ),
+            namespace=namespace,
+        )
+        print("{}: {:.1f} ns".format(name, ns - baseline))
+    print(
+        "calibrated overhead inside the with-block: {} ns".format(Stopwatch.calibrate())
+    )
+
+
+if __name__ == "__main__":
+    main()
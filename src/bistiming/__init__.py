@@ -1,15 +1,44 @@
-__all__ = ["Stopwatch", "MultiStopwatch"]
-
-try:
-    # for Python >= 3.8
-    from importlib.metadata import version
-except ImportError:
-    # for Python < 3.8, the package importlib-metadata will be installed
-    from importlib_metadata import version
-
-__version__ = version("bistiming")
+__all__ = [
+    "Stopwatch",
+    "ThreadLocalStopwatch",
+    "TaskLocalStopwatch",
+    "MultiStopwatch",
+    "KeyedMultiStopwatch",
+    "StopwatchTree",
+    "Benchmark",
+    "timed",
+]
 
 from .stopwatch import Stopwatch  # noqa: F401
-from .multistopwatch import MultiStopwatch  # noqa: F401
+from .multistopwatch import KeyedMultiStopwatch, MultiStopwatch  # noqa: F401
 
 SimpleTimer = Stopwatch  # backward-compatible to < 0.2
+
+
+def __getattr__(name):
+    # resolve the version lazily because importlib.metadata is slow to import
+    if name == "__version__":
+        try:
+            # for Python >= 3.8
+            from importlib.metadata import version
+        except ImportError:
+            # for Python < 3.8, the package importlib-metadata will be installed
+            from importlib_metadata import version
+
+        global __version__
+        __version__ = version("bistiming")
+        return __version__
+    # the classes only needed by some features are imported lazily for a faster
+    # startup
+    if name in ("ThreadLocalStopwatch", "TaskLocalStopwatch"):
+        from . import local as module
+    elif name == "StopwatchTree":
+        from . import tree as module
+    elif name == "Benchmark":
+        from . import benchmark as module
+    elif name == "timed":
+        from . import instrument as module
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = globals()[name] = getattr(module, name)
+    return value
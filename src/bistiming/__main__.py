@@ -0,0 +1,9 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import sys
+
+from .cli import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
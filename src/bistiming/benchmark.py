@@ -0,0 +1,300 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import gc
+import itertools
+import math
+import random
+
+from .multistopwatch import _take_top_k, MultiStopwatch
+from .stopwatch import get_clock, Stopwatch
+from .utils import normal_ppf, ns_to_timedelta
+
+
+class Benchmark(MultiStopwatch):
+    """Compare the running time of multiple callables statistically.
+
+    Each candidate gets a :class:`Stopwatch` (named after the candidate) in this
+    :class:`MultiStopwatch`. Each split is the mean time per call of one round,
+    which calls the candidate `number` times in a loop. The rounds of different
+    candidates are interleaved (in a shuffled order per round), so slow drifts of
+    the machine (e.g., thermal throttling or other processes) affect all the
+    candidates evenly.
+
+    Parameters
+    ----------
+    candidates : Union[Dict[str, Callable], Iterable[Callable]]
+        The callables to compare, keyed by their names. If not a dictionary, the
+        qualified names of the callables are used.
+    args : tuple
+        The arguments passed to each candidate.
+    kwargs : Optional[dict]
+        The keyword arguments passed to each candidate.
+    repeat : int
+        The number of measured rounds of each candidate.
+    warmup : int
+        The number of rounds of each candidate to run and discard before measuring.
+    number : Optional[int]
+        The number of calls in each round. If `None`, it is determined for each
+        candidate so that a round takes at least `min_round_time` seconds.
+    min_round_time : float
+        The minimum time of a round in seconds when `number` is `None`.
+    disable_gc : bool
+        Whether to disable the garbage collector while running the rounds.
+    shuffle : bool
+        Whether to shuffle the order of the candidates in each round.
+    seed : Optional[int]
+        The random seed for shuffling.
+    clock : Union[str, Callable[[], int]]
+        The clock used to measure the time. See `clock` in :class:`Stopwatch`.
+
+    Attributes
+    ----------
+    numbers : List[int]
+        The number of calls in each round of each candidate.
+    """
+
+    def __init__(
+        self,
+        candidates,
+        args=(),
+        kwargs=None,
+        repeat=7,
+        warmup=1,
+        number=None,
+        min_round_time=0.2,
+        disable_gc=True,
+        shuffle=True,
+        seed=None,
+        clock="perf_counter",
+    ):
+        if isinstance(candidates, dict):
+            names = list(candidates)
+            functions = list(candidates.values())
+        else:
+            functions = list(candidates)
+            names = [getattr(func, "__qualname__", repr(func)) for func in functions]
+        if not functions:
+            raise ValueError("there should be at least one candidate")
+        super(Benchmark, self).__init__(
+            Stopwatch(verbose=False, clock=clock, name=name) for name in names
+        )
+        self.functions = functions
+        self.args = args
+        self.kwargs = {} if kwargs is None else kwargs
+        self.repeat = repeat
+        self.warmup = warmup
+        self.number = number
+        self.min_round_time = min_round_time
+        self.disable_gc = disable_gc
+        self.shuffle = shuffle
+        self.clock = get_clock(clock)
+        self.numbers = [number] * len(functions)
+        self._random = random.Random(seed)
+
+    def _run_round(self, func, number):
+        args = self.args
+        kwargs = self.kwargs
+        iterator = itertools.repeat(None, number)
+        start_time = self.clock()
+        for _ in iterator:
+            func(*args, **kwargs)
+        return self.clock() - start_time
+
+    def _autorange(self, func):
+        # the same strategy as timeit.Timer.autorange
+        min_round_time_ns = self.min_round_time * 1e9
+        i = 1
+        while True:
+            for j in (1, 2, 5):
+                number = i * j
+                if self._run_round(func, number) >= min_round_time_ns:
+                    return number
+            i *= 10
+
+    def run(self):
+        """Run the benchmark.
+
+        The previous results are cleared.
+
+        Returns
+        -------
+        self : :class:`Benchmark`
+        """
+        gc_enabled = gc.isenabled()
+        if self.disable_gc:
+            gc.disable()
+        try:
+            for stopwatch in self:
+                stopwatch.reset()
+            if self.number is None:
+                self.numbers = [self._autorange(func) for func in self.functions]
+            order = list(range(len(self.functions)))
+            for round_index in range(self.warmup + self.repeat):
+                if self.shuffle:
+                    self._random.shuffle(order)
+                for i in order:
+                    elapsed_time = self._run_round(self.functions[i], self.numbers[i])
+                    if round_index >= self.warmup:
+                        self[i].add_split(round(elapsed_time / self.numbers[i]))
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return self
+
+    def get_median(self):
+        """Get the median time per call of each candidate.
+
+        Returns
+        -------
+        median : List[Optional[datetime.timedelta]]
+        """
+        return self.get_quantile(0.5)
+
+    def get_iqr(self):
+        """Get the interquartile range of the time per call of each candidate.
+
+        Returns
+        -------
+        iqr : List[Optional[datetime.timedelta]]
+        """
+        iqr = []
+        for stopwatch in self:
+            splits = stopwatch.splits
+            if not splits.count:
+                iqr.append(None)
+                continue
+            # the quantiles are computed exactly because there is no sketch
+            iqr.append(ns_to_timedelta(splits.quantile(0.75) - splits.quantile(0.25)))
+        return iqr
+
+    def get_n_outliers(self):
+        """Get the number of outlier rounds of each candidate.
+
+        The outliers are the rounds outside ``[Q1 - 1.5 IQR, Q3 + 1.5 IQR]`` (Tukey's
+        fences). They are usually caused by interference, and they are reported
+        rather than removed because the median and the IQR are already robust to
+        them.
+
+        Returns
+        -------
+        n_outliers : List[int]
+        """
+        n_outliers = []
+        for stopwatch in self:
+            splits = stopwatch.splits
+            if not splits.count:
+                n_outliers.append(0)
+                continue
+            q1 = splits.quantile(0.25)
+            q3 = splits.quantile(0.75)
+            low = q1 - 1.5 * (q3 - q1)
+            high = q3 + 1.5 * (q3 - q1)
+            n_outliers.append(sum(1 for t in splits if t < low or t > high))
+        return n_outliers
+
+    def get_median_confidence_interval(self, confidence=0.95):
+        """Get the distribution-free confidence interval of the median of each one.
+
+        The interval is formed by the order statistics whose ranks are given by the
+        normal approximation of the binomial distribution.
+
+        Parameters
+        ----------
+        confidence : float
+            The confidence level.
+
+        Returns
+        -------
+        confidence_interval : List[Optional[Tuple[timedelta, timedelta]]]
+        """
+        z = normal_ppf((1 + confidence) / 2)
+        intervals = []
+        for stopwatch in self:
+            values = sorted(stopwatch.splits)
+            n = len(values)
+            if not n:
+                intervals.append(None)
+                continue
+            half_width = z * math.sqrt(n) / 2
+            lower = max(int(math.floor(n / 2 - half_width)), 0)
+            upper = min(int(math.ceil(n / 2 + half_width)), n - 1)
+            intervals.append(
+                (ns_to_timedelta(values[lower]), ns_to_timedelta(values[upper]))
+            )
+        return intervals
+
+    def get_speedup(self, baseline=0):
+        """Get the speedup of each candidate relative to the baseline candidate.
+
+        The speedup is the ratio of the median of the baseline to the median of the
+        candidate, so a value larger than 1 means faster than the baseline.
+
+        Parameters
+        ----------
+        baseline : Union[int, str]
+            The index or the name of the baseline candidate.
+
+        Returns
+        -------
+        speedup : List[Optional[float]]
+        """
+        if not isinstance(baseline, int):
+            baseline = self.get_names().index(baseline)
+        medians = [stopwatch.splits.quantile(0.5) for stopwatch in self]
+        baseline_median = medians[baseline]
+        return [
+            None if not median or baseline_median is None else baseline_median / median
+            for median in medians
+        ]
+
+    def get_statistics(self, quantiles=(), top_k=None, *, confidence=0.95, baseline=0):
+        """Get the benchmark statistics as a dictionary.
+
+        Parameters
+        ----------
+        quantiles : Iterable[float]
+            The quantiles of the time per call to add after `iqr`, e.g., ``(0.9,)``
+            adds the column `p90`. See :meth:`MultiStopwatch.get_statistics`.
+        top_k : Optional[int]
+            If not `None`, only include the `top_k` candidates with the largest
+            cumulative elapsed time (the slowest ones), sorted in descending order.
+        confidence : float
+            The confidence level of the confidence interval of the median.
+        baseline : Union[int, str]
+            The index or the name of the baseline candidate for the speedup.
+
+        Returns
+        -------
+        statistics : Dict[str, List]
+            The keys are `name`, `n_rounds`, `number` (calls per round), `median`,
+            `iqr`, `ci_low`, `ci_high` (the confidence interval of the median),
+            `n_outliers`, `mean`, `std` (of the time per call in each round) and
+            `speedup`.
+        """
+        intervals = self.get_median_confidence_interval(confidence)
+        statistics = {
+            "name": self.get_names(),
+            "n_rounds": self.get_n_splits(),
+            "number": list(self.numbers),
+            "median": self.get_median(),
+            "iqr": self.get_iqr(),
+        }
+        for q in quantiles:
+            statistics["p{:g}".format(q * 100)] = self.get_quantile(q)
+        statistics.update(
+            {
+                "ci_low": [None if ci is None else ci[0] for ci in intervals],
+                "ci_high": [None if ci is None else ci[1] for ci in intervals],
+                "n_outliers": self.get_n_outliers(),
+                "mean": self.get_mean_per_split(),
+                "std": self.get_std_per_split(),
+                "speedup": self.get_speedup(baseline),
+            }
+        )
+        if top_k is not None:
+            statistics = _take_top_k(
+                statistics,
+                [stopwatch.get_cumulative_elapsed_time_ns() for stopwatch in self],
+                top_k,
+            )
+        return statistics
@@ -0,0 +1,387 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import argparse
+import datetime
+import functools
+import importlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import traceback
+
+from .benchmark import Benchmark
+from .multistopwatch import MultiStopwatch
+from .stopwatch import Stopwatch
+
+
+def _import_longest_prefix(name):
+    # import the longest importable prefix of a dotted name
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        module_name = ".".join(parts[:i])
+        try:
+            return importlib.import_module(module_name), parts[i:]
+        except ImportError as e:
+            # only skip if the module itself is missing, not its dependencies
+            if e.name is None or not module_name.startswith(e.name):
+                raise
+    raise ImportError("cannot import any module from {!r}".format(name))
+
+
+def _instrument_namespace(namespace, multi_stopwatch, prefix, module_name, **kwargs):
+    # instrument the functions and the methods defined in a module or a class
+    for attr, value in list(vars(namespace).items()):
+        if attr.startswith("__"):
+            continue
+        if isinstance(value, type):
+            # only the classes defined in the module, not the imported ones
+            if not isinstance(namespace, type) and value.__module__ == module_name:
+                _instrument_namespace(
+                    value, multi_stopwatch, prefix + attr + ".", module_name, **kwargs
+                )
+            continue
+        func = value
+        if isinstance(value, (staticmethod, classmethod)):
+            func = value.__func__
+        if not inspect.isroutine(func) or func.__module__ != module_name:
+            continue
+        setattr(
+            namespace,
+            attr,
+            _instrument_value(value, multi_stopwatch, prefix + attr, **kwargs),
+        )
+
+
+def _instrument_value(value, multi_stopwatch, name, **kwargs):
+    # wrap a function, a staticmethod or a classmethod
+    if isinstance(value, (staticmethod, classmethod)):
+        return type(value)(
+            _instrument_value(value.__func__, multi_stopwatch, name, **kwargs)
+        )
+    return multi_stopwatch.instrument(value, name=name, **kwargs)
+
+
+def instrument_by_name(name, multi_stopwatch, **kwargs):
+    """Instrument a function, a class or a module by its dotted name.
+
+    Each function is replaced in its module or class by a wrapper timing each call
+    using a new :class:`~bistiming.Stopwatch` in `multi_stopwatch` (see
+    :meth:`~bistiming.MultiStopwatch.instrument`). All the functions and the
+    methods defined in a module or a class are instrumented, except the ones with
+    names starting with ``__``. Only the references looked up afterwards are
+    affected, e.g., ``from module import function`` executed before this keeps
+    the original function.
+
+    Parameters
+    ----------
+    name : str
+        The dotted name, e.g., ``"json.dumps"``, ``"package.module.Class.method"``
+        or ``"package.module"``.
+    multi_stopwatch : :class:`~bistiming.MultiStopwatch`
+    **kwargs
+        Other keyword arguments will be passed to initialize
+        :class:`~bistiming.Stopwatch`.
+    """
+    module, attrs = _import_longest_prefix(name)
+    if not attrs:
+        _instrument_namespace(
+            module, multi_stopwatch, module.__name__ + ".", module.__name__, **kwargs
+        )
+        return
+    parent = module
+    for attr in attrs[:-1]:
+        parent = getattr(parent, attr)
+    # the raw attribute, e.g., the staticmethod object instead of the function
+    value = vars(parent).get(attrs[-1]) if hasattr(parent, "__dict__") else None
+    if value is None:
+        value = getattr(parent, attrs[-1])
+    if isinstance(value, type):
+        _instrument_namespace(
+            value, multi_stopwatch, name + ".", value.__module__, **kwargs
+        )
+        return
+    if not callable(value) and not isinstance(value, (staticmethod, classmethod)):
+        raise TypeError("{!r} is not a function, a class or a module".format(name))
+    wrapped = _instrument_value(value, multi_stopwatch, name, **kwargs)
+    setattr(parent, attrs[-1], wrapped)
+
+
+def _to_json_value(value):
+    if isinstance(value, datetime.timedelta):
+        # in seconds
+        return value.total_seconds()
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def _write_json(path, data):
+    data = dict(data)
+    data["statistics"] = {
+        column: [_to_json_value(value) for value in values]
+        for column, values in data["statistics"].items()
+    }
+    text = json.dumps(data, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+
+def _run_command(command, show_output=False):
+    output = None if show_output else subprocess.DEVNULL
+    subprocess.run(command, shell=True, check=True, stdout=output, stderr=output)
+
+
+def _benchmark_commands(args):
+    candidates = {
+        command: functools.partial(_run_command, command, args.show_output)
+        for command in args.command
+    }
+    benchmark = Benchmark(
+        candidates,
+        repeat=args.runs,
+        warmup=args.warmup,
+        number=1,
+        disable_gc=False,
+    )
+    try:
+        benchmark.run()
+    except subprocess.CalledProcessError as e:
+        print(
+            "command failed with exit code {}: {}".format(e.returncode, e.cmd),
+            file=sys.stderr,
+        )
+        return 1
+    print(benchmark.format_statistics(tablefmt=args.tablefmt))
+    if args.json is not None:
+        _write_json(
+            args.json,
+            {"commands": args.command, "statistics": benchmark.get_statistics()},
+        )
+    return 0
+
+
+def _profile_program(args, parser):
+    import runpy
+
+    if args.module is not None:
+        target = args.module
+    elif args.target is not None:
+        target = args.target
+    else:
+        parser.error("a script, a module (-m) or a command (-c) is required")
+    program_args = args.args
+    multi_stopwatch = MultiStopwatch()
+    for name in args.instrument:
+        instrument_by_name(name, multi_stopwatch)
+
+    old_argv = sys.argv[:]
+    old_path = sys.path[:]
+    sys.argv[:] = [target] + program_args
+    # like python, the exit code is 1 if the program raises an exception
+    exit_code = 1
+    stopwatch = Stopwatch(verbose=False)
+    try:
+        with stopwatch:
+            if args.module is not None:
+                runpy.run_module(target, run_name="__main__", alter_sys=True)
+            else:
+                sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+                runpy.run_path(target, run_name="__main__")
+        exit_code = 0
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sys.argv[:] = old_argv
+        sys.path[:] = old_path
+        # the output of the program is not mixed with the report
+        print(
+            "{} finished in {}".format(target, stopwatch.get_cumulative_elapsed_time()),
+            file=sys.stderr,
+        )
+        statistics = None
+        if any(s.get_cumulative_elapsed_time_ns() for s in multi_stopwatch):
+            statistics = multi_stopwatch.get_statistics(
+                quantiles=args.quantiles, top_k=args.top_k
+            )
+            print(
+                multi_stopwatch.format_statistics(
+                    tablefmt=args.tablefmt, quantiles=args.quantiles, top_k=args.top_k
+                ),
+                file=sys.stderr,
+            )
+        elif args.instrument:
+            print("no instrumented function was called", file=sys.stderr)
+        if args.json is not None:
+            _write_json(
+                args.json,
+                {
+                    "target": target,
+                    "args": program_args,
+                    "exit_code": exit_code,
+                    "elapsed_time": stopwatch.get_cumulative_elapsed_time_ns() / 1e9,
+                    "statistics": statistics or {},
+                },
+            )
+    return exit_code
+
+
+# the options of main() taking a value as the next argument
+_OPTIONS_WITH_VALUE = frozenset(
+    [
+        "-i",
+        "--instrument",
+        "-c",
+        "--command",
+        "-r",
+        "--runs",
+        "-w",
+        "--warmup",
+        "-q",
+        "--quantiles",
+        "--top-k",
+        "--tablefmt",
+        "-o",
+        "--json",
+    ]
+)
+
+
+def _split_argv(argv):
+    # split after -m MODULE or the script like cProfile, so the arguments of the
+    # program (even the ones starting with "-") are not parsed by argparse
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "-m" or arg == "--":
+            return argv[: i + 2], argv[i + 2 :]
+        if arg.startswith("-m"):
+            # -mMODULE
+            return argv[: i + 1], argv[i + 1 :]
+        if arg in _OPTIONS_WITH_VALUE:
+            i += 2
+        elif arg.startswith("-") and arg != "-":
+            i += 1
+        else:
+            return argv[: i + 1], argv[i + 1 :]
+    return argv, []
+
+
+def _parse_quantiles(text):
+    return tuple(float(q) for q in text.split(",") if q)
+
+
+def main(argv=None):
+    """Run the command line interface of ``python -m bistiming``.
+
+    Profile a Python script or module, optionally instrumenting functions by their
+    dotted names, or benchmark shell commands by running them repeatedly.
+
+    Parameters
+    ----------
+    argv : Optional[List[str]]
+        The arguments. If `None`, use :data:`sys.argv`.
+
+    Returns
+    -------
+    exit_code : int
+        The exit code of the profiled program, or 1 if a command failed.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m bistiming",
+        description=(
+            "Time a Python script or module with its functions instrumented, or "
+            "benchmark shell commands."
+        ),
+        epilog=(
+            "examples: python -m bistiming -i json.dumps -i mypkg.io script.py arg; "
+            "python -m bistiming -i mypkg.core -m mypkg.main; "
+            "python -m bistiming -c 'sleep 0.1' -c 'sleep 0.2' --runs 10"
+        ),
+    )
+    parser.add_argument(
+        "-i",
+        "--instrument",
+        action="append",
+        default=[],
+        metavar="NAME",
+        help=(
+            "the dotted name of a function, a class or a module to time each call "
+            "(can be repeated)"
+        ),
+    )
+    parser.add_argument(
+        "-m", dest="module", help="run a library module as a script (like python -m)"
+    )
+    parser.add_argument(
+        "-c",
+        "--command",
+        action="append",
+        help="a shell command to benchmark (can be repeated to compare)",
+    )
+    parser.add_argument(
+        "-r", "--runs", type=int, default=10, help="the number of runs of a command"
+    )
+    parser.add_argument(
+        "-w",
+        "--warmup",
+        type=int,
+        default=1,
+        help="the number of discarded runs of a command before measuring",
+    )
+    parser.add_argument(
+        "--show-output",
+        action="store_true",
+        help="show the output of the commands instead of discarding it",
+    )
+    parser.add_argument(
+        "-q",
+        "--quantiles",
+        type=_parse_quantiles,
+        default=(),
+        help="the comma-separated quantiles of the instrumented calls, e.g., 0.5,0.99",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        help="only show the instrumented functions with the largest cumulative time",
+    )
+    parser.add_argument("--tablefmt", default="simple", help="the tabulate format")
+    parser.add_argument(
+        "-o",
+        "--json",
+        metavar="PATH",
+        help="also write the statistics as JSON to the path (- for stdout)",
+    )
+    parser.add_argument("target", nargs="?", help="the script to run")
+    parser.add_argument(
+        "args",
+        nargs="*",
+        help=(
+            "the arguments of the script or module, which are passed untouched "
+            "(the options of bistiming must be given before the script or -m)"
+        ),
+    )
+    if argv is None:
+        argv = sys.argv[1:]
+    argv, program_args = _split_argv(list(argv))
+    args = parser.parse_args(argv)
+    args.args = program_args
+
+    if args.command:
+        if args.instrument or args.module is not None or args.target is not None:
+            parser.error("-c cannot be used with a script, -m or -i")
+        return _benchmark_commands(args)
+    return _profile_program(args, parser)
@@ -0,0 +1,210 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import functools
+import os
+import threading
+
+
+_timing_enabled = os.environ.get("BISTIMING_ENABLED", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+    "off",
+)
+_registry = {}
+_registry_lock = threading.Lock()
+
+# the arguments of Stopwatch which still work when each call is recorded by
+# add_split, the others only affect the with-block and the logs
+_SUPPORTED_STOPWATCH_KWARGS = frozenset(
+    [
+        "name",
+        "verbose",
+        "clock",
+        "max_splits",
+        "track_quantiles",
+        "sample_every",
+        "sample_rate",
+        "progress_interval",
+        "progress_every_splits",
+        "total",
+        "windows",
+    ]
+)
+
+
+def enable_timing():
+    """Enable the function instrumentation (:func:`timed`) in this process.
+
+    Only the functions decorated afterwards are affected.
+    """
+    global _timing_enabled
+    _timing_enabled = True
+
+
+def disable_timing():
+    """Disable the function instrumentation (:func:`timed`) in this process.
+
+    The functions decorated afterwards are returned unchanged, so they have no
+    overhead at all. The functions already decorated are not affected.
+    The initial state can be set using the environment variable
+    ``BISTIMING_ENABLED`` (``0``, ``false``, ``no`` or ``off`` to disable).
+    """
+    global _timing_enabled
+    _timing_enabled = False
+
+
+def is_timing_enabled():
+    """Check whether the function instrumentation is enabled."""
+    return _timing_enabled
+
+
+def get_multistopwatch(registry="default"):
+    """Get the process-wide :class:`~bistiming.MultiStopwatch` with the name.
+
+    It is created if it doesn't exist.
+
+    Parameters
+    ----------
+    registry : str
+        The name of the :class:`~bistiming.MultiStopwatch`.
+
+    Returns
+    -------
+    multi_stopwatch : :class:`~bistiming.MultiStopwatch`
+    """
+    from .multistopwatch import MultiStopwatch
+
+    try:
+        return _registry[registry]
+    except KeyError:
+        with _registry_lock:
+            if registry not in _registry:
+                _registry[registry] = MultiStopwatch()
+        return _registry[registry]
+
+
+def _check_stopwatch_kwargs(kwargs):
+    unsupported = sorted(set(kwargs) - _SUPPORTED_STOPWATCH_KWARGS)
+    if kwargs.get("verbose"):
+        unsupported.insert(0, "verbose")
+    if unsupported:
+        raise TypeError(
+            "the arguments of Stopwatch not supported by the instrumented functions: "
+            "{}".format(", ".join(unsupported))
+        )
+
+
+def instrument_function(func, stopwatch):
+    """Wrap a function to record the elapsed time of each call to a stopwatch.
+
+    Each call is timed independently and recorded using
+    :meth:`~bistiming.Stopwatch.add_split`, so recursive, concurrent (threads or
+    :mod:`asyncio` tasks) and interleaved calls are all timed correctly. The
+    sampling of the stopwatch (`sample_every` or `sample_rate`) is applied to each
+    call, but the logs and the probes of the stopwatch are not used.
+    For coroutine functions, the time until the coroutine returns is recorded.
+    For generator functions, the whole iteration (from the first item until the
+    generator is exhausted or closed) is recorded.
+
+    Parameters
+    ----------
+    func : Callable
+        The function to wrap.
+    stopwatch : :class:`~bistiming.Stopwatch`
+        The stopwatch to record the elapsed time. Its clock is used to measure the
+        time.
+
+    Returns
+    -------
+    wrapper : Callable
+    """
+    import inspect
+
+    clock = stopwatch.clock
+    add_split = stopwatch.add_split
+    sampling = stopwatch._sampling
+
+    def skip():
+        # count the call skipped by sampling
+        if stopwatch._sample():
+            return False
+        stopwatch.n_unsampled += 1
+        return True
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if sampling and skip():
+                return await func(*args, **kwargs)
+            start_time = clock()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                add_split(clock() - start_time)
+
+    elif inspect.isgeneratorfunction(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if sampling and skip():
+                return (yield from func(*args, **kwargs))
+            start_time = clock()
+            try:
+                return (yield from func(*args, **kwargs))
+            finally:
+                add_split(clock() - start_time)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if sampling and skip():
+                return func(*args, **kwargs)
+            start_time = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_split(clock() - start_time)
+
+    wrapper.stopwatch = stopwatch
+    return wrapper
+
+
+def timed(func=None, name=None, registry="default", **kwargs):
+    """Decorate a function to time each call in a process-wide MultiStopwatch.
+
+    A :class:`~bistiming.Stopwatch` is appended to
+    ``get_multistopwatch(registry)`` for each decorated function. It can be used
+    with or without arguments::
+
+        @timed
+        def parse(data):
+            ...
+
+        @timed(name="db.query", registry="db", track_quantiles=True)
+        async def query(sql):
+            ...
+
+    If the timing is disabled (see :func:`disable_timing`), the original function is
+    returned, so there is no overhead at all.
+
+    Parameters
+    ----------
+    func : Optional[Callable]
+        The function to decorate.
+    name : Optional[str]
+        The name of the stopwatch. If `None`, use the qualified name of `func`.
+    registry : str
+        The name of the :class:`~bistiming.MultiStopwatch`. See
+        :func:`get_multistopwatch`.
+    **kwargs
+        Other keyword arguments will be passed to
+        :meth:`~bistiming.MultiStopwatch.instrument`.
+    """
+    if func is None:
+        return functools.partial(timed, name=name, registry=registry, **kwargs)
+    if not _timing_enabled:
+        return func
+    return get_multistopwatch(registry).instrument(func, name=name, **kwargs)
@@ -0,0 +1,338 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import contextvars
+import sys
+import threading
+
+from .snapshot import StopwatchSnapshot
+from .stopwatch import Stopwatch
+from .utils import estimate_total, ns_to_timedelta
+
+
+class _LocalStopwatch(object):
+    """The base class of the stopwatches keeping a separate state for each context.
+
+    Subclasses should implement :meth:`get_local_stopwatch`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self.name = kwargs.get("name")
+        self._lock = threading.Lock()
+        self.stopwatches = []
+        self._template = None
+
+    def _create_stopwatch(self):
+        stopwatch = Stopwatch(*self._args, **self._kwargs)
+        with self._lock:
+            self.stopwatches.append(stopwatch)
+        return stopwatch
+
+    def _get_template(self):
+        # an unregistered stopwatch with the same arguments, so reading the
+        # statistics never creates a stopwatch for the reading context
+        template = self._template
+        if template is None:
+            template = self._template = Stopwatch(*self._args, **self._kwargs)
+        return template
+
+    def get_local_stopwatch(self):
+        """Get the :class:`Stopwatch` of the current context."""
+        raise NotImplementedError
+
+    def start(self, verbose=None, end_in_new_line=None):
+        """Call :meth:`Stopwatch.start` of the current context."""
+        self.get_local_stopwatch().start(verbose, end_in_new_line)
+        return self
+
+    def pause(self):
+        """Call :meth:`Stopwatch.pause` of the current context."""
+        self.get_local_stopwatch().pause()
+
+    def split(self, *args, **kwargs):
+        """Call :meth:`Stopwatch.split` of the current context."""
+        self.get_local_stopwatch().split(*args, **kwargs)
+
+    def add_split(self, elapsed_time, units=None):
+        """Call :meth:`Stopwatch.add_split` of the current context."""
+        self.get_local_stopwatch().add_split(elapsed_time, units)
+
+    def add_units(self, units):
+        """Call :meth:`Stopwatch.add_units` of the current context."""
+        self.get_local_stopwatch().add_units(units)
+
+    def get_elapsed_time_ns(self):
+        """Get the elapsed time of the current split of the current context."""
+        return self.get_local_stopwatch().get_elapsed_time_ns()
+
+    def get_elapsed_time(self):
+        """Get the elapsed time of the current split of the current context."""
+        return ns_to_timedelta(self.get_elapsed_time_ns())
+
+    def log_elapsed_time(self, prefix="Elapsed time: "):
+        """Call :meth:`Stopwatch.log_elapsed_time` of the current context."""
+        self.get_local_stopwatch().log_elapsed_time(prefix)
+
+    def get_cumulative_elapsed_time_ns(self):
+        """Get the cumulative elapsed time of all the contexts in nanoseconds."""
+        return sum(
+            stopwatch.get_cumulative_elapsed_time_ns()
+            for stopwatch in list(self.stopwatches)
+        )
+
+    def get_cumulative_elapsed_time(self):
+        """Get the cumulative elapsed time of all the contexts."""
+        return ns_to_timedelta(self.get_cumulative_elapsed_time_ns())
+
+    @property
+    def n_unsampled(self):
+        """int: The number of with-blocks skipped by sampling in all the contexts."""
+        return sum(stopwatch.n_unsampled for stopwatch in list(self.stopwatches))
+
+    @property
+    def n_units(self):
+        """Union[int, float]: The number of work units processed in all the contexts."""
+        return sum(stopwatch.n_units for stopwatch in list(self.stopwatches))
+
+    def get_throughput(self):
+        """Get the number of work units processed per second in all the contexts.
+
+        See :meth:`Stopwatch.get_throughput`.
+        """
+        n_units = self.n_units
+        elapsed_time = self.get_estimated_cumulative_elapsed_time_ns()
+        if not n_units or not elapsed_time:
+            return None
+        return n_units / elapsed_time * 1e9
+
+    def get_estimated_cumulative_elapsed_time_ns(self):
+        """Estimate the cumulative elapsed time of all the contexts in nanoseconds.
+
+        See :meth:`Stopwatch.get_estimated_cumulative_elapsed_time_ns`.
+        """
+        return sum(
+            estimate_total(
+                stopwatch.get_cumulative_elapsed_time_ns(),
+                stopwatch.splits.count,
+                stopwatch.n_unsampled,
+            )
+            for stopwatch in list(self.stopwatches)
+        )
+
+    @property
+    def version(self):
+        """Optional[Hashable]: Changes whenever the statistics of any context change.
+
+        See :attr:`Stopwatch.version`.
+        """
+        versions = tuple(stopwatch.version for stopwatch in list(self.stopwatches))
+        if None in versions:
+            return None
+        return versions
+
+    @property
+    def splits(self):
+        """:class:`~bistiming.splits.SplitHistory`: The splits of all the contexts.
+
+        This is a merged copy, so it takes O(number of stored splits) to build.
+        """
+        stopwatches = list(self.stopwatches)
+        if not stopwatches:
+            return self._get_template().splits.copy()
+        splits = stopwatches[0].splits.copy()
+        for stopwatch in stopwatches[1:]:
+            splits.merge(stopwatch.splits)
+        return splits
+
+    @property
+    def probes(self):
+        """Optional[Tuple[:class:`~bistiming.probes.Probe`, ...]]: The probes."""
+        return self._get_template().probes
+
+    @property
+    def measurements(self):
+        """Dict[str, :class:`~bistiming.splits.SplitHistory`]: The merged measurements.
+
+        The measurements of the probes of all the contexts.
+        """
+        stopwatches = list(self.stopwatches) or [self._get_template()]
+        measurements = {}
+        for stopwatch in stopwatches:
+            for field, history in stopwatch.measurements.items():
+                if field in measurements:
+                    measurements[field].merge(history)
+                else:
+                    measurements[field] = history.copy()
+        return measurements
+
+    @property
+    def windowed(self):
+        """Optional[:class:`~bistiming.window.WindowedStatistics`]: Merged windows.
+
+        The statistics of the recent splits of all the contexts, or `None` if
+        `windows` is not set.
+        """
+        stopwatches = list(self.stopwatches) or [self._get_template()]
+        if stopwatches[0].windowed is None:
+            return None
+        windowed = stopwatches[0].windowed.copy()
+        for stopwatch in stopwatches[1:]:
+            windowed.merge(stopwatch.windowed)
+        return windowed
+
+    @property
+    def split_elapsed_time_ns(self):
+        """List[int]: The stored splits in nanoseconds of all the contexts."""
+        return list(self.splits)
+
+    @property
+    def split_elapsed_time(self):
+        """List[datetime.timedelta]: The stored splits of all the contexts."""
+        return [ns_to_timedelta(t) for t in self.splits]
+
+    def to_numpy(self, copy=True):
+        """Get the stored splits in nanoseconds of all the contexts as a NumPy array.
+
+        The array is always built from a merged copy, so `copy` is ignored.
+        """
+        return self.splits.to_numpy(copy=False)
+
+    def snapshot(self):
+        """Take a picklable snapshot of the statistics of all the contexts."""
+        return StopwatchSnapshot.from_stopwatch(self)
+
+    def merge(self, snapshot):
+        """Call :meth:`Stopwatch.merge` of the current context."""
+        self.get_local_stopwatch().merge(snapshot)
+
+    def reset(self):
+        """Reset the stopwatches of all the contexts."""
+        for stopwatch in list(self.stopwatches):
+            stopwatch.reset()
+
+    def __enter__(self):
+        """Call :meth:`Stopwatch.__enter__` of the current context."""
+        self.get_local_stopwatch().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        """Call :meth:`Stopwatch.__exit__` of the current context."""
+        self.get_local_stopwatch().__exit__(exc_type, exc, exc_tb)
+
+    async def __aenter__(self):
+        """Call :meth:`Stopwatch.__enter__` of the current context."""
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, exc_tb):
+        """Call :meth:`Stopwatch.__exit__` of the current context."""
+        self.__exit__(exc_type, exc, exc_tb)
+
+
+class ThreadLocalStopwatch(_LocalStopwatch):
+    """A :class:`Stopwatch` that keeps a separate state for each thread.
+
+    Each thread entering this stopwatch gets its own :class:`Stopwatch`, so the
+    running state and the splits of different threads never clash, and no lock is
+    acquired on the hot path (a lock is only used when a thread uses this stopwatch
+    for the first time). The methods reading the cumulative elapsed time and the
+    splits aggregate the stopwatches of all the threads.
+
+    Parameters
+    ----------
+    *args
+        The arguments to initialize the :class:`Stopwatch` of each thread.
+    **kwargs
+        The keyword arguments to initialize the :class:`Stopwatch` of each thread.
+
+    Attributes
+    ----------
+    stopwatches : List[:class:`Stopwatch`]
+        The stopwatches of all the threads that have used this stopwatch.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ThreadLocalStopwatch, self).__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def get_local_stopwatch(self):
+        """Get the :class:`Stopwatch` of the current thread."""
+        try:
+            return self._local.stopwatch
+        except AttributeError:
+            stopwatch = self._local.stopwatch = self._create_stopwatch()
+            return stopwatch
+
+
+def _current_task():
+    # asyncio is not imported eagerly for a faster startup, and there cannot be any
+    # running task if it has not been imported
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is None:
+        return None
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        # no running event loop
+        return None
+
+
+class TaskLocalStopwatch(_LocalStopwatch):
+    """A :class:`Stopwatch` that keeps a separate state for each :mod:`asyncio` task.
+
+    The state is stored in a :class:`contextvars.ContextVar`, so concurrent tasks
+    entering the same stopwatch (usually with ``async with``) never clash. Outside
+    of any task, each thread has its own state. The methods reading the cumulative
+    elapsed time and the splits aggregate the stopwatches of all the tasks.
+
+    Use ``clock="task_time"`` to only count the time the task is actually running on
+    the event loop (see :func:`~bistiming.tasks.install_task_timer`).
+
+    Parameters
+    ----------
+    *args
+        The arguments to initialize the :class:`Stopwatch` of each task.
+    **kwargs
+        The keyword arguments to initialize the :class:`Stopwatch` of each task.
+
+    Attributes
+    ----------
+    stopwatches : List[:class:`Stopwatch`]
+        The stopwatches of the unfinished tasks that have used this stopwatch. When
+        a task finishes, its stopwatch is merged into the first one, which holds the
+        statistics of all the finished tasks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TaskLocalStopwatch, self).__init__(*args, **kwargs)
+        self._context_var = contextvars.ContextVar(
+            "bistiming_stopwatch_{}".format(id(self))
+        )
+        self._retired = None
+
+    def get_local_stopwatch(self):
+        """Get the :class:`Stopwatch` of the current task."""
+        task = _current_task()
+        owner, stopwatch = self._context_var.get((None, None))
+        # a new task inherits a copy of the context of its parent, so check the owner
+        if stopwatch is None or owner is not task:
+            stopwatch = self._create_stopwatch()
+            self._context_var.set((task, stopwatch))
+            if task is not None:
+                task.add_done_callback(lambda _: self._retire(stopwatch))
+        return stopwatch
+
+    def _retire(self, stopwatch):
+        # fold the stopwatch of a finished task into the one of all the finished
+        # tasks, so the number of stopwatches doesn't grow with the number of tasks
+        with self._lock:
+            if self._retired is None:
+                self._retired = Stopwatch(*self._args, **self._kwargs)
+                self.stopwatches.insert(0, self._retired)
+            retired = self._retired
+            retired.merge(stopwatch.snapshot())
+            for field, history in stopwatch.measurements.items():
+                retired.measurements[field].merge(history)
+            if retired.windowed is not None:
+                retired.windowed.merge(stopwatch.windowed)
+            self.stopwatches.remove(stopwatch)
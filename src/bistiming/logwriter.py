@@ -0,0 +1,92 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import atexit
+import os
+import queue
+import threading
+
+
+class BackgroundLogWriter(object):
+    """Write the logs of :class:`~bistiming.Stopwatch` in a background thread.
+
+    The messages are put into a queue with their format strings and arguments, and
+    are only formatted and written by the background thread, so slow logging sinks
+    (e.g., a blocking stdout or a remote log handler) never add latency to the timed
+    code. The messages are written in the same order as they are submitted.
+    The remaining messages are flushed at exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        atexit.register(self.flush)
+        if hasattr(os, "register_at_fork"):
+            # the thread doesn't exist in a forked child, so restart it lazily
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # the lock may be held by another thread of the parent during fork
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+
+    def _start(self):
+        with self._lock:
+            if self._queue is not None:
+                return
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._run, name="bistiming-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            stopwatch, message_format, format_kwargs, log_kwargs = self._queue.get()
+            try:
+                stopwatch.log(message_format.format(**format_kwargs), **log_kwargs)
+            except Exception:
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    def submit(self, stopwatch, message_format, format_kwargs, log_kwargs):
+        """Queue a message to be formatted and logged by ``stopwatch.log``.
+
+        Parameters
+        ----------
+        stopwatch : :class:`~bistiming.Stopwatch`
+            The stopwatch whose :meth:`~bistiming.Stopwatch.log` writes the message.
+        message_format : str
+            The message format, which will be formatted using
+            ``message_format.format(**format_kwargs)``.
+        format_kwargs : Dict[str, Any]
+            The keyword arguments for formatting the message.
+        log_kwargs : Dict[str, Any]
+            The keyword arguments passed to ``stopwatch.log``.
+        """
+        if self._queue is None:
+            self._start()
+        self._queue.put((stopwatch, message_format, format_kwargs, log_kwargs))
+
+    def flush(self):
+        """Block until all the queued messages are written."""
+        if self._queue is not None:
+            self._queue.join()
+
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def get_background_log_writer():
+    """Get the process-wide :class:`BackgroundLogWriter`."""
+    global _default_writer
+    if _default_writer is None:
+        with _default_writer_lock:
+            if _default_writer is None:
+                _default_writer = BackgroundLogWriter()
+    return _default_writer
@@ -1,12 +1,32 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 
-import datetime
+from collections import OrderedDict, UserList
+import functools
+import threading
 
-from six.moves import UserList, range
-from tabulate import tabulate
+from .stopwatch import Stopwatch
+from .utils import ns_to_timedelta
 
-from . import Stopwatch
-from .utils import div_timedelta
+
+def _pop_stopwatch_class(kwargs):
+    # the local stopwatches are imported only if they are used for a faster startup
+    if kwargs.pop("thread_local", False):
+        from .local import ThreadLocalStopwatch
+
+        return ThreadLocalStopwatch
+    if kwargs.pop("task_local", False):
+        from .local import TaskLocalStopwatch
+
+        return TaskLocalStopwatch
+    return Stopwatch
+
+
+def _take_top_k(statistics, keys, top_k):
+    # the rows with the largest keys in descending order
+    indices = sorted(range(len(keys)), key=keys.__getitem__, reverse=True)[:top_k]
+    return {
+        column: [values[i] for i in indices] for column, values in statistics.items()
+    }
 
 
 class MultiStopwatch(UserList):
@@ -21,6 +41,17 @@ class MultiStopwatch(UserList):
         If `n` is an `int`, then initialize a `list` with `n` :class:`Stopwatch`.
         If `n` is `None`, then initialize an empty `list`.
         Otherwise, directly use `n` to initialize a `list`.
+    thread_local : bool
+        If `True`, initialize :class:`ThreadLocalStopwatch` instead of
+        :class:`Stopwatch`, so multiple threads can use the same stopwatch
+        concurrently, and the statistics are aggregated across the threads.
+        This is only used if `n` is an `int`, and should be passed as a keyword
+        argument.
+    task_local : bool
+        If `True`, initialize :class:`TaskLocalStopwatch` instead of
+        :class:`Stopwatch`, so multiple :mod:`asyncio` tasks can use the same
+        stopwatch concurrently. This is only used if `n` is an `int`, and should be
+        passed as a keyword argument.
     *args
         Other arguments will be passed to initialize :class:`Stopwatch`.
     **kwargs
@@ -29,20 +60,143 @@ class MultiStopwatch(UserList):
 
     def __init__(self, n=None, *args, **kwargs):
         if isinstance(n, int):
+            stopwatch_class = _pop_stopwatch_class(kwargs)
             super(MultiStopwatch, self).__init__(
-                Stopwatch(*args, **kwargs) for i in range(n)
+                stopwatch_class(*args, **kwargs) for i in range(n)
             )
         else:
             super(MultiStopwatch, self).__init__(n)
+        # the statistics of each stopwatch keyed by its id, see _get_row()
+        self._row_cache = {}
+        self._table_cache = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot, *args, **kwargs):
+        """Initialize the stopwatches from a snapshot.
+
+        Parameters
+        ----------
+        snapshot : :class:`~bistiming.snapshot.MultiStopwatchSnapshot`
+            The snapshot, e.g., merged from the snapshots of multiple processes.
+        *args
+            Other arguments will be passed to initialize :class:`MultiStopwatch`.
+        **kwargs
+            Other keyword arguments will be passed to initialize
+            :class:`MultiStopwatch`.
+        """
+        multi_stopwatch = cls(len(snapshot), *args, **kwargs)
+        multi_stopwatch.merge(snapshot)
+        return multi_stopwatch
+
+    def snapshot(self):
+        """Take a compact and picklable snapshot of the statistics.
+
+        The snapshot contains the cumulative elapsed time and the splits (with their
+        statistics and quantile sketches) of each stopwatch. It can be sent from the
+        worker processes to the parent process and be combined using :meth:`merge`.
+
+        Returns
+        -------
+        snapshot : :class:`~bistiming.snapshot.MultiStopwatchSnapshot`
+        """
+        from .snapshot import MultiStopwatchSnapshot
+
+        return MultiStopwatchSnapshot(stopwatch.snapshot() for stopwatch in self)
+
+    def merge(self, snapshot):
+        """Add the statistics in a snapshot to each stopwatch.
+
+        Parameters
+        ----------
+        snapshot : :class:`~bistiming.snapshot.MultiStopwatchSnapshot`
+            A snapshot with the same number of stopwatches.
+        """
+        if len(snapshot) != len(self):
+            raise ValueError(
+                "cannot merge a snapshot with different number of stopwatches "
+                "({} != {})".format(len(self), len(snapshot))
+            )
+        for stopwatch, stopwatch_snapshot in zip(self, snapshot):
+            stopwatch.merge(stopwatch_snapshot)
+
+    def instrument(self, func=None, name=None, **kwargs):
+        """Decorate a function to time each call using a new :class:`Stopwatch`.
+
+        The new stopwatch is appended to this object. It can be used with or
+        without arguments, and supports normal functions, coroutine functions and
+        generator functions (see :func:`~bistiming.instrument.instrument_function`).
+        If the timing is disabled (see :func:`~bistiming.instrument.disable_timing`),
+        or `func` is already instrumented (it has the attribute `stopwatch`), the
+        original function is returned.
+
+        Parameters
+        ----------
+        func : Optional[Callable]
+            The function to decorate.
+        name : Optional[str]
+            The name of the stopwatch. If `None`, use the qualified name of `func`.
+        **kwargs
+            Other keyword arguments will be passed to initialize :class:`Stopwatch`.
+            Only the arguments which apply to the recorded splits are supported
+            (`clock`, `max_splits`, `track_quantiles`, `sample_every`,
+            `sample_rate`, `progress_interval`, `progress_every_splits`, `total` and
+            `windows`), and `verbose` must be `False` (the default).
+
+        Returns
+        -------
+        wrapper : Callable
+            The wrapped function, whose stopwatch is in the attribute `stopwatch`.
+
+        Raises
+        ------
+        TypeError
+            If an unsupported argument of :class:`Stopwatch` is given.
+        """
+        from .instrument import (
+            _check_stopwatch_kwargs,
+            instrument_function,
+            is_timing_enabled,
+        )
+
+        _check_stopwatch_kwargs(kwargs)
+        if func is None:
+            return functools.partial(self.instrument, name=name, **kwargs)
+        if not is_timing_enabled() or hasattr(func, "stopwatch"):
+            return func
+        if name is None:
+            name = getattr(func, "__qualname__", func.__name__)
+        kwargs.setdefault("verbose", False)
+        stopwatch = Stopwatch(name=name, **kwargs)
+        self.append(stopwatch)
+        return instrument_function(func, stopwatch)
+
+    def get_names(self):
+        """Get the name of each stopwatch (or the index if it has no name).
+
+        Returns
+        -------
+        names : List[Union[str, int]]
+        """
+        return [
+            i if stopwatch.name is None else stopwatch.name
+            for i, stopwatch in enumerate(self)
+        ]
 
     def get_cumulative_elapsed_time(self):
         """Get the cumulative elapsed time of each stopwatch (including the current split).
 
+        If a stopwatch uses sampling, the unbiased estimate including the unsampled
+        with-blocks is returned
+        (see :meth:`Stopwatch.get_estimated_cumulative_elapsed_time_ns`).
+
         Returns
         -------
         cumulative_elapsed_time : List[datetime.timedelta]
         """
-        return [stopwatch.get_cumulative_elapsed_time() for stopwatch in self]
+        return [
+            ns_to_timedelta(stopwatch.get_estimated_cumulative_elapsed_time_ns())
+            for stopwatch in self
+        ]
 
     def get_percentage(self):
         """Get the cumulative time percentage of each stopwatch (including the current split).
@@ -51,20 +205,36 @@ class MultiStopwatch(UserList):
         -------
         cumulative_elapsed_time_percentage : List[float]
         """
-        cumulative_elapsed_time = self.get_cumulative_elapsed_time()
-        sum_elapsed_time = sum(cumulative_elapsed_time, datetime.timedelta())
+        cumulative_elapsed_time = [
+            stopwatch.get_estimated_cumulative_elapsed_time_ns() for stopwatch in self
+        ]
+        sum_elapsed_time = sum(cumulative_elapsed_time)
         if not sum_elapsed_time:
             raise ValueError("cannot get percentage if there is no any elapsed time")
-        return [div_timedelta(t, sum_elapsed_time) for t in cumulative_elapsed_time]
+        return [t / sum_elapsed_time for t in cumulative_elapsed_time]
 
     def get_n_splits(self):
         """Get number of splits of each stopwatch (excluding the current split).
 
+        The splits that are not stored because of `max_splits` and the with-blocks
+        skipped by sampling are also counted.
+
         Returns
         -------
         n_splits : List[int]
         """
-        return [len(stopwatch.split_elapsed_time) for stopwatch in self]
+        return [stopwatch.splits.count + stopwatch.n_unsampled for stopwatch in self]
+
+    def get_n_sampled(self):
+        """Get number of measured splits of each stopwatch (excluding the current split).
+
+        This is different from :meth:`get_n_splits` only if sampling is used.
+
+        Returns
+        -------
+        n_sampled : List[int]
+        """
+        return [stopwatch.splits.count for stopwatch in self]
 
     def get_mean_per_split(self):
         """Get the mean elapsed time per split of each stopwatch (excluding the current split).
@@ -73,39 +243,484 @@ class MultiStopwatch(UserList):
         -------
         mean_elapsed_time_per_split : List[datetime.timedelta]
         """
+        return [ns_to_timedelta(stopwatch.splits.mean) for stopwatch in self]
+
+    def get_std_per_split(self):
+        """Get the standard deviation of the elapsed time per split of each stopwatch.
+
+        Returns
+        -------
+        std_elapsed_time_per_split : List[datetime.timedelta]
+        """
+        return [ns_to_timedelta(stopwatch.splits.std) for stopwatch in self]
+
+    def get_min_per_split(self):
+        """Get the minimum elapsed time per split of each stopwatch.
+
+        Returns
+        -------
+        min_elapsed_time_per_split : List[Optional[datetime.timedelta]]
+            `None` if the stopwatch has no split.
+        """
         return [
-            (
-                div_timedelta(
-                    sum(stopwatch.split_elapsed_time, datetime.timedelta()),
-                    len(stopwatch.split_elapsed_time),
-                )
-                if stopwatch.split_elapsed_time
-                else datetime.timedelta()
-            )
+            ns_to_timedelta(stopwatch.splits.min) if stopwatch.splits.count else None
+            for stopwatch in self
+        ]
+
+    def get_max_per_split(self):
+        """Get the maximum elapsed time per split of each stopwatch.
+
+        Returns
+        -------
+        max_elapsed_time_per_split : List[Optional[datetime.timedelta]]
+            `None` if the stopwatch has no split.
+        """
+        return [
+            ns_to_timedelta(stopwatch.splits.max) if stopwatch.splits.count else None
             for stopwatch in self
         ]
 
-    def get_statistics(self):
+    def get_throughput(self):
+        """Get the number of work units processed per second by each stopwatch.
+
+        See :meth:`Stopwatch.add_units` and :meth:`Stopwatch.get_throughput`.
+
+        Returns
+        -------
+        throughput : List[Optional[float]]
+            `None` if the stopwatch has no work unit or no elapsed time.
+        """
+        return [stopwatch.get_throughput() for stopwatch in self]
+
+    def get_quantile(self, q):
+        """Get the `q`-quantile of the elapsed time per split of each stopwatch.
+
+        The quantile is estimated using the quantile sketch if the stopwatch is
+        initialized with ``track_quantiles=True``. Otherwise, it is computed from the
+        stored splits.
+
+        Parameters
+        ----------
+        q : float
+            The quantile between 0 and 1, e.g., 0.99 for the 99th percentile.
+
+        Returns
+        -------
+        quantile_elapsed_time_per_split : List[Optional[datetime.timedelta]]
+            `None` if the stopwatch has no split.
+        """
+        quantiles = (stopwatch.splits.quantile(q) for stopwatch in self)
+        return [None if t is None else ns_to_timedelta(t) for t in quantiles]
+
+    def _get_label_columns(self):
+        # the leading columns identifying the stopwatches
+        if any(stopwatch.name is not None for stopwatch in self):
+            return {"name": self.get_names()}
+        return {}
+
+    def _get_row(self, stopwatch, quantiles):
+        # the statistics of a stopwatch, which are cached until its version changes
+        version = stopwatch.version
+        cached = self._row_cache.get(id(stopwatch))
+        if (
+            version is not None
+            and cached is not None
+            and cached[0] is stopwatch
+            and cached[1] == version
+            and cached[2] == quantiles
+        ):
+            return cached[3]
+        # read once because it is a merged copy for the local stopwatches
+        splits = stopwatch.splits
+        if stopwatch.probes is None:
+            extra_columns = {}
+        else:
+            from .probes import get_measurement_statistics
+
+            extra_columns = get_measurement_statistics(
+                stopwatch.probes, stopwatch.measurements
+            )
+        row = {
+            "cumulative_elapsed_time_ns": (
+                stopwatch.get_estimated_cumulative_elapsed_time_ns()
+            ),
+            "n_splits": splits.count + stopwatch.n_unsampled,
+            "n_sampled": splits.count,
+            "n_units": stopwatch.n_units,
+            "mean_per_split": ns_to_timedelta(splits.mean),
+            "quantiles": [
+                None if t is None else ns_to_timedelta(t)
+                for t in (splits.quantile(q) for q in quantiles)
+            ],
+            "extra_columns": extra_columns,
+        }
+        windowed = stopwatch.windowed
+        if windowed is not None:
+            # not cached because the version is None
+            row["extra_columns"] = dict(
+                windowed.get_statistics(), **row["extra_columns"]
+            )
+        self._row_cache[id(stopwatch)] = (stopwatch, version, quantiles, row)
+        return row
+
+    def get_statistics(self, quantiles=(), top_k=None):
         """Get all statistics as a dictionary.
 
+        Parameters
+        ----------
+        quantiles : Iterable[float]
+            The quantiles of the elapsed time per split to add, e.g.,
+            ``(0.5, 0.95, 0.99)`` adds the columns `p50`, `p95` and `p99`.
+            See :meth:`get_quantile`.
+        top_k : Optional[int]
+            If not `None`, only include the `top_k` stopwatches with the largest
+            cumulative elapsed time, sorted in descending order. The percentage is
+            still relative to all the stopwatches.
+
         Returns
         -------
         statistics : Dict[str, List]
+            The statistics of each stopwatch are cached until it changes (see
+            :attr:`Stopwatch.version`), so polling the statistics of many
+            stopwatches only recomputes the changed or running ones.
+            If any stopwatch has a name, the names (see :meth:`get_names`) are
+            included as the first column `name`. If any with-block is skipped by
+            sampling, the column `n_sampled` (see :meth:`get_n_sampled`) is added.
+            The mean and the quantiles are computed from the sampled splits.
+            If any stopwatch has work units (see :meth:`Stopwatch.add_units`), the
+            columns `units` (the total), `throughput` (units per second) and
+            `time_per_unit` are added.
+            If any stopwatch has `windows`, the statistics of the recent splits
+            (e.g., `mean_1m`, `max_1m`, `rate_1m`, `ewma_mean` and `ewma_rate`, see
+            :meth:`~bistiming.window.WindowedStatistics.get_statistics`) are added.
+            If any stopwatch has probes (e.g., ``track_memory="tracemalloc"``,
+            ``track_gc=True`` or ``track_resources=True``), their columns (e.g.,
+            `mean_memory_delta`, `gc_time`, `cpu_utilization`) are added at the end
+            (see :class:`~bistiming.probes.Probe`).
         """
-        return {
-            "cumulative_elapsed_time": self.get_cumulative_elapsed_time(),
-            "percentage": self.get_percentage(),
-            "n_splits": self.get_n_splits(),
-            "mean_per_split": self.get_mean_per_split(),
-        }
+        quantiles = tuple(quantiles)
+        rows = [self._get_row(stopwatch, quantiles) for stopwatch in self]
+        if len(self._row_cache) > len(rows):
+            # drop the cached statistics of the removed stopwatches
+            self._row_cache = {
+                id(stopwatch): self._row_cache[id(stopwatch)] for stopwatch in self
+            }
+        cumulative_elapsed_time = [row["cumulative_elapsed_time_ns"] for row in rows]
+        sum_elapsed_time = sum(cumulative_elapsed_time)
+        if not sum_elapsed_time:
+            raise ValueError("cannot get percentage if there is no any elapsed time")
+        statistics = self._get_label_columns()
+        statistics["cumulative_elapsed_time"] = [
+            ns_to_timedelta(t) for t in cumulative_elapsed_time
+        ]
+        statistics["percentage"] = [
+            t / sum_elapsed_time for t in cumulative_elapsed_time
+        ]
+        statistics["n_splits"] = [row["n_splits"] for row in rows]
+        if any(row["n_splits"] != row["n_sampled"] for row in rows):
+            statistics["n_sampled"] = [row["n_sampled"] for row in rows]
+        statistics["mean_per_split"] = [row["mean_per_split"] for row in rows]
+        for i, q in enumerate(quantiles):
+            statistics["p{:g}".format(q * 100)] = [row["quantiles"][i] for row in rows]
+        if any(row["n_units"] for row in rows):
+            statistics["units"] = [row["n_units"] for row in rows]
+            statistics["throughput"] = [
+                row["n_units"] / t * 1e9 if t and row["n_units"] else None
+                for row, t in zip(rows, cumulative_elapsed_time)
+            ]
+            statistics["time_per_unit"] = [
+                ns_to_timedelta(t / row["n_units"]) if row["n_units"] else None
+                for row, t in zip(rows, cumulative_elapsed_time)
+            ]
+        for row in rows:
+            for column in row["extra_columns"]:
+                if column not in statistics:
+                    statistics[column] = [
+                        other_row["extra_columns"].get(column) for other_row in rows
+                    ]
+        if top_k is not None:
+            # sort by nanoseconds because timedelta is rounded to microseconds
+            statistics = _take_top_k(statistics, cumulative_elapsed_time, top_k)
+        return statistics
+
+    def to_dataframe(self):
+        """Get the stored splits of all the stopwatches as a pandas DataFrame.
+
+        The DataFrame is in the long format with one row per split, and it is built
+        using vectorized operations on the int64 arrays from ``to_numpy``, so it is
+        fast even with millions of splits. pandas is required.
+
+        Returns
+        -------
+        dataframe : pandas.DataFrame
+            The columns are `name` (categorical, see :meth:`get_names`, and the
+            stopwatches with the same name share a category),
+            `split_index` (from the oldest stored split), `elapsed_time_ns` (int64)
+            and `elapsed_time` (timedelta64[ns]).
+        """
+        import numpy as np
+        import pandas as pd
 
-    def format_statistics(self, tablefmt="fancy_grid"):
+        names = self.get_names()
+        arrays = [stopwatch.to_numpy() for stopwatch in self]
+        lengths = [len(array) for array in arrays]
+        elapsed_time_ns = np.concatenate([np.empty(0, dtype=np.int64)] + arrays)
+        split_index = np.concatenate(
+            [np.empty(0, dtype=np.int64)] + [np.arange(n) for n in lengths]
+        )
+        # the names are not necessarily unique, and the keys can be tuples
+        codes = {}
+        for name in names:
+            codes.setdefault(name, len(codes))
+        name = pd.Categorical.from_codes(
+            np.repeat(np.array([codes[name] for name in names], dtype=int), lengths),
+            categories=pd.Index(list(codes), dtype=object, tupleize_cols=False),
+        )
+        return pd.DataFrame(
+            {
+                "name": name,
+                "split_index": split_index,
+                "elapsed_time_ns": elapsed_time_ns,
+                "elapsed_time": pd.to_timedelta(elapsed_time_ns, unit="ns"),
+            }
+        )
+
+    def format_statistics(self, tablefmt="fancy_grid", **kwargs):
         """Format the statistics using tabulate.
 
+        The table is cached until any stopwatch changes (see
+        :attr:`Stopwatch.version`) or a stopwatch is added or removed.
+
         Parameters
         ----------
         tablefmt: str
             See the available options in
             `tabulate's documentation <https://github.com/astanin/python-tabulate#table-format>`_.
+        **kwargs
+            Other keyword arguments will be passed to :meth:`get_statistics`.
         """
-        return tabulate(self.get_statistics(), headers="keys", tablefmt=tablefmt)
+        from tabulate import tabulate
+
+        versions = [
+            (stopwatch, stopwatch.name, stopwatch.version) for stopwatch in self
+        ]
+        cache_key = (tablefmt, sorted(kwargs.items()), versions)
+        if self._table_cache is not None and self._table_cache[0] == cache_key:
+            return self._table_cache[1]
+        table = tabulate(
+            self.get_statistics(**kwargs), headers="keys", tablefmt=tablefmt
+        )
+        if all(version is not None for _, _, version in versions):
+            self._table_cache = (cache_key, table)
+        return table
+
+
+class KeyedMultiStopwatch(MultiStopwatch):
+    """A :class:`MultiStopwatch` whose stopwatches are created on demand by keys.
+
+    A stopwatch is created when its key is accessed for the first time, and is
+    found in O(1) afterwards, so the stopwatches can be keyed by, e.g., the
+    endpoints or the query types without keeping the indices:
+
+    >>> timers = KeyedMultiStopwatch(verbose=False)
+    >>> with timers["parse"]:
+    ...     parse()
+    >>> with timers[("db", table)]:
+    ...     query(table)
+
+    The keys can be any hashable objects, and are added as the first column `key`
+    of :meth:`get_statistics`. Unlike :class:`~collections.UserList`, indexing and
+    ``in`` use the keys instead of the positions. The stopwatches are still stored
+    in a list (:attr:`data`), so the other methods of :class:`MultiStopwatch` work
+    as usual. New stopwatches are appended to it, but when a stopwatch is removed
+    (or evicted), the last stopwatch is moved to its position to keep removing
+    O(1), so the order of creation is not kept after removing.
+
+    Parameters
+    ----------
+    n : Union[int, Mapping, Iterable, None]
+        If `n` is an `int`, then create `n` stopwatches with the keys
+        ``0, ..., n - 1`` (e.g., by :meth:`~MultiStopwatch.from_snapshot`). If `n`
+        has the method ``items`` (e.g., a :class:`dict` or a
+        :class:`KeyedMultiStopwatch`), use its keys and stopwatches. Otherwise, add
+        the stopwatches in `n` without keys.
+    max_keys : Optional[int]
+        The maximum number of stopwatches to keep the memory bounded if the keys
+        have a high cardinality. When a new key is accessed while there are already
+        `max_keys` stopwatches, the least recently used one is evicted, and its
+        statistics are dropped. If `None`, there is no limit. It should be passed as
+        a keyword argument.
+    thread_local : bool
+        If `True`, create :class:`ThreadLocalStopwatch` instead of
+        :class:`Stopwatch`. It should be passed as a keyword argument.
+    task_local : bool
+        If `True`, create :class:`TaskLocalStopwatch` instead of
+        :class:`Stopwatch`. It should be passed as a keyword argument.
+    *args
+        Other arguments will be passed to initialize each :class:`Stopwatch`.
+    **kwargs
+        Other keyword arguments will be passed to initialize each
+        :class:`Stopwatch`.
+
+    Attributes
+    ----------
+    n_evicted : int
+        The number of stopwatches evicted because of `max_keys`.
+    """
+
+    def __init__(self, n=None, *args, max_keys=None, **kwargs):
+        if max_keys is not None and max_keys < 1:
+            raise ValueError("max_keys should be a positive integer")
+        self.stopwatch_class = _pop_stopwatch_class(kwargs)
+        super(KeyedMultiStopwatch, self).__init__()
+        self.max_keys = max_keys
+        self.stopwatch_args = args
+        self.stopwatch_kwargs = kwargs
+        self.n_evicted = 0
+        # in the order of recent use if max_keys is set
+        self._stopwatches = OrderedDict()
+        self._keys = {}  # id of the stopwatch -> key
+        self._indices = {}  # id of the stopwatch -> index in data
+        self._lock = threading.Lock()
+        if isinstance(n, int):
+            for key in range(n):
+                self._create(key)
+        elif hasattr(n, "items"):
+            for key, stopwatch in n.items():
+                self[key] = stopwatch
+        elif n is not None:
+            self.data.extend(n)
+
+    def __getitem__(self, key):
+        """Get the stopwatch of the key, which is created if it doesn't exist."""
+        try:
+            stopwatch = self._stopwatches[key]
+        except KeyError:
+            return self._create(key)
+        if self.max_keys is not None:
+            try:
+                self._stopwatches.move_to_end(key)
+            except KeyError:
+                # evicted by another thread
+                pass
+        return stopwatch
+
+    def _create(self, key):
+        with self._lock:
+            if key in self._stopwatches:
+                return self._stopwatches[key]
+            while self.max_keys is not None and len(self._stopwatches) >= self.max_keys:
+                _, evicted = self._stopwatches.popitem(last=False)
+                self._remove(evicted)
+                self.n_evicted += 1
+            stopwatch = self.stopwatch_class(
+                *self.stopwatch_args, **self.stopwatch_kwargs
+            )
+            self._add(key, stopwatch)
+            return stopwatch
+
+    def _add(self, key, stopwatch, index=None):
+        if index is None:
+            index = len(self.data)
+            self.data.append(stopwatch)
+        else:
+            self.data[index] = stopwatch
+        self._stopwatches[key] = stopwatch
+        self._keys[id(stopwatch)] = key
+        self._indices[id(stopwatch)] = index
+
+    def _pop_index(self, stopwatch):
+        # the index of a keyed stopwatch, which is forgotten
+        del self._keys[id(stopwatch)]
+        index = self._indices.pop(id(stopwatch))
+        if index < len(self.data) and self.data[index] is stopwatch:
+            return index
+        # data is changed directly (e.g., by sort), so rebuild the indices
+        self._indices = {
+            id(other): i for i, other in enumerate(self.data) if id(other) in self._keys
+        }
+        return next(i for i, other in enumerate(self.data) if other is stopwatch)
+
+    def _remove(self, stopwatch):
+        index = self._pop_index(stopwatch)
+        last = self.data.pop()
+        if index < len(self.data):
+            self.data[index] = last
+            if id(last) in self._indices:
+                self._indices[id(last)] = index
+
+    def __setitem__(self, key, stopwatch):
+        """Set the stopwatch of the key, which replaces the existing one."""
+        with self._lock:
+            index = None
+            if key in self._stopwatches:
+                index = self._pop_index(self._stopwatches.pop(key))
+            self._add(key, stopwatch, index)
+
+    def __delitem__(self, key):
+        """Remove the stopwatch of the key."""
+        with self._lock:
+            self._remove(self._stopwatches.pop(key))
+
+    def copy(self):
+        """Get a shallow copy with the same keys, stopwatches and settings."""
+        copied = self.__class__(
+            None, *self.stopwatch_args, max_keys=self.max_keys, **self.stopwatch_kwargs
+        )
+        copied.stopwatch_class = self.stopwatch_class
+        with self._lock:
+            # copy the indices directly to keep the order and the unkeyed stopwatches
+            copied.data = list(self.data)
+            copied._stopwatches = OrderedDict(self._stopwatches)
+            copied._keys = dict(self._keys)
+            copied._indices = dict(self._indices)
+        return copied
+
+    def __contains__(self, key):
+        """Check whether the key has a stopwatch without creating it."""
+        return key in self._stopwatches
+
+    def __iter__(self):
+        """Iterate over the stopwatches in the order of :attr:`data`."""
+        return iter(self.data)
+
+    def __reversed__(self):
+        return reversed(self.data)
+
+    def keys(self):
+        """Get the keys in the order of :attr:`data`.
+
+        Returns
+        -------
+        keys : List[Hashable]
+            The key of each stopwatch. It is `None` if the stopwatch is added to
+            :attr:`data` directly (e.g., by :meth:`instrument`).
+        """
+        return [self._keys.get(id(stopwatch)) for stopwatch in self.data]
+
+    def items(self):
+        """Get the pairs of the keys and the stopwatches in the order of :attr:`data`.
+
+        Returns
+        -------
+        items : List[Tuple[Hashable, :class:`Stopwatch`]]
+        """
+        return list(zip(self.keys(), self.data))
+
+    def get_names(self):
+        """Get the name of each stopwatch (or the key if it has no name).
+
+        Returns
+        -------
+        names : List[Hashable]
+        """
+        return [
+            key if stopwatch.name is None else stopwatch.name
+            for key, stopwatch in self.items()
+        ]
+
+    def _get_label_columns(self):
+        columns = {"key": self.keys()}
+        if any(stopwatch.name is not None for stopwatch in self):
+            columns["name"] = [stopwatch.name for stopwatch in self]
+        return columns
@@ -0,0 +1,351 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import gc
+import os
+import threading
+import time
+
+from .utils import ns_to_timedelta
+
+
+class Probe(object):
+    """The base class of the extra measurements of each split of a Stopwatch.
+
+    A probe is started when the stopwatch starts and stopped when it pauses. The
+    measurements of each split are recorded in
+    :attr:`Stopwatch.measurements <bistiming.Stopwatch.measurements>`, which maps
+    each field name to a :class:`~bistiming.splits.SplitHistory` of the values, so
+    the count, sum, minimum, maximum and mean are kept in O(1) memory.
+
+    Attributes
+    ----------
+    fields : Tuple[str, ...]
+        The names of the values measured for each split. They should be unique
+        among the probes of a stopwatch.
+    columns : Tuple[Tuple[str, str, str], ...]
+        The columns added to :meth:`~bistiming.MultiStopwatch.get_statistics`.
+        Each column is ``(column_name, field, aggregation)``, where `aggregation` is
+        ``"mean"``, ``"max"``, ``"sum"``, ``"sum_time"`` (the sum of nanoseconds
+        as :class:`datetime.timedelta`), or ``"ratio"`` (the sum of the first field
+        divided by the sum of the second field, where `field` is a pair of fields).
+    """
+
+    fields = ()
+    columns = ()
+
+    def start(self):
+        """Start measuring a running interval of a split.
+
+        Returns
+        -------
+        state : Any
+            The state passed to :meth:`stop`.
+        """
+        raise NotImplementedError
+
+    def stop(self, state, values, offset):
+        """Stop measuring and accumulate the values of the split.
+
+        A split can consist of multiple running intervals if the stopwatch is paused
+        and started again, so the values of each interval should be added to the
+        values of the split.
+
+        Parameters
+        ----------
+        state : Any
+            The state returned by :meth:`start`.
+        values : List[int]
+            The values of the current split of all the probes.
+        offset : int
+            The index of the first field of this probe in `values`.
+        """
+        raise NotImplementedError
+
+
+class TracemallocProbe(Probe):
+    """Measure the memory allocated by Python using :mod:`tracemalloc`.
+
+    The fields are `memory_delta` (the net change in bytes) and `memory_peak` (the
+    increase of the peak traced memory over the memory at the start, in bytes).
+    :mod:`tracemalloc` is started if it is not tracing yet, which slows down all
+    the allocations in the process. The peak is process-wide and is reset at the
+    start of each split, so the peaks of concurrent or nested stopwatches affect
+    each other. On Python < 3.9, the peak cannot be reset, so the net change at the
+    end is used instead.
+    """
+
+    fields = ("memory_delta", "memory_peak")
+    columns = (
+        ("mean_memory_delta", "memory_delta", "mean"),
+        ("max_memory_peak", "memory_peak", "max"),
+    )
+
+    def __init__(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._get_traced_memory = tracemalloc.get_traced_memory
+        # Python >= 3.9
+        self._reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+    def start(self):
+        if self._reset_peak is not None:
+            self._reset_peak()
+        return self._get_traced_memory()[0]
+
+    def stop(self, state, values, offset):
+        current, peak = self._get_traced_memory()
+        if self._reset_peak is None:
+            # the peak since the start is unknown
+            peak = current
+        values[offset] += current - state
+        values[offset + 1] = max(values[offset + 1], max(peak, current) - state)
+
+
+class RSSProbe(Probe):
+    """Measure the resident set size (RSS) of the process.
+
+    The fields are `rss_delta` (the net change of the RSS in bytes, read from
+    ``/proc/self/statm``) and `max_rss_growth` (how much the peak RSS of the
+    process is raised, in bytes). It is cheaper than :class:`TracemallocProbe` and
+    also covers the memory allocated outside Python (e.g., by NumPy), but it is
+    only available on Linux, and the memory freed to the allocator is not
+    necessarily returned to the OS.
+    """
+
+    fields = ("rss_delta", "max_rss_growth")
+    columns = (
+        ("mean_rss_delta", "rss_delta", "mean"),
+        ("max_rss_growth", "max_rss_growth", "sum"),
+    )
+
+    _fd = None  # shared by all the instances
+
+    def __init__(self):
+        import resource
+
+        if RSSProbe._fd is None:
+            RSSProbe._fd = os.open("/proc/self/statm", os.O_RDONLY)
+            os.register_at_fork(after_in_child=RSSProbe._reopen)
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._getrusage = resource.getrusage
+        self._rusage_self = resource.RUSAGE_SELF
+
+    @staticmethod
+    def _reopen():
+        # the inherited file still reads the statm of the parent after fork
+        os.close(RSSProbe._fd)
+        RSSProbe._fd = os.open("/proc/self/statm", os.O_RDONLY)
+
+    def _get_rss(self):
+        return int(os.pread(self._fd, 128, 0).split()[1]) * self._page_size
+
+    def _get_max_rss(self):
+        # in kilobytes on Linux
+        return self._getrusage(self._rusage_self).ru_maxrss * 1024
+
+    def start(self):
+        return self._get_rss(), self._get_max_rss()
+
+    def stop(self, state, values, offset):
+        rss, max_rss = state
+        values[offset] += self._get_rss() - rss
+        values[offset + 1] += self._get_max_rss() - max_rss
+
+
+_gc_lock = threading.Lock()
+_gc_callback_installed = False
+_gc_start_time = None
+_gc_time_ns = 0
+_gc_collections = 0
+
+
+def _gc_callback(phase, info):
+    global _gc_start_time, _gc_time_ns, _gc_collections
+    if phase == "start":
+        _gc_start_time = time.perf_counter_ns()
+    elif _gc_start_time is not None:
+        _gc_time_ns += time.perf_counter_ns() - _gc_start_time
+        _gc_collections += 1
+        _gc_start_time = None
+
+
+class GCProbe(Probe):
+    """Measure the time spent in the garbage collector using :data:`gc.callbacks`.
+
+    The fields are `gc_time` (in nanoseconds) and `gc_collections` (the number of
+    collections). The garbage collector is process-wide, so the collections
+    triggered by other threads are also counted if they happen during the split.
+    """
+
+    fields = ("gc_time", "gc_collections")
+    columns = (
+        ("gc_time", "gc_time", "sum_time"),
+        ("gc_collections", "gc_collections", "sum"),
+    )
+
+    def __init__(self):
+        global _gc_callback_installed
+        with _gc_lock:
+            if not _gc_callback_installed:
+                gc.callbacks.append(_gc_callback)
+                _gc_callback_installed = True
+
+    def start(self):
+        return _gc_time_ns, _gc_collections
+
+    def stop(self, state, values, offset):
+        values[offset] += _gc_time_ns - state[0]
+        values[offset + 1] += _gc_collections - state[1]
+
+
+class ResourceProbe(Probe):
+    """Measure the CPU time and the resource usage of the process and the thread.
+
+    The fields are `wall_time`, `cpu_time` (the CPU time of the process),
+    `thread_time` (the CPU time of the current thread), all in nanoseconds, and the
+    changes of :func:`resource.getrusage`: `voluntary_switches` (the context
+    switches because of waiting, e.g., for I/O or locks), `involuntary_switches`
+    (preempted by the OS), `block_inputs` and `block_outputs` (the block I/O
+    operations of the file system). The resource usage is of the current thread on
+    Linux (``RUSAGE_THREAD``) and of the process on the other platforms.
+
+    The columns include the sum of the CPU time and two utilization ratios:
+
+    - `cpu_utilization` = CPU time of the process / wall time. It is close to 1 for a
+      CPU-bound single-threaded split, much lower if the split is waiting (e.g., for
+      I/O or sleeping), and higher than 1 if multiple threads (or native libraries)
+      are computing in parallel.
+    - `thread_utilization` = CPU time of the thread / wall time. If it is much lower
+      than `cpu_utilization`, the thread is waiting while the other threads are
+      running, e.g., for the GIL.
+
+    The thread CPU time is measured by :func:`time.thread_time_ns`, and is 0 on the
+    platforms not supporting it.
+    """
+
+    fields = (
+        "wall_time",
+        "cpu_time",
+        "thread_time",
+        "voluntary_switches",
+        "involuntary_switches",
+        "block_inputs",
+        "block_outputs",
+    )
+    columns = (
+        ("cpu_time", "cpu_time", "sum_time"),
+        ("cpu_utilization", ("cpu_time", "wall_time"), "ratio"),
+        ("thread_utilization", ("thread_time", "wall_time"), "ratio"),
+        ("voluntary_switches", "voluntary_switches", "sum"),
+        ("involuntary_switches", "involuntary_switches", "sum"),
+        ("block_inputs", "block_inputs", "sum"),
+        ("block_outputs", "block_outputs", "sum"),
+    )
+
+    def __init__(self):
+        import resource
+
+        self._getrusage = resource.getrusage
+        # Linux only
+        self._rusage_who = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+        self._thread_time_ns = getattr(time, "thread_time_ns", lambda: 0)
+
+    def start(self):
+        usage = self._getrusage(self._rusage_who)
+        return (
+            usage.ru_nvcsw,
+            usage.ru_nivcsw,
+            usage.ru_inblock,
+            usage.ru_oublock,
+            self._thread_time_ns(),
+            time.process_time_ns(),
+            time.perf_counter_ns(),
+        )
+
+    def stop(self, state, values, offset):
+        wall_time = time.perf_counter_ns()
+        cpu_time = time.process_time_ns()
+        thread_time = self._thread_time_ns()
+        usage = self._getrusage(self._rusage_who)
+        values[offset] += wall_time - state[6]
+        values[offset + 1] += cpu_time - state[5]
+        values[offset + 2] += thread_time - state[4]
+        values[offset + 3] += usage.ru_nvcsw - state[0]
+        values[offset + 4] += usage.ru_nivcsw - state[1]
+        values[offset + 5] += usage.ru_inblock - state[2]
+        values[offset + 6] += usage.ru_oublock - state[3]
+
+
+def create_probes(track_memory=None, track_gc=False, track_resources=False):
+    """Create the probes for the arguments of :class:`~bistiming.Stopwatch`.
+
+    Parameters
+    ----------
+    track_memory : Optional[str]
+        ``"tracemalloc"`` for :class:`TracemallocProbe`, ``"rss"`` for
+        :class:`RSSProbe`, or `None`.
+    track_gc : bool
+        Whether to add :class:`GCProbe`.
+    track_resources : bool
+        Whether to add :class:`ResourceProbe`.
+
+    Returns
+    -------
+    probes : Optional[Tuple[:class:`Probe`, ...]]
+        `None` if there is no probe.
+    """
+    probes = []
+    if track_memory == "tracemalloc":
+        probes.append(TracemallocProbe())
+    elif track_memory == "rss":
+        probes.append(RSSProbe())
+    elif track_memory is not None:
+        raise ValueError(
+            "track_memory should be 'tracemalloc', 'rss' or None, got {!r}".format(
+                track_memory
+            )
+        )
+    if track_gc:
+        probes.append(GCProbe())
+    if track_resources:
+        probes.append(ResourceProbe())
+    return tuple(probes) or None
+
+
+def get_measurement_statistics(probes, measurements):
+    """Aggregate the measurements of a stopwatch into the columns of the probes.
+
+    Parameters
+    ----------
+    probes : Optional[Iterable[:class:`Probe`]]
+    measurements : Dict[str, :class:`~bistiming.splits.SplitHistory`]
+
+    Returns
+    -------
+    statistics : Dict[str, Any]
+        The values keyed by the column names. The value is `None` if there is no
+        split.
+    """
+    statistics = {}
+    for probe in probes or ():
+        for column, field, aggregation in probe.columns:
+            if aggregation == "ratio":
+                numerator, denominator = (measurements[f].sum for f in field)
+                statistics[column] = numerator / denominator if denominator else None
+                continue
+            history = measurements[field]
+            if not history.count:
+                statistics[column] = None
+            elif aggregation == "mean":
+                statistics[column] = history.mean
+            elif aggregation == "max":
+                statistics[column] = history.max
+            elif aggregation == "sum":
+                statistics[column] = history.sum
+            elif aggregation == "sum_time":
+                statistics[column] = ns_to_timedelta(history.sum)
+            else:
+                raise ValueError("unknown aggregation: {!r}".format(aggregation))
+    return statistics
@@ -0,0 +1,155 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import time
+
+from .utils import ns_to_timedelta
+
+
+class ProgressReporter(object):
+    """Log a progress summary of a :class:`~bistiming.Stopwatch` periodically.
+
+    Instead of logging every split, the stopwatch calls :meth:`update` after each
+    split, and a summary is logged at most once every `interval` seconds or every
+    `every_splits` splits (whichever comes first), so the logging cost is O(1) per
+    report instead of per split. The summary contains the number of splits, the
+    throughput (splits per second), the mean elapsed time per split, the mean of the
+    recent splits (since the previous report) and, if `total` is given, the progress
+    and the estimated time remaining.
+
+    It is usually created by :class:`~bistiming.Stopwatch` using the arguments
+    `progress_interval`, `progress_every_splits` and `total`.
+
+    Parameters
+    ----------
+    interval : Optional[float]
+        The minimum number of seconds between two reports.
+    every_splits : Optional[int]
+        The number of splits between two reports.
+    total : Optional[int]
+        The expected total number of splits, which is used to estimate the time
+        remaining.
+    clock : Callable[[], int]
+        The wall clock in nanoseconds used for the interval and the throughput.
+    """
+
+    __slots__ = (
+        "interval_ns",
+        "every_splits",
+        "total",
+        "clock",
+        "_countdown",
+        "_next_report_time",
+        "_start_time",
+        "_last_report_time",
+        "_last_count",
+        "_last_sampled_count",
+        "_last_sum",
+    )
+
+    def __init__(
+        self, interval=None, every_splits=None, total=None, clock=time.perf_counter_ns
+    ):
+        if interval is None and every_splits is None:
+            raise ValueError("at least one of interval and every_splits is required")
+        if every_splits is not None and every_splits < 1:
+            raise ValueError("every_splits should be a positive integer")
+        self.interval_ns = None if interval is None else int(interval * 1e9)
+        self.every_splits = every_splits
+        self.total = total
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        """Restart the progress from zero."""
+        self._countdown = self.every_splits
+        self._next_report_time = None
+        self._start_time = None
+        self._last_report_time = None
+        self._last_count = 0
+        self._last_sampled_count = 0
+        self._last_sum = 0
+
+    def update(self, stopwatch, elapsed_time):
+        """Log a summary if it is time to report. Called after each split.
+
+        Parameters
+        ----------
+        stopwatch : :class:`~bistiming.Stopwatch`
+            The stopwatch whose progress is reported.
+        elapsed_time : int
+            The elapsed time of the split in nanoseconds.
+        """
+        if self._start_time is None:
+            # assume the first split started right before it ended
+            self._start_time = self._last_report_time = self.clock() - elapsed_time
+            if self.interval_ns is not None:
+                self._next_report_time = self._start_time + self.interval_ns
+        if self._countdown is not None:
+            self._countdown -= 1
+            if not self._countdown:
+                self.report(stopwatch)
+                return
+        if self.interval_ns is None:
+            return
+        now = self.clock()
+        if now >= self._next_report_time:
+            self.report(stopwatch, now)
+
+    def report(self, stopwatch, now=None):
+        """Log a summary now.
+
+        Parameters
+        ----------
+        stopwatch : :class:`~bistiming.Stopwatch`
+            The stopwatch whose progress is reported.
+        now : Optional[int]
+            The current time of :attr:`clock`.
+        """
+        if now is None:
+            now = self.clock()
+        if self._start_time is None:
+            self._start_time = self._last_report_time = now
+        splits = stopwatch.splits
+        # the with-blocks skipped by sampling are also counted
+        count = splits.count + stopwatch.n_unsampled
+        recent_count = count - self._last_count
+        recent_sampled_count = splits.count - self._last_sampled_count
+        recent_time = now - self._last_report_time
+        total_time = now - self._start_time
+        format_kwargs = {
+            "description": stopwatch.description,
+            "count": count,
+            "throughput": recent_count / recent_time * 1e9 if recent_time else 0.0,
+            "mean": ns_to_timedelta(splits.mean),
+            "recent_mean": ns_to_timedelta(
+                (splits.sum - self._last_sum) / recent_sampled_count
+                if recent_sampled_count > 0
+                else 0
+            ),
+        }
+        message_format = (
+            ", {throughput:.1f} splits/s, mean {mean}, recent mean {recent_mean}"
+        )
+        if self.total:
+            format_kwargs["total"] = self.total
+            format_kwargs["progress"] = count / self.total
+            if count and total_time:
+                remaining = max(self.total - count, 0) * total_time / count
+                format_kwargs["eta"] = ns_to_timedelta(remaining)
+            else:
+                format_kwargs["eta"] = "unknown"
+            message_format = (
+                "{description} {count}/{total} splits ({progress:.1%})"
+                + message_format
+                + ", ETA {eta}"
+            )
+        else:
+            message_format = "{description} {count} splits" + message_format
+        stopwatch._log(message_format, format_kwargs)
+        self._countdown = self.every_splits
+        if self.interval_ns is not None:
+            self._next_report_time = now + self.interval_ns
+        self._last_report_time = now
+        self._last_count = count
+        self._last_sampled_count = splits.count
+        self._last_sum = splits.sum
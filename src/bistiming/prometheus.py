@@ -0,0 +1,289 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import os
+import tempfile
+import threading
+
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+)
+"""The default upper bounds (in seconds) of the histogram buckets.
+
+The same as the default buckets of the official Prometheus client libraries.
+"""
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""The content type of the Prometheus text exposition format."""
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(key, _escape_label_value(value))
+            for key, value in labels.items()
+        )
+        + "}"
+    )
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _get_split_aggregates(stopwatch):
+    # only read the incrementally updated aggregates and sketches, never the stored
+    # splits, so the cost doesn't depend on the number of splits
+    stopwatches = getattr(stopwatch, "stopwatches", None)
+    if stopwatches is None:
+        stopwatches = [stopwatch]
+    else:
+        # the per-thread or per-task stopwatches of a local stopwatch
+        stopwatches = list(stopwatches)
+    count = 0
+    sum_ = 0
+    sketch = None
+    for local_stopwatch in stopwatches:
+        splits = local_stopwatch.splits
+        count += splits.count
+        sum_ += splits.sum
+        if splits.sketch is not None:
+            if sketch is None:
+                sketch = splits.sketch.copy()
+            else:
+                sketch.merge(splits.sketch)
+    return count, sum_, sketch
+
+
+def _get_multistopwatch(source):
+    if isinstance(source, str):
+        from .instrument import get_multistopwatch
+
+        return get_multistopwatch(source)
+    return source
+
+
+def format_metrics(
+    source,
+    name="bistiming_split_duration_seconds",
+    metric_type="summary",
+    labels=None,
+    quantiles=(0.5, 0.9, 0.99),
+    buckets=DEFAULT_BUCKETS,
+    help_text="The elapsed time of the splits of the stopwatches.",
+):
+    """Format the split statistics of a MultiStopwatch in the Prometheus text format.
+
+    Each stopwatch becomes a series with the label ``stopwatch`` set to its name
+    (see :meth:`~bistiming.MultiStopwatch.get_names`). The time is in seconds.
+
+    Only the incrementally kept aggregates (the count and the sum of the splits) and
+    quantile sketches (see `track_quantiles` in :class:`~bistiming.Stopwatch`) are
+    read, so formatting never iterates over the stored splits or blocks the timed
+    threads. The quantiles of a summary and the buckets of a histogram are estimated
+    from the sketches, so they are only exported for the stopwatches with
+    ``track_quantiles=True``. Under sampling (see `sample_every` in
+    :class:`~bistiming.Stopwatch`), only the sampled splits are counted.
+
+    Parameters
+    ----------
+    source : Union[:class:`~bistiming.MultiStopwatch`, str]
+        The stopwatches, or the name of a registry of
+        :func:`~bistiming.instrument.get_multistopwatch` (e.g., for
+        :func:`~bistiming.timed`).
+    name : str
+        The metric name.
+    metric_type : str
+        ``"summary"`` or ``"histogram"``.
+    labels : Optional[Dict[str, str]]
+        The constant labels added to all the series, e.g., ``{"service": "api"}``.
+    quantiles : Iterable[float]
+        The quantiles of the summary.
+    buckets : Iterable[float]
+        The upper bounds (in seconds) of the buckets of the histogram. ``+Inf`` is
+        always added.
+    help_text : str
+        The help text of the metric.
+
+    Returns
+    -------
+    text : str
+    """
+    if metric_type not in ("summary", "histogram"):
+        raise ValueError("metric_type should be 'summary' or 'histogram'")
+    multi_stopwatch = _get_multistopwatch(source)
+    lines = [
+        "# HELP {} {}".format(name, help_text),
+        "# TYPE {} {}".format(name, metric_type),
+    ]
+    for stopwatch_name, stopwatch in zip(multi_stopwatch.get_names(), multi_stopwatch):
+        series_labels = dict(labels or {})
+        series_labels["stopwatch"] = stopwatch_name
+        count, sum_, sketch = _get_split_aggregates(stopwatch)
+        if sketch is not None and not sketch.count:
+            sketch = None
+        if metric_type == "summary":
+            if sketch is not None:
+                for q in quantiles:
+                    quantile_labels = dict(series_labels, quantile=_format_value(q))
+                    lines.append(
+                        "{}{} {}".format(
+                            name,
+                            _format_labels(quantile_labels),
+                            _format_value(sketch.quantile(q) / 1e9),
+                        )
+                    )
+        else:
+            if sketch is not None:
+                for bound in buckets:
+                    bucket_labels = dict(series_labels, le=_format_value(float(bound)))
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            name,
+                            _format_labels(bucket_labels),
+                            min(sketch.rank(bound * 1e9), count),
+                        )
+                    )
+            bucket_labels = dict(series_labels, le="+Inf")
+            lines.append(
+                "{}_bucket{} {}".format(name, _format_labels(bucket_labels), count)
+            )
+        formatted_labels = _format_labels(series_labels)
+        lines.append("{}_sum{} {}".format(name, formatted_labels, repr(sum_ / 1e9)))
+        lines.append("{}_count{} {}".format(name, formatted_labels, count))
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, source, **kwargs):
+    """Write the metrics to a file for the textfile collector of node_exporter.
+
+    The file is written atomically (to a temporary file which is then renamed), so
+    the collector never reads a partially written file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file, which should end with ``.prom``.
+    source : Union[:class:`~bistiming.MultiStopwatch`, str]
+        See :func:`format_metrics`.
+    **kwargs
+        Other keyword arguments will be passed to :func:`format_metrics`.
+    """
+    text = format_metrics(source, **kwargs)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".bistiming-")
+    try:
+        with io.open(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+class MetricsServer(object):
+    """Serve the metrics over HTTP for Prometheus to scrape.
+
+    The server runs in a daemon thread, and the metrics are formatted by
+    :func:`format_metrics` on each request.
+
+    >>> server = MetricsServer(timers, port=9100).start()
+    >>> # curl http://localhost:9100/metrics
+    >>> server.stop()
+
+    Parameters
+    ----------
+    source : Union[:class:`~bistiming.MultiStopwatch`, str]
+        See :func:`format_metrics`.
+    port : int
+        The port to listen to. If 0, a free port is chosen (see :attr:`port`).
+    addr : str
+        The address to bind.
+    **kwargs
+        Other keyword arguments will be passed to :func:`format_metrics`.
+    """
+
+    def __init__(self, source, port=9100, addr="", **kwargs):
+        self.source = source
+        self.format_kwargs = kwargs
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa: N802
+                try:
+                    text = format_metrics(server.source, **server.format_kwargs)
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                body = text.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # don't log every scrape to stderr
+                pass
+
+        self._httpd = ThreadingHTTPServer((addr, port), Handler)
+        self._thread = None
+
+    @property
+    def port(self):
+        """int: The port the server is listening to."""
+        return self._httpd.server_address[1]
+
+    def start(self):
+        """Start serving in a daemon thread.
+
+        Returns
+        -------
+        self : :class:`MetricsServer`
+        """
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="bistiming-metrics", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        """Call :meth:`start`."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        """Call :meth:`stop`."""
+        self.stop()
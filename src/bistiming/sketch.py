@@ -0,0 +1,161 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import math
+
+
+class QuantileSketch(object):
+    """A mergeable streaming quantile sketch with relative-error guarantee.
+
+    The values are counted in logarithmic buckets (like DDSketch or HDR histogram),
+    so any quantile is estimated within `relative_accuracy` of the true value while
+    the memory only depends on the range of the values instead of the number of
+    values.
+
+    Parameters
+    ----------
+    relative_accuracy : float
+        The maximum relative error of the estimated quantiles.
+    max_buckets : int
+        The maximum number of buckets. If exceeded, the lowest buckets are collapsed,
+        so the accuracy of the lowest quantiles is sacrificed first.
+
+    Attributes
+    ----------
+    count : int
+        The number of values added.
+    """
+
+    __slots__ = (
+        "relative_accuracy",
+        "max_buckets",
+        "count",
+        "_gamma",
+        "_log_gamma",
+        "_zero_count",
+        "_buckets",
+    )
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy should be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.clear()
+
+    def clear(self):
+        """Remove all the values."""
+        self.count = 0
+        self._zero_count = 0
+        self._buckets = {}
+
+    def add(self, value, count=1):
+        """Add a non-negative value.
+
+        Parameters
+        ----------
+        value : Union[int, float]
+            The value to add.
+        count : int
+            The number of times to add the value.
+        """
+        self.count += count
+        if value <= 0:
+            self._zero_count += count
+            return
+        key = int(math.ceil(math.log(value) / self._log_gamma))
+        buckets = self._buckets
+        buckets[key] = buckets.get(key, 0) + count
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self._buckets)
+        n_collapsed = len(keys) - self.max_buckets + 1
+        collapsed_count = sum(self._buckets.pop(key) for key in keys[:n_collapsed])
+        lowest_key = keys[n_collapsed]
+        self._buckets[lowest_key] += collapsed_count
+
+    def merge(self, other):
+        """Add all the values in another sketch into this sketch.
+
+        Parameters
+        ----------
+        other : :class:`QuantileSketch`
+            A sketch with the same `relative_accuracy`.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative_accuracy")
+        self.count += other.count
+        self._zero_count += other._zero_count
+        buckets = self._buckets
+        for key, count in list(other._buckets.items()):
+            buckets[key] = buckets.get(key, 0) + count
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def copy(self):
+        """Get a copy of this sketch."""
+        sketch = type(self)(self.relative_accuracy, self.max_buckets)
+        return sketch.merge(self)
+
+    def _bucket_value(self, key):
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def quantile(self, q):
+        """Estimate the `q`-quantile.
+
+        Parameters
+        ----------
+        q : float
+            The quantile between 0 and 1, e.g., 0.99 for the 99th percentile.
+
+        Returns
+        -------
+        value : Optional[float]
+            The estimated quantile, or `None` if the sketch is empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q should be between 0 and 1")
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        cumulative_count = self._zero_count
+        if cumulative_count > rank:
+            return 0.0
+        # sorted copies the items first so concurrent updates cannot break the loop
+        for key, count in sorted(self._buckets.items()):
+            cumulative_count += count
+            if cumulative_count > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self._buckets))
+
+    def rank(self, value):
+        """Estimate the number of the added values less than or equal to `value`.
+
+        Parameters
+        ----------
+        value : Union[int, float]
+
+        Returns
+        -------
+        rank : int
+        """
+        if value < 0:
+            return 0
+        rank = self._zero_count
+        if value == 0:
+            return rank
+        max_key = int(math.ceil(math.log(value) / self._log_gamma))
+        # copy the items first so concurrent updates cannot break the iteration
+        for key, count in list(self._buckets.items()):
+            if key <= max_key:
+                rank += count
+        return rank
+
+    def __repr__(self):
+        return "{}(relative_accuracy={}, count={})".format(
+            type(self).__name__, self.relative_accuracy, self.count
+        )
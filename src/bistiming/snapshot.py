@@ -0,0 +1,321 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import time
+
+from .splits import SplitHistory
+from .utils import ns_to_timedelta
+
+
+class StopwatchSnapshot(object):
+    """A picklable snapshot of the statistics of a :class:`~bistiming.Stopwatch`.
+
+    Parameters
+    ----------
+    cumulative_elapsed_time_ns : int
+        The cumulative elapsed time in nanoseconds (including the current split).
+    splits : :class:`~bistiming.splits.SplitHistory`
+        The splits and their statistics.
+    units : Union[int, float]
+        The number of work units processed (see
+        :meth:`~bistiming.Stopwatch.add_units`).
+    n_unsampled : int
+        The number of with-blocks skipped by sampling, which scales the estimated
+        cumulative elapsed time (see
+        :meth:`~bistiming.Stopwatch.get_estimated_cumulative_elapsed_time_ns`).
+    """
+
+    __slots__ = ("cumulative_elapsed_time_ns", "splits", "units", "n_unsampled")
+
+    def __init__(
+        self, cumulative_elapsed_time_ns=0, splits=None, units=0, n_unsampled=0
+    ):
+        self.cumulative_elapsed_time_ns = cumulative_elapsed_time_ns
+        self.splits = SplitHistory() if splits is None else splits
+        self.units = units
+        self.n_unsampled = n_unsampled
+
+    @classmethod
+    def from_stopwatch(cls, stopwatch):
+        """Take a snapshot of a :class:`~bistiming.Stopwatch`."""
+        return cls(
+            stopwatch.get_cumulative_elapsed_time_ns(),
+            stopwatch.splits.copy(),
+            stopwatch.n_units,
+            stopwatch.n_unsampled,
+        )
+
+    def get_cumulative_elapsed_time(self):
+        """Get the cumulative elapsed time."""
+        return ns_to_timedelta(self.cumulative_elapsed_time_ns)
+
+    def merge(self, other):
+        """Add another :class:`StopwatchSnapshot` into this snapshot.
+
+        Returns
+        -------
+        self : :class:`StopwatchSnapshot`
+        """
+        self.cumulative_elapsed_time_ns += other.cumulative_elapsed_time_ns
+        self.splits.merge(other.splits)
+        self.units += other.units
+        self.n_unsampled += other.n_unsampled
+        return self
+
+    def __getstate__(self):
+        return (
+            self.cumulative_elapsed_time_ns,
+            self.splits,
+            self.units,
+            self.n_unsampled,
+        )
+
+    def __setstate__(self, state):
+        (
+            self.cumulative_elapsed_time_ns,
+            self.splits,
+            self.units,
+            self.n_unsampled,
+        ) = state
+
+    def __repr__(self):
+        return (
+            "{}(cumulative_elapsed_time_ns={}, splits={!r}, units={!r}, "
+            "n_unsampled={})".format(
+                type(self).__name__,
+                self.cumulative_elapsed_time_ns,
+                self.splits,
+                self.units,
+                self.n_unsampled,
+            )
+        )
+
+
+class MultiStopwatchSnapshot(list):
+    """A picklable snapshot of a :class:`~bistiming.MultiStopwatch`.
+
+    It is a :class:`list` of :class:`StopwatchSnapshot`. It is usually created by
+    :meth:`~bistiming.MultiStopwatch.snapshot` in the worker processes and sent back
+    to the parent process, which can combine them using :meth:`merge` and
+    :meth:`~bistiming.MultiStopwatch.from_snapshot`.
+    """
+
+    def merge(self, other):
+        """Add another :class:`MultiStopwatchSnapshot` into this snapshot.
+
+        Parameters
+        ----------
+        other : :class:`MultiStopwatchSnapshot`
+            A snapshot with the same number of stopwatches.
+
+        Returns
+        -------
+        self : :class:`MultiStopwatchSnapshot`
+        """
+        if len(other) != len(self):
+            raise ValueError(
+                "cannot merge snapshots with different number of stopwatches "
+                "({} != {})".format(len(self), len(other))
+            )
+        for snapshot, other_snapshot in zip(self, other):
+            snapshot.merge(other_snapshot)
+        return self
+
+
+class SharedMemoryCollector(object):
+    """Collect the statistics of :class:`~bistiming.MultiStopwatch` across processes.
+
+    The statistics of each worker are written to its own row in a
+    :class:`multiprocessing.shared_memory.SharedMemory` block, so the workers never
+    need a lock or any IPC to publish them, and the parent process can read all of
+    them at any time using :meth:`snapshot`. Each row is protected by a sequence
+    counter, so the reader retries instead of reading a partially written row.
+
+    Only the count, sum, sum of squares, minimum and maximum of the splits, the
+    cumulative elapsed time, the number of with-blocks skipped by sampling and the
+    work units are collected (no stored splits or quantile sketches).
+
+    The collector can be passed to the worker processes (it is picklable), and each
+    worker should call :meth:`publish` with a unique `worker_index`, for example,
+    at the end of each task.
+
+    Parameters
+    ----------
+    n_workers : int
+        The number of workers (rows).
+    n_stopwatches : int
+        The number of stopwatches in the :class:`~bistiming.MultiStopwatch` of
+        each worker.
+    name : Optional[str]
+        The name of the shared memory block. If `None`, a unique name is generated.
+    """
+
+    # the sum of squares of the splits can exceed 64 bits, so it is split into
+    # the lower and the higher 64 bits
+    _INT_FIELDS = (
+        "sequence",
+        "cumulative",
+        "count",
+        "sum",
+        "min",
+        "max",
+        "sum_of_squares_low",
+        "sum_of_squares_high",
+        "n_unsampled",
+    )
+
+    def __init__(self, n_workers, n_stopwatches, name=None, _create=True):
+        from multiprocessing import shared_memory
+
+        self.n_workers = n_workers
+        self.n_stopwatches = n_stopwatches
+        n_int = len(self._INT_FIELDS)
+        n_cells = n_workers * n_stopwatches
+        # followed by the work units, which can be floats
+        size = 8 * n_cells * (n_int + 1)
+        if _create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._owner = True
+        else:
+            try:
+                # prevent the resource tracker of the workers from unlinking it
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Python < 3.13
+                self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._ints = self._shm.buf[: 8 * n_cells * n_int].cast("q")
+        self._units = self._shm.buf[8 * n_cells * n_int : size].cast("d")
+        if _create:
+            for i in range(len(self._ints)):
+                self._ints[i] = 0
+            for i in range(len(self._units)):
+                self._units[i] = 0.0
+
+    @property
+    def name(self):
+        """str: The name of the shared memory block."""
+        return self._shm.name
+
+    @classmethod
+    def attach(cls, name, n_workers, n_stopwatches):
+        """Attach to an existing collector created in another process."""
+        return cls(n_workers, n_stopwatches, name=name, _create=False)
+
+    def __reduce__(self):
+        return (type(self).attach, (self.name, self.n_workers, self.n_stopwatches))
+
+    def _cell(self, worker_index, stopwatch_index):
+        if not 0 <= worker_index < self.n_workers:
+            raise IndexError("worker_index out of range")
+        return worker_index * self.n_stopwatches + stopwatch_index
+
+    def publish(self, worker_index, multi_stopwatch):
+        """Write the statistics of a worker to the shared memory.
+
+        Parameters
+        ----------
+        worker_index : int
+            The unique index of the worker in ``range(n_workers)``.
+        multi_stopwatch : :class:`~bistiming.MultiStopwatch`
+            The stopwatches of the worker.
+        """
+        if len(multi_stopwatch) != self.n_stopwatches:
+            raise ValueError(
+                "expected {} stopwatches, got {}".format(
+                    self.n_stopwatches, len(multi_stopwatch)
+                )
+            )
+        ints = self._ints
+        n_int = len(self._INT_FIELDS)
+        for stopwatch_index, stopwatch in enumerate(multi_stopwatch):
+            cell = self._cell(worker_index, stopwatch_index)
+            base = cell * n_int
+            splits = stopwatch.splits
+            # odd sequence number means the row is being written
+            ints[base] += 1
+            ints[base + 1] = stopwatch.get_cumulative_elapsed_time_ns()
+            ints[base + 2] = splits.count
+            ints[base + 3] = splits.sum
+            ints[base + 4] = splits.min or 0
+            ints[base + 5] = splits.max or 0
+            # as a signed 64-bit integer
+            low = splits.sum_of_squares & 0xFFFFFFFFFFFFFFFF
+            ints[base + 6] = low - (1 << 64) if low >> 63 else low
+            ints[base + 7] = splits.sum_of_squares >> 64
+            ints[base + 8] = stopwatch.n_unsampled
+            self._units[cell] = stopwatch.n_units
+            ints[base] += 1
+
+    def _read_cell(self, cell, timeout):
+        ints = self._ints
+        base = cell * len(self._INT_FIELDS)
+        deadline = None
+        while True:
+            sequence = ints[base]
+            if sequence % 2 == 0:
+                values = ints[base + 1 : base + len(self._INT_FIELDS)].tolist()
+                units = self._units[cell]
+                if ints[base] == sequence:
+                    return values, units
+            elif deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise RuntimeError(
+                    "worker {} has been publishing for more than {} seconds, it may "
+                    "have died while publishing".format(
+                        cell // self.n_stopwatches, timeout
+                    )
+                )
+
+    def snapshot(self, timeout=1.0):
+        """Read and merge the statistics of all the workers.
+
+        Parameters
+        ----------
+        timeout : float
+            The maximum time in seconds to wait for a worker which is publishing.
+
+        Returns
+        -------
+        snapshot : :class:`MultiStopwatchSnapshot`
+        """
+        snapshot = MultiStopwatchSnapshot(
+            StopwatchSnapshot() for _ in range(self.n_stopwatches)
+        )
+        for worker_index in range(self.n_workers):
+            for stopwatch_index in range(self.n_stopwatches):
+                cell = self._cell(worker_index, stopwatch_index)
+                values, units = self._read_cell(cell, timeout)
+                cumulative, count, sum_, min_, max_, low, high, n_unsampled = values
+                splits = SplitHistory(max_splits=0)
+                if count:
+                    splits.count = count
+                    splits.sum = sum_
+                    splits.sum_of_squares = (high << 64) | (low & 0xFFFFFFFFFFFFFFFF)
+                    splits.min = min_
+                    splits.max = max_
+                if units.is_integer():
+                    units = int(units)
+                snapshot[stopwatch_index].merge(
+                    StopwatchSnapshot(cumulative, splits, units, n_unsampled)
+                )
+        return snapshot
+
+    def close(self):
+        """Close the shared memory block in this process."""
+        self._ints.release()
+        self._units.release()
+        self._shm.close()
+
+    def unlink(self):
+        """Destroy the shared memory block. Only the creator should call this."""
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        """Close the shared memory block, and destroy it if this is the creator."""
+        self.close()
+        if self._owner:
+            self.unlink()
@@ -0,0 +1,265 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from array import array
+import math
+
+
+NUMPY_MIN_SPLITS = 10000
+"""The minimum number of stored splits to compute the exact quantiles using NumPy.
+
+Below this, the built-in :func:`sorted` is faster than converting to an array.
+NumPy is only used if it is installed.
+"""
+
+
+class SplitHistory(object):
+    """The split elapsed time of a :class:`~bistiming.Stopwatch` and its statistics.
+
+    The elapsed time is stored as nanoseconds in a compact :class:`array.array`
+    (typecode ``"q"``). The count, sum, minimum, maximum and variance are updated
+    in O(1) per split, so they are always available even if the splits are not
+    stored.
+
+    Parameters
+    ----------
+    max_splits : Optional[int]
+        The maximum number of splits to store. If `None`, store all the splits.
+        Otherwise, the splits are stored in a ring buffer with capacity `max_splits`,
+        so only the latest `max_splits` splits are kept. If `0`, no split is stored.
+    sketch : Optional[:class:`~bistiming.sketch.QuantileSketch`]
+        If not `None`, every split is also added to this sketch, so the quantiles
+        can be estimated in constant memory.
+
+    Attributes
+    ----------
+    count : int
+        The number of splits recorded, including the ones not stored.
+    sum : int
+        The sum of the recorded splits in nanoseconds.
+    sum_of_squares : int
+        The sum of squares of the recorded splits in nanoseconds squared.
+    min : Optional[int]
+        The minimum split in nanoseconds, or `None` if no split is recorded.
+    max : Optional[int]
+        The maximum split in nanoseconds, or `None` if no split is recorded.
+    """
+
+    __slots__ = (
+        "max_splits",
+        "count",
+        "sum",
+        "sum_of_squares",
+        "min",
+        "max",
+        "sketch",
+        "_data",
+        "_next",
+    )
+
+    def __init__(self, max_splits=None, sketch=None):
+        if max_splits is not None and max_splits < 0:
+            raise ValueError("max_splits should be None or a non-negative integer")
+        self.max_splits = max_splits
+        self.sketch = sketch
+        self.clear()
+
+    def clear(self):
+        """Remove all the splits and reset the statistics."""
+        self.count = 0
+        self.sum = 0
+        self.sum_of_squares = 0
+        self.min = None
+        self.max = None
+        self._data = array("q")
+        self._next = 0
+        if self.sketch is not None:
+            self.sketch.clear()
+
+    def append(self, elapsed_time):
+        """Record a split.
+
+        Parameters
+        ----------
+        elapsed_time : int
+            The elapsed time of the split in nanoseconds.
+        """
+        self.count += 1
+        self.sum += elapsed_time
+        self.sum_of_squares += elapsed_time * elapsed_time
+        if self.count == 1:
+            self.min = self.max = elapsed_time
+        elif elapsed_time < self.min:
+            self.min = elapsed_time
+        elif elapsed_time > self.max:
+            self.max = elapsed_time
+        if self.max_splits is None:
+            self._data.append(elapsed_time)
+        elif len(self._data) < self.max_splits:
+            self._data.append(elapsed_time)
+        elif self.max_splits:
+            # the ring buffer is full, so overwrite the oldest split
+            self._data[self._next] = elapsed_time
+            self._next = (self._next + 1) % self.max_splits
+        if self.sketch is not None:
+            self.sketch.add(elapsed_time)
+
+    def merge(self, other):
+        """Add all the splits and statistics of another :class:`SplitHistory`.
+
+        The stored splits of `other` are appended after the stored splits of this
+        object, subject to :attr:`max_splits`. If only `other` has a quantile
+        sketch, a copy of it is adopted, provided that all the splits of this
+        object are still stored so they can be added to the sketch.
+
+        Parameters
+        ----------
+        other : :class:`SplitHistory`
+
+        Returns
+        -------
+        self : :class:`SplitHistory`
+        """
+        if not other.count:
+            return self
+        sketch = self.sketch
+        if sketch is None and other.sketch is not None and len(self) == self.count:
+            sketch = other.sketch.copy()
+            for elapsed_time in self:
+                sketch.add(elapsed_time)
+        elif sketch is not None and other.sketch is not None:
+            sketch.merge(other.sketch)
+        self.sketch = sketch
+        if self.count:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        else:
+            self.min = other.min
+            self.max = other.max
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_of_squares += other.sum_of_squares
+        if self.max_splits is None:
+            self._data.extend(other)
+        elif self.max_splits:
+            values = list(self) + list(other)
+            self._data = array("q", values[-self.max_splits :])
+            self._next = 0
+        return self
+
+    def copy(self):
+        """Get a copy of this object."""
+        splits = type(self)(self.max_splits).merge(self)
+        if self.sketch is not None and splits.sketch is None:
+            # the sketch of an empty object
+            splits.sketch = self.sketch.copy()
+        return splits
+
+    @property
+    def mean(self):
+        """float: The mean of the recorded splits in nanoseconds (0 if empty)."""
+        if not self.count:
+            return 0.0
+        return self.sum / self.count
+
+    @property
+    def variance(self):
+        """float: The sample variance of the recorded splits in nanoseconds squared.
+
+        0 if there are less than 2 splits.
+        """
+        if self.count < 2:
+            return 0.0
+        # exact integer arithmetic to prevent catastrophic cancellation
+        numerator = self.count * self.sum_of_squares - self.sum * self.sum
+        return numerator / (self.count * (self.count - 1))
+
+    @property
+    def std(self):
+        """float: The sample standard deviation of the splits in nanoseconds."""
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        """Get the `q`-quantile of the splits in nanoseconds.
+
+        If there is a :attr:`sketch`, the quantile is estimated using it.
+        Otherwise, the exact quantile of the stored splits is computed using linear
+        interpolation, which is O(n log n).
+
+        Parameters
+        ----------
+        q : float
+            The quantile between 0 and 1, e.g., 0.99 for the 99th percentile.
+
+        Returns
+        -------
+        value : Optional[float]
+            The quantile, or `None` if there is no split.
+        """
+        if self.sketch is not None:
+            return self.sketch.quantile(q)
+        if not 0 <= q <= 1:
+            raise ValueError("q should be between 0 and 1")
+        if len(self._data) >= NUMPY_MIN_SPLITS:
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+            else:
+                # the same linear interpolation as below
+                return float(np.quantile(self.to_numpy(), q))
+        values = sorted(self._data)
+        if not values:
+            return None
+        position = q * (len(values) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    def to_numpy(self, copy=True):
+        """Get the stored splits in nanoseconds as a NumPy array.
+
+        The splits are ordered from the oldest to the latest. NumPy is required.
+
+        Parameters
+        ----------
+        copy : bool
+            If `False`, return a zero-copy view of the internal buffer if the splits
+            are contiguous (i.e., the ring buffer has not wrapped around). While the
+            view is alive, no split can be appended (:class:`BufferError` is raised),
+            so only use it when the stopwatch is no longer in use.
+
+        Returns
+        -------
+        splits : numpy.ndarray
+            A 1-d array with dtype int64.
+        """
+        import numpy as np
+
+        data = self._data
+        if self._next:
+            # the ring buffer has wrapped around, so the copy is unavoidable
+            data = data[self._next :] + data[: self._next]
+        elif copy:
+            # copy using memcpy while holding the GIL, so appending in other threads
+            # never sees the buffer exported
+            data = data[:]
+        if not data:
+            return np.empty(0, dtype=np.int64)
+        return np.frombuffer(data, dtype=np.int64)
+
+    def __len__(self):
+        """Get the number of stored splits."""
+        return len(self._data)
+
+    def __iter__(self):
+        """Iterate over the stored splits from the oldest to the latest."""
+        data = self._data
+        for i in range(self._next, len(data)):
+            yield data[i]
+        for i in range(self._next):
+            yield data[i]
+
+    def __repr__(self):
+        return "{}(count={}, mean={}, max_splits={})".format(
+            type(self).__name__, self.count, self.mean, self.max_splits
+        )
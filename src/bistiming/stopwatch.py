@@ -1,10 +1,58 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 
-from functools import partial
-import logging
-import datetime
+import time
 
-import six
+from .splits import SplitHistory
+from .tasks import task_time_ns
+from .utils import estimate_total, ns_to_timedelta
+
+
+_LOGGING_INFO = 20  # logging.INFO, without importing logging for a faster startup
+
+# the TraceRecorder currently recording, which is set by bistiming.tracing, so
+# bistiming.tracing is only imported when a trace is recorded
+_trace_recorder = None
+
+CLOCKS = {
+    "perf_counter": time.perf_counter_ns,
+    "process_time": time.process_time_ns,
+    "task_time": task_time_ns,
+}
+"""The built-in clocks that can be used by :class:`Stopwatch`, keyed by name.
+
+Each clock is a function returning an :class:`int` in nanoseconds.
+``"thread_time"`` is only available on the platforms supporting
+:func:`time.thread_time_ns`.
+``"task_time"`` only counts the time the current :mod:`asyncio` task is running
+on the event loop (see :func:`~bistiming.tasks.task_time_ns`).
+"""
+if hasattr(time, "thread_time_ns"):
+    CLOCKS["thread_time"] = time.thread_time_ns
+
+
+def get_clock(clock):
+    """Get the clock function by name.
+
+    Parameters
+    ----------
+    clock : Union[str, Callable[[], int]]
+        A key in :data:`CLOCKS`, or a function returning the current time in
+        nanoseconds as an :class:`int`.
+
+    Returns
+    -------
+    clock : Callable[[], int]
+    """
+    if callable(clock):
+        return clock
+    try:
+        return CLOCKS[clock]
+    except KeyError:
+        raise ValueError(
+            "unknown clock {!r}, available clocks: {}".format(
+                clock, ", ".join(sorted(CLOCKS))
+            )
+        )
 
 
 class Stopwatch(object):
@@ -18,7 +66,7 @@ class Stopwatch(object):
     logger : :data:`~typing.Callable`
         A callable that accepts `logging_level` as its first argument and a :class:`str` to
         log as its first argument (basically, a :class:`logging.Logger` object). If `None`,
-        use :func:`six.print_`, which is similar to the built-in :func:`print` in Python 3.
+        use the built-in :func:`print`.
         When using with ``end_in_new_line=True``, it requires `end` and `flush` parameters.
     logging_level : int
         If `logger` is not `None`, this is the first argument to be passed to `logger`.
@@ -38,29 +86,172 @@ class Stopwatch(object):
     verbose : bool
         If `False`, turn off all the logs, that is, `verbose_start` and `verbose_end`
         will be set to `False`.
+    clock : Union[str, Callable[[], int]]
+        The clock used to measure the time. It can be a key in :data:`CLOCKS`
+        (``"perf_counter"``, ``"process_time"``, ``"thread_time"`` or ``"task_time"``),
+        or a function returning the current time in nanoseconds as an :class:`int`.
+        (default: ``"perf_counter"``, which is monotonic and is not affected by
+        system clock updates)
+    subtract_overhead : bool
+        Whether to subtract the overhead of entering and exiting the with-block from
+        each split made by the context manager. The overhead is calibrated once per
+        clock using :meth:`calibrate`.
+    max_splits : Optional[int]
+        The maximum number of splits to store. If `None`, store all the splits.
+        Otherwise, only the latest `max_splits` splits are kept in a ring buffer.
+        The statistics in :attr:`splits` always cover all the splits.
+    track_quantiles : bool
+        Whether to add every split to a :class:`~bistiming.sketch.QuantileSketch`
+        (:attr:`splits.sketch <bistiming.splits.SplitHistory.sketch>`), so the
+        quantiles of all the splits can be estimated in constant memory.
+    name : Optional[str]
+        The name of the stopwatch shown in the statistics of
+        :class:`~bistiming.MultiStopwatch`.
+    background_logging : bool
+        If `True`, the logs are formatted and written by a background thread
+        (see :class:`~bistiming.logwriter.BackgroundLogWriter`), so a slow `logger`
+        or stdout never blocks the caller or distorts the elapsed time.
+    sample_every : Optional[int]
+        If not `None`, only time 1 in every `sample_every` with-blocks. The other
+        with-blocks skip reading the clock and logging entirely, and are only
+        counted in :attr:`n_unsampled`.
+    sample_rate : Optional[float]
+        If not `None`, time each with-block with probability `sample_rate`.
+        It cannot be used with `sample_every`.
+    progress_interval : Optional[float]
+        If not `None`, log a progress summary (see
+        :class:`~bistiming.progress.ProgressReporter`) at most once every
+        `progress_interval` seconds instead of logging every start and split.
+        Suitable for a stopwatch timing the body of a long loop.
+    progress_every_splits : Optional[int]
+        If not `None`, log a progress summary every `progress_every_splits` splits
+        instead of logging every start and split.
+    total : Optional[int]
+        The expected total number of splits, which is used to estimate the time
+        remaining in the progress summary.
+    track_memory : Optional[str]
+        If ``"tracemalloc"``, record the net change and the peak increase of the
+        memory allocated by Python in each split (see
+        :class:`~bistiming.probes.TracemallocProbe`). If ``"rss"``, record the change
+        of the resident set size of the process instead (see
+        :class:`~bistiming.probes.RSSProbe`).
+    track_gc : bool
+        Whether to record the time spent in the garbage collector in each split (see
+        :class:`~bistiming.probes.GCProbe`).
+    track_resources : bool
+        Whether to record the process and thread CPU time, the context switches and
+        the block I/O in each split, which show whether the split is CPU-bound or
+        waiting (see :class:`~bistiming.probes.ResourceProbe`).
+    windows : Optional[Iterable[float]]
+        If not `None`, also keep the statistics of the recent splits in sliding
+        windows of these lengths in seconds, e.g., ``(60, 300, 900)`` (see
+        :data:`~bistiming.window.DEFAULT_WINDOWS`), and the exponentially weighted
+        moving average, so a recent change is not hidden by the whole history
+        (see :class:`~bistiming.window.WindowedStatistics`).
 
     Attributes
     ----------
-    split_elapsed_time : List[datetime.timedelta]
-        The elapsed time of each split (excluding the current split).
+    splits : :class:`~bistiming.splits.SplitHistory`
+        The elapsed time in nanoseconds of each split (excluding the current split)
+        and the running statistics of them.
+    n_unsampled : int
+        The number of with-blocks skipped because of sampling.
+    progress : Optional[:class:`~bistiming.progress.ProgressReporter`]
+        The progress reporter if `progress_interval` or `progress_every_splits` is
+        set.
+    probes : Optional[Tuple[:class:`~bistiming.probes.Probe`, ...]]
+        The extra measurements of each split, e.g., created by `track_memory`,
+        `track_gc` and `track_resources`.
+    measurements : Dict[str, :class:`~bistiming.splits.SplitHistory`]
+        The statistics of the measurements of the probes keyed by the field names
+        (e.g., ``"memory_delta"``). The current split is excluded.
+    windowed : Optional[:class:`~bistiming.window.WindowedStatistics`]
+        The statistics of the recent splits if `windows` is set.
+    n_units : int
+        The total number of work units (e.g., rows or bytes) processed, which are
+        added by :meth:`add_units` or the `units` of :meth:`split`.
     """
 
+    __slots__ = (
+        "description",
+        "name",
+        "verbose_start",
+        "verbose_end",
+        "end_in_new_line",
+        "clock",
+        "overhead_ns",
+        "splits",
+        "_logger",
+        "_logging_level",
+        "_log_writer",
+        "sample_every",
+        "sample_rate",
+        "_random",
+        "n_unsampled",
+        "_sampling",
+        "_sample_countdown",
+        "_skipping",
+        "progress",
+        "probes",
+        "measurements",
+        "_probe_states",
+        "_probe_values",
+        "windowed",
+        "n_units",
+        "_start_time",
+        "_elapsed_time",
+        "_cumulative_elapsed_time",
+        "_n_resets",
+    )
+
+    _calibrated_overhead_ns = {}
+
     def __init__(
         self,
         description="",
         logger=None,
-        logging_level=logging.INFO,
+        logging_level=_LOGGING_INFO,
         verbose_start=True,
         verbose_end=True,
         end_in_new_line=True,
         prefix="...",
         verbose=True,
+        clock="perf_counter",
+        subtract_overhead=False,
+        max_splits=None,
+        track_quantiles=False,
+        name=None,
+        background_logging=False,
+        sample_every=None,
+        sample_rate=None,
+        progress_interval=None,
+        progress_every_splits=None,
+        total=None,
+        track_memory=None,
+        track_gc=False,
+        track_resources=False,
+        windows=None,
     ):
-        if logger is not None:
-            self.log = partial(logger.log, logging_level)
+        self._logger = logger
+        self._logging_level = logging_level
+        if background_logging:
+            from .logwriter import get_background_log_writer
+
+            self._log_writer = get_background_log_writer()
         else:
-            self.log = six.print_
+            self._log_writer = None
         self.description = prefix + description
+        self.name = name
+        if progress_interval is not None or progress_every_splits is not None:
+            from .progress import ProgressReporter
+
+            self.progress = ProgressReporter(
+                progress_interval, progress_every_splits, total
+            )
+            # the progress summary replaces the logs of each start and split
+            verbose = False
+        else:
+            self.progress = None
         if verbose:
             self.verbose_start = verbose_start
             self.verbose_end = verbose_end
@@ -68,8 +259,93 @@ class Stopwatch(object):
             self.verbose_start = False
             self.verbose_end = False
         self.end_in_new_line = end_in_new_line
+        self.clock = get_clock(clock)
+        self.overhead_ns = self.calibrate(self.clock) if subtract_overhead else 0
+        if track_quantiles:
+            from .sketch import QuantileSketch
+
+            self.splits = SplitHistory(max_splits, sketch=QuantileSketch())
+        else:
+            self.splits = SplitHistory(max_splits)
+        if sample_every is not None and sample_rate is not None:
+            raise ValueError("sample_every and sample_rate cannot be used together")
+        if sample_every is not None and sample_every < 1:
+            raise ValueError("sample_every should be a positive integer")
+        if sample_rate is not None and not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate should be in (0, 1]")
+        self.sample_every = sample_every
+        self.sample_rate = sample_rate
+        self._sampling = sample_every is not None or sample_rate is not None
+        if sample_rate is not None:
+            import random
+
+            self._random = random.random
+        else:
+            self._random = None
+        if track_memory is not None or track_gc or track_resources:
+            from .probes import create_probes
+
+            self.probes = create_probes(
+                track_memory=track_memory,
+                track_gc=track_gc,
+                track_resources=track_resources,
+            )
+        else:
+            self.probes = None
+        if windows is not None:
+            from .window import WindowedStatistics
+
+            self.windowed = WindowedStatistics(windows)
+        else:
+            self.windowed = None
+        self._n_resets = 0
         self.reset()
 
+    @classmethod
+    def calibrate(cls, clock="perf_counter", n=10000, recalibrate=False):
+        """Measure the overhead of entering and exiting the with-block.
+
+        The result is the median elapsed time of `n` empty with-blocks using a
+        non-verbose stopwatch. It is cached for each clock.
+
+        Parameters
+        ----------
+        clock : Union[str, Callable[[], int]]
+            The clock to calibrate. See `clock` in :class:`Stopwatch`.
+        n : int
+            The number of empty with-blocks to measure.
+        recalibrate : bool
+            If `True`, ignore the cached result and measure again.
+
+        Returns
+        -------
+        overhead_ns : int
+            The overhead in nanoseconds.
+        """
+        clock = get_clock(clock)
+        if recalibrate or clock not in cls._calibrated_overhead_ns:
+            stopwatch = cls(verbose=False, clock=clock)
+            for _ in range(n):
+                with stopwatch:
+                    pass
+            splits = sorted(stopwatch.splits)
+            cls._calibrated_overhead_ns[clock] = splits[len(splits) // 2]
+        return cls._calibrated_overhead_ns[clock]
+
+    def log(self, *args, **kwargs):
+        """Log using `logger` (or :func:`print` if `logger` is `None`)."""
+        if self._logger is None:
+            print(*args, **kwargs)
+        else:
+            self._logger.log(self._logging_level, *args, **kwargs)
+
+    def _log(self, message_format, format_kwargs, **kwargs):
+        # format and log the message, in the background thread if enabled
+        if self._log_writer is None:
+            self.log(message_format.format(**format_kwargs), **kwargs)
+        else:
+            self._log_writer.submit(self, message_format, format_kwargs, kwargs)
+
     def start(self, verbose=None, end_in_new_line=None):
         """Start the stopwatch if it is paused.
 
@@ -83,7 +359,7 @@ class Stopwatch(object):
             If `False`, prevent logging the trailing new line. If `None`, use
             `end_in_new_line` set during initialization.
         """
-        if self._start_time is not None and self._end_time is None:
+        if self._start_time is not None:
             # the stopwatch is already running
             return self
         if verbose is None:
@@ -91,12 +367,16 @@ class Stopwatch(object):
         if verbose:
             if end_in_new_line is None:
                 end_in_new_line = self.end_in_new_line
+            format_kwargs = {"description": self.description}
             if end_in_new_line:
-                self.log(self.description)
+                self._log("{description}", format_kwargs)
             else:
-                self.log(self.description, end="", flush=True)
-        self._end_time = None
-        self._start_time = datetime.datetime.now()
+                self._log("{description}", format_kwargs, end="", flush=True)
+        if self.probes is not None:
+            self._start_probes()
+        self._start_time = self.clock()
+        if _trace_recorder is not None:
+            _trace_recorder.record("B", self)
         return self
 
     def pause(self):
@@ -104,22 +384,91 @@ class Stopwatch(object):
 
         If the stopwatch is already paused, nothing will happen.
         """
-        if self._end_time is not None:
+        if self._start_time is None:
             # the stopwatch is already paused
             return
-        self._end_time = datetime.datetime.now()
-        self._elapsed_time += self._end_time - self._start_time
+        self._elapsed_time += self.clock() - self._start_time
+        self._start_time = None
+        if self.probes is not None:
+            self._stop_probes()
+        if _trace_recorder is not None:
+            _trace_recorder.record("E", self)
 
-    def get_elapsed_time(self):
-        """Get the elapsed time of the current split."""
-        if self._start_time is None or self._end_time is not None:
+    def get_elapsed_time_ns(self):
+        """Get the elapsed time of the current split in nanoseconds."""
+        if self._start_time is None:
             # the stopwatch is paused
             return self._elapsed_time
-        return self._elapsed_time + (datetime.datetime.now() - self._start_time)
+        return self._elapsed_time + (self.clock() - self._start_time)
+
+    @property
+    def version(self):
+        """Optional[Hashable]: A value which changes whenever the statistics change.
+
+        It is derived from the counters updated by each split, so it costs nothing
+        on the timing path. It is `None` while the stopwatch is running because the
+        elapsed time of the current split keeps changing, and if `windows` is set
+        because the windowed statistics change over time. It is used to cache the
+        statistics of :class:`~bistiming.MultiStopwatch`.
+        """
+        if self._start_time is not None or self.windowed is not None:
+            return None
+        return (
+            self._n_resets,
+            self.n_units,
+            self.splits.count,
+            self.n_unsampled,
+            self._cumulative_elapsed_time,
+            self._elapsed_time,
+        )
+
+    def get_elapsed_time(self):
+        """Get the elapsed time of the current split."""
+        return ns_to_timedelta(self.get_elapsed_time_ns())
+
+    def get_cumulative_elapsed_time_ns(self):
+        """Get the cumulative elapsed time in nanoseconds without considering splits."""
+        return self._cumulative_elapsed_time + self.get_elapsed_time_ns()
 
     def get_cumulative_elapsed_time(self):
         """Get the cumulative elapsed time without considering splits."""
-        return self._cumulative_elapsed_time + self.get_elapsed_time()
+        return ns_to_timedelta(self.get_cumulative_elapsed_time_ns())
+
+    def get_estimated_cumulative_elapsed_time_ns(self):
+        """Estimate the cumulative elapsed time in nanoseconds under sampling.
+
+        The measured cumulative elapsed time is scaled by the ratio of all the
+        with-blocks to the sampled ones, which is an unbiased estimate.
+        Without sampling, this is the same as :meth:`get_cumulative_elapsed_time_ns`.
+        """
+        return estimate_total(
+            self.get_cumulative_elapsed_time_ns(), self.splits.count, self.n_unsampled
+        )
+
+    @property
+    def split_elapsed_time_ns(self):
+        """List[int]: The stored elapsed time in nanoseconds of each split.
+
+        The current split is excluded. This is a copy of :attr:`splits`.
+        """
+        return list(self.splits)
+
+    @property
+    def split_elapsed_time(self):
+        """List[datetime.timedelta]: The stored elapsed time of each split.
+
+        The current split is excluded.
+        The :class:`datetime.timedelta` objects are created on access from
+        :attr:`splits`.
+        """
+        return [ns_to_timedelta(t) for t in self.splits]
+
+    def to_numpy(self, copy=True):
+        """Get the stored elapsed time of each split in nanoseconds as a NumPy array.
+
+        See :meth:`~bistiming.splits.SplitHistory.to_numpy`.
+        """
+        return self.splits.to_numpy(copy=copy)
 
     def log_elapsed_time(self, prefix="Elapsed time: "):
         """Log the elapsed time of the current split.
@@ -129,17 +478,53 @@ class Stopwatch(object):
         prefix : str
             The prefix of the log.
         """
-        self.log("{}{}".format(prefix, self.get_elapsed_time()))
+        self._log(
+            "{prefix}{elapsed_time}",
+            {"prefix": prefix, "elapsed_time": self.get_elapsed_time()},
+        )
+
+    def add_units(self, units):
+        """Add the number of work units (e.g., rows or bytes) processed.
+
+        The units are used to compute the throughput (see :meth:`get_throughput`).
+        It can be called inside a with-block after the work is done::
+
+            with stopwatch:
+                rows = load()
+                stopwatch.add_units(len(rows))
+
+        Parameters
+        ----------
+        units : Union[int, float]
+        """
+        self.n_units += units
+
+    def get_throughput(self):
+        """Get the number of work units processed per second.
+
+        The estimated cumulative elapsed time (including the current split) is used
+        (see :meth:`get_estimated_cumulative_elapsed_time_ns`).
+
+        Returns
+        -------
+        throughput : Optional[float]
+            `None` if there is no work unit or no elapsed time.
+        """
+        elapsed_time = self.get_estimated_cumulative_elapsed_time_ns()
+        if not self.n_units or not elapsed_time:
+            return None
+        return self.n_units / elapsed_time * 1e9
 
     def split(
         self,
         verbose=None,
         end_in_new_line=None,
         message_format="done in {elapsed_time}",
+        units=None,
     ):
         """Save the elapsed time of the current split and restart the stopwatch.
 
-        The current elapsed time will be appended to :attr:`split_elapsed_time`.
+        The current elapsed time will be appended to :attr:`splits`.
         If the stopwatch is paused, then it will remain paused.
         Otherwise, it will continue running.
 
@@ -154,39 +539,193 @@ class Stopwatch(object):
             The string that will be formatted using ``message_format.format(...)``
             and be logged as the ending message.
             Available variables: `elapsed_time`.
+        units : Optional[Union[int, float]]
+            The number of work units processed in this split (see
+            :meth:`add_units`).
         """
-        elapsed_time = self.get_elapsed_time()
-        self.split_elapsed_time.append(elapsed_time)
+        if units is not None:
+            self.n_units += units
+        elapsed_time = self.get_elapsed_time_ns()
+        self.splits.append(elapsed_time)
         self._cumulative_elapsed_time += elapsed_time
-        self._elapsed_time = datetime.timedelta()
+        self._elapsed_time = 0
+        if self.probes is not None:
+            if self._start_time is not None:
+                self._stop_probes()
+            self._record_probes()
         if verbose is None:
             verbose = self.verbose_end
         if verbose:
-            message = message_format.format(elapsed_time=elapsed_time)
+            format_kwargs = {
+                "description": self.description,
+                "elapsed_time": ns_to_timedelta(elapsed_time),
+            }
             if end_in_new_line is None:
                 end_in_new_line = self.end_in_new_line
             if end_in_new_line:
-                self.log("{} {}".format(self.description, message))
+                self._log("{description} " + message_format, format_kwargs)
             else:
-                self.log(" {}".format(message))
-        self._start_time = datetime.datetime.now()
+                self._log(" " + message_format, format_kwargs)
+        if self.windowed is not None:
+            self.windowed.append(elapsed_time)
+        if self.progress is not None:
+            self.progress.update(self, elapsed_time)
+        if self._start_time is not None:
+            if _trace_recorder is not None:
+                _trace_recorder.record("i", self, {"elapsed_time_ns": elapsed_time})
+            if self.probes is not None:
+                self._start_probes()
+            self._start_time = self.clock()
+
+    def add_split(self, elapsed_time, units=None):
+        """Record a split measured outside of the stopwatch without logging.
+
+        The current split is not affected.
+
+        Parameters
+        ----------
+        elapsed_time : int
+            The elapsed time of the split in nanoseconds.
+        units : Optional[Union[int, float]]
+            The number of work units processed in the split (see :meth:`add_units`).
+        """
+        if units is not None:
+            self.n_units += units
+        self.splits.append(elapsed_time)
+        self._cumulative_elapsed_time += elapsed_time
+        if _trace_recorder is not None:
+            _trace_recorder.record("X", self, duration_ns=elapsed_time)
+        if self.windowed is not None:
+            self.windowed.append(elapsed_time)
+        if self.progress is not None:
+            self.progress.update(self, elapsed_time)
+
+    def snapshot(self):
+        """Take a picklable snapshot of the statistics.
+
+        Returns
+        -------
+        snapshot : :class:`~bistiming.snapshot.StopwatchSnapshot`
+        """
+        from .snapshot import StopwatchSnapshot
+
+        return StopwatchSnapshot.from_stopwatch(self)
+
+    def merge(self, snapshot):
+        """Add the statistics in a snapshot (e.g., from another process).
+
+        Parameters
+        ----------
+        snapshot : :class:`~bistiming.snapshot.StopwatchSnapshot`
+        """
+        self._cumulative_elapsed_time += snapshot.cumulative_elapsed_time_ns
+        self.n_units += snapshot.units
+        self.n_unsampled += snapshot.n_unsampled
+        self.splits.merge(snapshot.splits)
 
     def reset(self):
         """Reset the stopwatch."""
+        self._n_resets += 1
         self._start_time = None
-        self._end_time = None
-        self._elapsed_time = datetime.timedelta()
-        self._cumulative_elapsed_time = datetime.timedelta()
-        self.split_elapsed_time = []
+        self._elapsed_time = 0
+        self._cumulative_elapsed_time = 0
+        self.n_units = 0
+        self.splits.clear()
+        self.n_unsampled = 0
+        self._sample_countdown = 1
+        self._skipping = False
+        if self.progress is not None:
+            self.progress.reset()
+        if self.windowed is not None:
+            self.windowed.clear()
+        self.measurements = {}
+        if self.probes is not None:
+            for probe in self.probes:
+                for field in probe.fields:
+                    self.measurements[field] = SplitHistory(max_splits=0)
+        self._probe_states = None
+        self._probe_values = [0] * len(self.measurements)
+
+    def _start_probes(self):
+        self._probe_states = [probe.start() for probe in self.probes]
+
+    def _stop_probes(self):
+        offset = 0
+        for probe, state in zip(self.probes, self._probe_states):
+            probe.stop(state, self._probe_values, offset)
+            offset += len(probe.fields)
+        self._probe_states = None
+
+    def _record_probes(self):
+        for history, value in zip(self.measurements.values(), self._probe_values):
+            history.append(value)
+        self._probe_values = [0] * len(self._probe_values)
+
+    def _sample(self):
+        if self.sample_every is not None:
+            self._sample_countdown -= 1
+            if self._sample_countdown > 0:
+                return False
+            self._sample_countdown = self.sample_every
+            return True
+        return self._random() < self.sample_rate
 
     def __enter__(self):
         """Call :meth:`start`."""
-        return self.start()
+        if self._sampling and not self._sample():
+            # skip this with-block without reading the clock
+            self._skipping = True
+            return self
+        if self.verbose_start:
+            return self.start()
+        # fast path without logging
+        if self._start_time is None:
+            if self.probes is not None:
+                self._start_probes()
+            self._start_time = self.clock()
+            if _trace_recorder is not None:
+                _trace_recorder.record("B", self)
+        return self
 
     def __exit__(self, exc_type, exc, exc_tb):
         """Call :meth:`pause` and then :meth:`split`."""
-        self.pause()
-        if exc_type is None:
-            self.split()
-        else:
-            self.split(message_format="got exception in {elapsed_time}")
+        if self._skipping:
+            self._skipping = False
+            self.n_unsampled += 1
+            return
+        end_time = self.clock()
+        elapsed_time = self._elapsed_time
+        if self._start_time is not None:
+            elapsed_time += end_time - self._start_time
+            self._start_time = None
+            if self.probes is not None:
+                self._stop_probes()
+            if _trace_recorder is not None:
+                _trace_recorder.record("E", self)
+        if self.overhead_ns:
+            elapsed_time = max(elapsed_time - self.overhead_ns, 0)
+        if self.verbose_end:
+            self._elapsed_time = elapsed_time
+            if exc_type is None:
+                self.split()
+            else:
+                self.split(message_format="got exception in {elapsed_time}")
+            return
+        # fast path without logging
+        self.splits.append(elapsed_time)
+        self._cumulative_elapsed_time += elapsed_time
+        self._elapsed_time = 0
+        if self.probes is not None:
+            self._record_probes()
+        if self.windowed is not None:
+            self.windowed.append(elapsed_time)
+        if self.progress is not None:
+            self.progress.update(self, elapsed_time)
+
+    async def __aenter__(self):
+        """Call :meth:`__enter__`."""
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, exc_tb):
+        """Call :meth:`__exit__`."""
+        self.__exit__(exc_type, exc, exc_tb)
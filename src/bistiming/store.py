@@ -0,0 +1,420 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import argparse
+from collections import namedtuple
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+
+from .snapshot import MultiStopwatchSnapshot, StopwatchSnapshot
+from .splits import SplitHistory
+from .utils import ns_to_timedelta, student_t_sf
+
+
+def _get_cpu_name():
+    try:
+        with io.open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _get_commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode("ascii").strip()
+
+
+def collect_metadata():
+    """Collect the metadata of the environment for a stored result.
+
+    Returns
+    -------
+    metadata : Dict[str, Any]
+        The keys are `timestamp` (ISO 8601 in UTC), `python_version`,
+        `python_implementation`, `platform`, `cpu`, `cpu_count`, `hostname` and
+        `commit` (the git commit of the current directory, or `None`) and
+        `bistiming_version` (`None` if the package metadata is not installed).
+    """
+    try:
+        from . import __version__
+    except ImportError:
+        # including importlib.metadata.PackageNotFoundError
+        __version__ = None
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu": _get_cpu_name(),
+        "cpu_count": os.cpu_count(),
+        "hostname": socket.gethostname(),
+        "commit": _get_commit(),
+        "bistiming_version": __version__,
+    }
+
+
+class StoredResult(object):
+    """The statistics of a :class:`~bistiming.MultiStopwatch` stored with metadata.
+
+    Only the aggregated statistics of the splits (count, sum, sum of squares,
+    minimum and maximum) are stored, which are enough for comparing the means.
+
+    Parameters
+    ----------
+    names : List[str]
+        The names of the stopwatches (see
+        :meth:`~bistiming.MultiStopwatch.get_names`).
+    snapshot : :class:`~bistiming.snapshot.MultiStopwatchSnapshot`
+        The statistics of the stopwatches.
+    label : Optional[str]
+        The label of this result, e.g., the branch name or ``"baseline"``.
+    metadata : Optional[Dict[str, Any]]
+        The metadata of the environment. If `None`, :func:`collect_metadata` is used.
+    """
+
+    def __init__(self, names, snapshot, label=None, metadata=None):
+        if len(names) != len(snapshot):
+            raise ValueError("the number of names and stopwatches should be the same")
+        self.names = [str(name) for name in names]
+        self.snapshot = snapshot
+        self.label = label
+        self.metadata = collect_metadata() if metadata is None else metadata
+
+    @classmethod
+    def from_multistopwatch(cls, multi_stopwatch, label=None, metadata=None):
+        """Create a result from a :class:`~bistiming.MultiStopwatch`."""
+        return cls(
+            multi_stopwatch.get_names(),
+            multi_stopwatch.snapshot(),
+            label=label,
+            metadata=metadata,
+        )
+
+    def to_dict(self):
+        """Convert to a JSON-serializable dictionary."""
+        stopwatches = []
+        for name, snapshot in zip(self.names, self.snapshot):
+            splits = snapshot.splits
+            stopwatches.append(
+                {
+                    "name": name,
+                    "cumulative_elapsed_time_ns": snapshot.cumulative_elapsed_time_ns,
+                    "count": splits.count,
+                    "sum": splits.sum,
+                    "sum_of_squares": splits.sum_of_squares,
+                    "min": splits.min,
+                    "max": splits.max,
+                    "units": snapshot.units,
+                    "n_unsampled": snapshot.n_unsampled,
+                }
+            )
+        return {
+            "label": self.label,
+            "metadata": self.metadata,
+            "stopwatches": stopwatches,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a result from a dictionary created by :meth:`to_dict`."""
+        snapshot = MultiStopwatchSnapshot()
+        for stopwatch in data["stopwatches"]:
+            splits = SplitHistory(max_splits=0)
+            splits.count = stopwatch["count"]
+            splits.sum = stopwatch["sum"]
+            splits.sum_of_squares = stopwatch["sum_of_squares"]
+            splits.min = stopwatch["min"]
+            splits.max = stopwatch["max"]
+            snapshot.append(
+                StopwatchSnapshot(
+                    stopwatch["cumulative_elapsed_time_ns"],
+                    splits,
+                    stopwatch.get("units", 0),
+                    stopwatch.get("n_unsampled", 0),
+                )
+            )
+        return cls(
+            [stopwatch["name"] for stopwatch in data["stopwatches"]],
+            snapshot,
+            label=data.get("label"),
+            metadata=data.get("metadata", {}),
+        )
+
+    def __repr__(self):
+        return "<{} label={!r} names={!r}>".format(
+            type(self).__name__, self.label, self.names
+        )
+
+
+class ResultStore(object):
+    """An append-only store of :class:`StoredResult` in a JSON Lines file.
+
+    Each line is a result converted by :meth:`StoredResult.to_dict`, so the file
+    can be appended by multiple runs (and processes) and inspected by other tools.
+
+    Parameters
+    ----------
+    path : str
+        The path of the JSON Lines file. It is created when the first result is
+        saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, multi_stopwatch, label=None, metadata=None):
+        """Append the statistics of a :class:`~bistiming.MultiStopwatch` to the store.
+
+        Parameters
+        ----------
+        multi_stopwatch : :class:`~bistiming.MultiStopwatch` or :class:`StoredResult`
+            The stopwatches to save, or a result created beforehand.
+        label : Optional[str]
+            The label of the result. Ignored if `multi_stopwatch` is a
+            :class:`StoredResult`.
+        metadata : Optional[Dict[str, Any]]
+            The metadata of the environment. If `None`, :func:`collect_metadata` is
+            used. Ignored if `multi_stopwatch` is a :class:`StoredResult`.
+
+        Returns
+        -------
+        result : :class:`StoredResult`
+        """
+        if isinstance(multi_stopwatch, StoredResult):
+            result = multi_stopwatch
+        else:
+            result = StoredResult.from_multistopwatch(
+                multi_stopwatch, label=label, metadata=metadata
+            )
+        line = json.dumps(result.to_dict(), sort_keys=True) + "\n"
+        # a single write call in append mode, so the concurrent writers don't
+        # interleave their lines
+        with io.open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+        return result
+
+    def load(self, label=None):
+        """Load the stored results in the order they were saved.
+
+        Parameters
+        ----------
+        label : Optional[str]
+            If not `None`, only load the results with this label.
+
+        Returns
+        -------
+        results : List[:class:`StoredResult`]
+        """
+        if not os.path.exists(self.path):
+            return []
+        results = []
+        with io.open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = StoredResult.from_dict(json.loads(line))
+                if label is None or result.label == label:
+                    results.append(result)
+        return results
+
+    def get_latest(self, label=None, offset=0):
+        """Get the latest result (with the label).
+
+        Parameters
+        ----------
+        label : Optional[str]
+            If not `None`, only consider the results with this label.
+        offset : int
+            The number of the latest results to skip, e.g., 1 for the previous one.
+
+        Returns
+        -------
+        result : :class:`StoredResult`
+        """
+        results = self.load(label)
+        if len(results) <= offset:
+            raise LookupError(
+                "there are only {} results with label {!r} in {}".format(
+                    len(results), label, self.path
+                )
+            )
+        return results[-1 - offset]
+
+
+Comparison = namedtuple(
+    "Comparison",
+    [
+        "name",
+        "baseline_mean",
+        "mean",
+        "ratio",
+        "p_value",
+        "is_regression",
+    ],
+)
+Comparison.__doc__ = """The comparison of a stopwatch between two results.
+
+The means are :class:`datetime.timedelta` per split. `ratio` is the mean divided by
+the baseline mean. `p_value` is the one-sided p-value of Welch's t-test with the
+alternative hypothesis that the mean is larger than the baseline mean.
+"""
+
+
+def welch_t_test(baseline_splits, splits):
+    """One-sided Welch's t-test whether the mean of `splits` is larger.
+
+    Parameters
+    ----------
+    baseline_splits : :class:`~bistiming.splits.SplitHistory`
+    splits : :class:`~bistiming.splits.SplitHistory`
+
+    Returns
+    -------
+    p_value : Optional[float]
+        `None` if any of them has less than 2 splits.
+    """
+    n1 = baseline_splits.count
+    n2 = splits.count
+    if n1 < 2 or n2 < 2:
+        return None
+    difference = splits.mean - baseline_splits.mean
+    v1 = baseline_splits.variance / n1
+    v2 = splits.variance / n2
+    if v1 + v2 == 0:
+        return 0.0 if difference > 0 else 1.0
+    t = difference / math.sqrt(v1 + v2)
+    df = (v1 + v2) ** 2 / (v1**2 / (n1 - 1) + v2**2 / (n2 - 1))
+    return student_t_sf(t, df)
+
+
+def compare(baseline, result, alpha=0.05, threshold=0.0):
+    """Compare a result against a baseline stopwatch by stopwatch.
+
+    The stopwatches are matched by their names. A stopwatch is a regression if its
+    mean per split is significantly larger than the baseline (the p-value of the
+    one-sided Welch's t-test is less than `alpha`) and the relative slowdown is
+    larger than `threshold`.
+
+    Parameters
+    ----------
+    baseline : :class:`StoredResult`
+    result : :class:`StoredResult`
+    alpha : float
+        The significance level.
+    threshold : float
+        The minimum relative slowdown to be reported, e.g., 0.05 for 5%.
+
+    Returns
+    -------
+    comparisons : List[:class:`Comparison`]
+        The comparisons of the stopwatches in both results, in the order of
+        `result`.
+    """
+    baseline_splits = {
+        name: snapshot.splits
+        for name, snapshot in zip(baseline.names, baseline.snapshot)
+    }
+    comparisons = []
+    for name, snapshot in zip(result.names, result.snapshot):
+        if name not in baseline_splits:
+            continue
+        splits = snapshot.splits
+        base = baseline_splits[name]
+        ratio = splits.mean / base.mean if base.mean else None
+        p_value = welch_t_test(base, splits)
+        is_regression = (
+            p_value is not None
+            and p_value < alpha
+            and ratio is not None
+            and ratio > 1 + threshold
+        )
+        comparisons.append(
+            Comparison(
+                name,
+                ns_to_timedelta(base.mean),
+                ns_to_timedelta(splits.mean),
+                ratio,
+                p_value,
+                is_regression,
+            )
+        )
+    return comparisons
+
+
+def format_comparisons(comparisons, tablefmt="fancy_grid"):
+    """Format the comparisons using tabulate.
+
+    Parameters
+    ----------
+    comparisons : List[:class:`Comparison`]
+    tablefmt: str
+        See the available options in
+        `tabulate's documentation <https://github.com/astanin/python-tabulate#table-format>`_.
+    """
+    from tabulate import tabulate
+
+    return tabulate(comparisons, headers=Comparison._fields, tablefmt=tablefmt)
+
+
+def main(argv=None):
+    """Compare the latest result against a baseline in a store.
+
+    Exit with status 1 if there is any regression.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m bistiming.store",
+        description="Compare the benchmark results in a JSON Lines result store.",
+    )
+    parser.add_argument("path", help="the path of the result store")
+    parser.add_argument(
+        "--baseline",
+        help="the label of the baseline (default: the result before the latest one)",
+    )
+    parser.add_argument(
+        "--label", help="the label of the result to check (default: the latest one)"
+    )
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.0,
+        help="the minimum relative slowdown to be a regression (e.g., 0.05)",
+    )
+    parser.add_argument("--tablefmt", default="simple")
+    args = parser.parse_args(argv)
+
+    store = ResultStore(args.path)
+    try:
+        result = store.get_latest(args.label)
+        if args.baseline is None:
+            baseline = store.get_latest(args.label, offset=1)
+        else:
+            baseline = store.get_latest(args.baseline)
+    except LookupError as e:
+        parser.error(str(e))
+    comparisons = compare(baseline, result, alpha=args.alpha, threshold=args.threshold)
+    print(format_comparisons(comparisons, tablefmt=args.tablefmt))
+    regressions = [c.name for c in comparisons if c.is_regression]
+    if regressions:
+        print("regression detected: " + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
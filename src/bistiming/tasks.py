@@ -0,0 +1,139 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import collections.abc
+import contextvars
+import time
+
+
+_task_timer = contextvars.ContextVar("bistiming_task_timer", default=None)
+
+
+class _TaskTimer(object):
+    __slots__ = ("running_time", "step_start_time")
+
+    def __init__(self):
+        self.running_time = 0
+        self.step_start_time = None
+
+
+class TimedCoroutine(collections.abc.Coroutine):
+    """Wrap a coroutine to measure the time it is actually running on the event loop.
+
+    Each step of the task (each :meth:`send` or :meth:`throw` called by the event
+    loop) is timed using :func:`time.perf_counter_ns`, so the time the task spends
+    suspended in ``await`` is excluded. The running time can be read using
+    :func:`task_time_ns` inside the task.
+
+    Parameters
+    ----------
+    coro : :class:`collections.abc.Coroutine`
+        The coroutine to wrap.
+    """
+
+    __slots__ = ("_coro", "_timer")
+
+    def __init__(self, coro):
+        self._coro = coro
+        self._timer = _TaskTimer()
+
+    def _enter_step(self):
+        if _task_timer.get() is not self._timer:
+            # the task context is copied from the parent, so replace the parent timer
+            _task_timer.set(self._timer)
+        self._timer.step_start_time = time.perf_counter_ns()
+
+    def _exit_step(self):
+        timer = self._timer
+        timer.running_time += time.perf_counter_ns() - timer.step_start_time
+        timer.step_start_time = None
+
+    def send(self, value):
+        self._enter_step()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._exit_step()
+
+    def throw(self, *args):
+        self._enter_step()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._exit_step()
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def __repr__(self):
+        return "<{} wrapping {!r}>".format(type(self).__name__, self._coro)
+
+
+def install_task_timer(loop=None):
+    """Time the running steps of all the tasks created afterwards in the event loop.
+
+    A task factory wrapping the coroutines in :class:`TimedCoroutine` is installed,
+    chaining the existing task factory if there is one. Tasks created before calling
+    this function (e.g., the main task of :func:`asyncio.run`) are not timed.
+
+    Parameters
+    ----------
+    loop : Optional[:class:`asyncio.AbstractEventLoop`]
+        The event loop. If `None`, use the running event loop.
+    """
+    import asyncio
+
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    previous_factory = loop.get_task_factory()
+    if getattr(previous_factory, "_bistiming_task_timer", False):
+        # already installed
+        return
+
+    def task_factory(loop, coro, **kwargs):
+        coro = TimedCoroutine(coro)
+        if previous_factory is not None:
+            return previous_factory(loop, coro, **kwargs)
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        if task._source_traceback:
+            del task._source_traceback[-1]
+        return task
+
+    task_factory._bistiming_task_timer = True
+    loop.set_task_factory(task_factory)
+
+
+def task_time_ns():
+    """Get the time the current task has been running on the event loop.
+
+    The time the task spends suspended in ``await`` is excluded. It can be used as
+    the clock of :class:`~bistiming.Stopwatch` (``clock="task_time"``) to separate
+    the CPU-bound cost of a coroutine from the I/O waiting time.
+
+    Returns
+    -------
+    running_time : int
+        The running time of the current task in nanoseconds.
+
+    Raises
+    ------
+    RuntimeError
+        If the current task is not created after :func:`install_task_timer`.
+    """
+    timer = _task_timer.get()
+    if timer is None:
+        raise RuntimeError(
+            "task_time_ns() can only be called in a task created after "
+            "install_task_timer()"
+        )
+    if timer.step_start_time is None:
+        return timer.running_time
+    return timer.running_time + (time.perf_counter_ns() - timer.step_start_time)
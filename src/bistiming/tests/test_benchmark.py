@@ -0,0 +1,92 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import gc
+
+import pytest
+
+from bistiming import Benchmark
+from .utils import FakeClock
+
+
+def test_benchmark():
+    clock = FakeClock()
+
+    def slow():
+        clock.now += 300
+
+    def fast():
+        clock.now += 100
+
+    benchmark = Benchmark(
+        {"slow": slow, "fast": fast}, repeat=5, warmup=2, number=10, clock=clock
+    )
+    assert benchmark.run() is benchmark
+    statistics = benchmark.get_statistics()
+    assert statistics["name"] == ["slow", "fast"]
+    assert statistics["n_rounds"] == [5, 5]
+    assert statistics["number"] == [10, 10]
+    assert [t.microseconds for t in statistics["median"]] == [0, 0]
+    assert [sw.splits.quantile(0.5) for sw in benchmark] == [300, 100]
+    assert benchmark.get_speedup() == [1.0, 3.0]
+    assert benchmark.get_speedup("fast") == [1 / 3, 1.0]
+    assert statistics["n_outliers"] == [0, 0]
+    assert "speedup" in benchmark.format_statistics()
+    assert "p90" in benchmark.format_statistics(quantiles=(0.9,), baseline="fast")
+    statistics = benchmark.get_statistics((0.5,), top_k=1, baseline="fast")
+    assert statistics["name"] == ["slow"]
+    assert statistics["p50"] == statistics["median"]
+    assert statistics["speedup"] == [1 / 3]
+
+    # rerunning clears the previous results
+    benchmark.run()
+    assert benchmark.get_n_splits() == [5, 5]
+
+
+def test_benchmark_autorange():
+    clock = FakeClock()
+
+    def func(x, y=0):
+        assert (x, y) == (1, 2)
+        clock.now += 1000
+
+    benchmark = Benchmark(
+        [func], args=(1,), kwargs={"y": 2}, repeat=3, min_round_time=1e-4, clock=clock
+    )
+    benchmark.run()
+    # at least 100 microseconds per round
+    assert benchmark.numbers == [100]
+    assert benchmark.get_names() == [func.__qualname__]
+
+
+def test_benchmark_disable_gc():
+    states = []
+    benchmark = Benchmark([lambda: states.append(gc.isenabled())], number=1)
+    assert gc.isenabled()
+    benchmark.run()
+    assert not any(states)
+    assert gc.isenabled()
+
+    states = []
+    benchmark.disable_gc = False
+    benchmark.run()
+    assert all(states)
+
+
+def test_benchmark_outliers_and_confidence_interval():
+    clock = FakeClock()
+    times = iter([100, 101, 99, 100, 101, 99, 100, 1000, 100, 101, 100])
+
+    def func():
+        clock.now += next(times)
+
+    benchmark = Benchmark([func], repeat=11, warmup=0, number=1, clock=clock)
+    benchmark.run()
+    assert benchmark.get_n_outliers() == [1]
+    ((low, high),) = benchmark.get_median_confidence_interval()
+    assert low.microseconds == 0 and high.microseconds == 0
+    assert benchmark.get_iqr()[0] is not None
+
+
+def test_benchmark_no_candidate():
+    with pytest.raises(ValueError):
+        Benchmark([])
@@ -0,0 +1,141 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import json
+import sys
+import textwrap
+
+import pytest
+
+from bistiming import MultiStopwatch
+from bistiming.cli import instrument_by_name, main
+
+MODULE = """
+import time
+
+
+def load(n):
+    time.sleep(0.001 * n)
+    return n
+
+
+class Parser(object):
+    def parse(self, x):
+        return x
+
+    @staticmethod
+    def helper():
+        return 1
+"""
+
+SCRIPT = """
+import sys
+
+import bistiming_cli_work
+
+for i in range(3):
+    bistiming_cli_work.load(1)
+    bistiming_cli_work.Parser().parse(i)
+print(sys.argv[1:])
+sys.exit(3)
+"""
+
+
+@pytest.fixture
+def work_module(tmp_path, monkeypatch):
+    (tmp_path / "bistiming_cli_work.py").write_text(textwrap.dedent(MODULE))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    sys.modules.pop("bistiming_cli_work", None)
+
+
+def test_instrument_by_name(work_module):
+    import bistiming_cli_work
+
+    timers = MultiStopwatch()
+    instrument_by_name("bistiming_cli_work.Parser.helper", timers)
+    assert bistiming_cli_work.Parser.helper() == 1
+    assert timers.get_names() == ["bistiming_cli_work.Parser.helper"]
+    instrument_by_name("bistiming_cli_work", timers)
+    assert bistiming_cli_work.load(2) == 2
+    assert bistiming_cli_work.Parser().parse(5) == 5
+    # the instrumented Parser.helper is not instrumented again
+    assert timers.get_names() == [
+        "bistiming_cli_work.Parser.helper",
+        "bistiming_cli_work.load",
+        "bistiming_cli_work.Parser.parse",
+    ]
+    assert timers.get_n_splits() == [1, 1, 1]
+    with pytest.raises(TypeError):
+        instrument_by_name("bistiming_cli_work.time.__name__", timers)
+    with pytest.raises(ImportError):
+        instrument_by_name("bistiming_no_such_module", timers)
+
+
+def test_profile_script(work_module, capsys):
+    script = work_module / "job.py"
+    script.write_text(textwrap.dedent(SCRIPT))
+    output = work_module / "result.json"
+    argv = sys.argv[:]
+    exit_code = main(
+        ["-i", "bistiming_cli_work", "-o", str(output), str(script), "a", "--b"]
+    )
+    assert exit_code == 3
+    assert sys.argv == argv
+    captured = capsys.readouterr()
+    assert captured.out == "['a', '--b']\n"
+    assert "bistiming_cli_work.Parser.parse" in captured.err
+    result = json.loads(output.read_text())
+    assert result["exit_code"] == 3
+    assert result["args"] == ["a", "--b"]
+    assert result["statistics"]["n_splits"] == [3, 3, 0]
+    assert result["statistics"]["cumulative_elapsed_time"][0] > 0.003
+
+
+def test_profile_script_exception(work_module, capsys):
+    script = work_module / "job.py"
+    script.write_text(
+        "import bistiming_cli_work\n"
+        "bistiming_cli_work.load(1)\n"
+        "raise ValueError('broken job')\n"
+    )
+    output = work_module / "result.json"
+    assert main(["-i", "bistiming_cli_work.load", "-o", str(output), str(script)]) == 1
+    err = capsys.readouterr().err
+    assert "ValueError: broken job" in err
+    assert "bistiming_cli_work.load" in err
+    result = json.loads(output.read_text())
+    assert result["exit_code"] == 1
+    assert result["statistics"]["n_splits"] == [1]
+
+
+def test_profile_module(work_module, capsys):
+    (work_module / "bistiming_cli_job.py").write_text(textwrap.dedent(SCRIPT))
+    try:
+        assert main(["-i", "bistiming_cli_work.load", "-m", "bistiming_cli_job"]) == 3
+    finally:
+        sys.modules.pop("bistiming_cli_job", None)
+    assert "bistiming_cli_work.load" in capsys.readouterr().err
+
+
+def test_module_options(work_module, capsys):
+    (work_module / "bistiming_cli_job.py").write_text(textwrap.dedent(SCRIPT))
+    try:
+        # the options of the module are not parsed by bistiming
+        assert main(["-m", "bistiming_cli_job", "--sort-keys", "-i", "x"]) == 3
+        assert capsys.readouterr().out == "['--sort-keys', '-i', 'x']\n"
+        assert main(["-r", "2", "-mbistiming_cli_job", "--help"]) == 3
+        assert capsys.readouterr().out == "['--help']\n"
+    finally:
+        sys.modules.pop("bistiming_cli_job", None)
+
+
+def test_benchmark_commands(capsys):
+    command = '"{}" -c pass'.format(sys.executable)
+    assert main(["-c", command, "-c", "exit 0", "--runs", "3", "-w", "0"]) == 0
+    output = capsys.readouterr().out
+    assert "speedup" in output
+    assert "exit 0" in output
+    assert main(["-c", "exit 2", "--runs", "1"]) == 1
+    assert "exit code 2" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main(["-c", "exit 0", "script.py"])
@@ -0,0 +1,83 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import subprocess
+import sys
+
+
+# the modules that are slow to import and only needed by some features
+LAZY_MODULES = (
+    "tabulate",
+    "importlib.metadata",
+    "importlib_metadata",
+    "asyncio",
+    "logging",
+    "inspect",
+    "json",
+    "six",
+    "numpy",
+    "pandas",
+    "random",
+)
+# the submodules only needed by some features
+LAZY_SUBMODULES = (
+    "bistiming.benchmark",
+    "bistiming.instrument",
+    "bistiming.local",
+    "bistiming.logwriter",
+    "bistiming.probes",
+    "bistiming.progress",
+    "bistiming.sketch",
+    "bistiming.snapshot",
+    "bistiming.tracing",
+    "bistiming.tree",
+    "bistiming.window",
+)
+
+
+def get_import_times(statement):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stderr
+    import_times = {}
+    for line in output.splitlines()[1:]:
+        _, cumulative, module = line.split("|")
+        import_times[module.strip()] = int(cumulative)
+    return import_times
+
+
+def test_import_time():
+    # exclude the modules imported during the interpreter startup (e.g., by site)
+    startup_modules = set(get_import_times("pass"))
+    import_times = get_import_times("import bistiming")
+    assert "bistiming" in import_times
+    imported_lazy_modules = [
+        module
+        for module in LAZY_MODULES
+        if module in import_times and module not in startup_modules
+    ]
+    assert imported_lazy_modules == []
+    assert [module for module in LAZY_SUBMODULES if module in import_times] == []
+
+
+def test_lazy_imports():
+    import_times = get_import_times(
+        "import bistiming; bistiming.__version__; "
+        "bistiming.MultiStopwatch(1, verbose=False).format_statistics"
+    )
+    assert "importlib.metadata" in import_times or "importlib_metadata" in import_times
+    assert "tabulate" not in import_times
+
+
+def test_lazy_attributes():
+    import_times = get_import_times(
+        "from bistiming import Benchmark, StopwatchTree, TaskLocalStopwatch, timed; "
+        "import bistiming; bistiming.ThreadLocalStopwatch"
+    )
+    assert "bistiming.benchmark" in import_times
+    assert "bistiming.tree" in import_times
+    assert "bistiming.local" in import_times
+    assert "bistiming.instrument" in import_times
+    assert "bistiming.tracing" not in import_times
@@ -0,0 +1,112 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import asyncio
+from time import sleep
+
+import pytest
+
+from bistiming import MultiStopwatch, timed
+from bistiming import instrument
+from .utils import assert_timedelta_close_seconds
+
+
+@pytest.fixture
+def timing_enabled():
+    enabled = instrument.is_timing_enabled()
+    yield
+    if enabled:
+        instrument.enable_timing()
+    else:
+        instrument.disable_timing()
+
+
+def test_instrument(timing_enabled):
+    instrument.enable_timing()
+    timers = MultiStopwatch()
+
+    @timers.instrument
+    def work(delay):
+        sleep(delay)
+        return delay
+
+    @timers.instrument(name="coroutine", track_quantiles=True)
+    async def coroutine_work(delay):
+        await asyncio.sleep(delay)
+        return delay
+
+    @timers.instrument
+    def generator_work(n, delay):
+        for i in range(n):
+            sleep(delay)
+            yield i
+
+    @timers.instrument
+    def factorial(n):
+        return 1 if n <= 1 else n * factorial(n - 1)
+
+    assert work(0.1) == 0.1
+    assert asyncio.run(coroutine_work(0.1)) == 0.1
+    assert list(generator_work(2, 0.05)) == [0, 1]
+    assert factorial(5) == 120
+    assert work.__name__ == "work"
+    assert work.stopwatch is timers[0]
+    assert timers.get_names() == [
+        "test_instrument.<locals>.work",
+        "coroutine",
+        "test_instrument.<locals>.generator_work",
+        "test_instrument.<locals>.factorial",
+    ]
+    assert timers.get_n_splits() == [1, 1, 1, 5]
+    for elapsed_time in timers.get_cumulative_elapsed_time()[:3]:
+        assert_timedelta_close_seconds(elapsed_time, 0.1, epsilon=0.5)
+    assert timers[1].splits.sketch is not None
+    statistics = timers.get_statistics()
+    assert list(statistics)[0] == "name"
+    assert statistics["name"] == timers.get_names()
+
+
+def test_timed(timing_enabled):
+    instrument.enable_timing()
+
+    @timed(registry="test_timed")
+    def work():
+        return 1
+
+    assert work() == 1
+    timers = instrument.get_multistopwatch("test_timed")
+    assert timers.get_n_splits() == [1]
+    assert instrument.get_multistopwatch("test_timed") is timers
+
+
+def test_instrument_arguments(timing_enabled):
+    instrument.enable_timing()
+    timers = MultiStopwatch()
+
+    @timers.instrument(sample_every=10)
+    def work():
+        pass
+
+    for _ in range(100):
+        work()
+    assert work.stopwatch.splits.count == 10
+    assert work.stopwatch.n_unsampled == 90
+    assert timers.instrument(work) is work
+    assert len(timers) == 1
+    with pytest.raises(TypeError):
+        timers.instrument(work, track_gc=True)
+    with pytest.raises(TypeError):
+        timed(registry="test_instrument_arguments", verbose=True)(work)
+    assert len(timers) == 1
+
+
+def test_disabled(timing_enabled):
+    instrument.disable_timing()
+    timers = MultiStopwatch()
+
+    def work():
+        pass
+
+    assert timed(work) is work
+    assert timed(registry="test_disabled")(work) is work
+    assert timers.instrument(work) is work
+    assert len(timers) == 0
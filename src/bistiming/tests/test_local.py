@@ -0,0 +1,93 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from bistiming import MultiStopwatch, ThreadLocalStopwatch
+from .utils import FakeClock
+
+
+class ThreadClock(object):
+    """A fake clock with a separate time for each thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def advance(self, ns):
+        self._local.now = self() + ns
+
+    def __call__(self):
+        return getattr(self._local, "now", 0)
+
+
+def test_thread_local_stopwatch():
+    clock = ThreadClock()
+    timer = ThreadLocalStopwatch(verbose=False, clock=clock, track_quantiles=True)
+    barrier = threading.Barrier(4)
+
+    def work(i):
+        barrier.wait()  # make sure the threads overlap
+        for _ in range(100):
+            with timer:
+                clock.advance(1000 * (i + 1))
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(work, range(4)))
+    assert len(timer.stopwatches) == 4
+    splits = timer.splits
+    assert splits.count == 400
+    assert splits.min == 1000
+    assert splits.max == 4000
+    assert splits.sum == 100 * (1000 + 2000 + 3000 + 4000)
+    assert splits.sketch.count == 400
+    assert timer.get_cumulative_elapsed_time_ns() == splits.sum
+    assert sorted(timer.split_elapsed_time_ns) == sorted(
+        [1000 * (i + 1) for i in range(4) for _ in range(100)]
+    )
+    timer.reset()
+    assert timer.splits.count == 0
+
+
+def test_current_thread():
+    clock = FakeClock()
+    timer = ThreadLocalStopwatch(verbose=False, clock=clock)
+    timer.start()
+    clock.now += 10
+    assert timer.get_elapsed_time_ns() == 10
+    timer.pause()
+    timer.split()
+    assert timer.split_elapsed_time_ns == [10]
+
+
+def test_multi_stopwatch_thread_local():
+    clock = ThreadClock()
+    timers = MultiStopwatch(2, verbose=False, clock=clock, thread_local=True)
+    assert all(isinstance(timer, ThreadLocalStopwatch) for timer in timers)
+
+    def work(i):
+        with timers[i % 2]:
+            clock.advance(1000)
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(work, range(10)))
+    assert timers.get_n_splits() == [5, 5]
+    assert timers.get_percentage() == [0.5, 0.5]
+
+
+def test_read_without_creating_stopwatches():
+    clock = ThreadClock()
+    timers = MultiStopwatch(
+        1, verbose=False, clock=clock, thread_local=True, track_gc=True, windows=[1]
+    )
+    assert timers[0].probes is not None
+    assert timers[0].measurements.keys() == {"gc_time", "gc_collections"}
+    assert timers[0].windowed is not None
+    assert timers[0].splits.count == 0
+    assert timers[0].stopwatches == []
+    with timers[0]:
+        clock.advance(1000)
+
+    with ThreadPoolExecutor(5) as executor:
+        rows = list(executor.map(lambda _: timers.get_statistics(), range(5)))
+    assert len(timers[0].stopwatches) == 1
+    assert [row["n_splits"] for row in rows] == [[1]] * 5
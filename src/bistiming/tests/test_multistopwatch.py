@@ -4,11 +4,12 @@ from time import sleep
 import unittest
 import datetime
 
+import pytest
 from six.moves import range, zip
 
 from examples import multistopwatch_examples
-from bistiming import MultiStopwatch
-from .utils import assert_timedelta_close_seconds_list, isclose
+from bistiming import KeyedMultiStopwatch, MultiStopwatch, Stopwatch
+from .utils import assert_timedelta_close_seconds_list, FakeClock, isclose
 
 
 class TestMultiStopwatch(unittest.TestCase):
@@ -66,3 +67,248 @@ class TestMultiStopwatch(unittest.TestCase):
         self.assertListEqual(timers.get_mean_per_split(), [])
         with self.assertRaises(ValueError):
             timers.get_statistics()
+
+    def test_split_statistics(self):
+        clock = FakeClock()
+        timers = MultiStopwatch(2, verbose=False, clock=clock, max_splits=1)
+        for elapsed_time in [1000000, 3000000]:
+            with timers[0]:
+                clock.now += elapsed_time
+        self.assertListEqual(timers.get_n_splits(), [2, 0])
+        self.assertListEqual(
+            timers.get_mean_per_split(),
+            [datetime.timedelta(milliseconds=2), datetime.timedelta()],
+        )
+        self.assertListEqual(
+            timers.get_min_per_split(), [datetime.timedelta(milliseconds=1), None]
+        )
+        self.assertListEqual(
+            timers.get_max_per_split(), [datetime.timedelta(milliseconds=3), None]
+        )
+        std_per_split = timers.get_std_per_split()
+        self.assertAlmostEqual(std_per_split[0].total_seconds(), 2**0.5 * 1e-3, 6)
+        self.assertEqual(std_per_split[1], datetime.timedelta())
+
+    def test_quantiles(self):
+        clock = FakeClock()
+        timers = MultiStopwatch(verbose=False, clock=clock)
+        timers.append(Stopwatch(verbose=False, clock=clock, track_quantiles=True))
+        timers.append(Stopwatch(verbose=False, clock=clock))
+        timers.append(Stopwatch(verbose=False, clock=clock))
+        for elapsed_time in range(1, 101):
+            for stopwatch in timers[:2]:
+                with stopwatch:
+                    clock.now += elapsed_time * 1000
+        statistics = timers.get_statistics(quantiles=(0.5, 0.99))
+        self.assertEqual(statistics["p50"][2], None)
+        self.assertEqual(statistics["p99"][2], None)
+        # estimated by the sketch
+        self.assertTrue(isclose(statistics["p50"][0].microseconds, 50, rel_tol=0.02))
+        self.assertTrue(isclose(statistics["p99"][0].microseconds, 99, rel_tol=0.02))
+        # computed from the stored splits
+        self.assertEqual(statistics["p50"][1], datetime.timedelta(microseconds=50.5))
+        self.assertEqual(statistics["p99"][1], datetime.timedelta(microseconds=99.01))
+        self.assertIn("p99", timers.format_statistics(quantiles=(0.5, 0.99)))
+
+    def test_sampling(self):
+        clock = FakeClock()
+        timers = MultiStopwatch(verbose=False, clock=clock)
+        timers.append(Stopwatch(verbose=False, clock=clock, sample_every=4))
+        timers.append(Stopwatch(verbose=False, clock=clock, sample_rate=0.5))
+        timers.append(Stopwatch(verbose=False, clock=clock))
+        for _ in range(1000):
+            for stopwatch in timers:
+                with stopwatch:
+                    clock.now += 1000
+        self.assertListEqual(timers.get_n_splits(), [1000, 1000, 1000])
+        n_sampled = timers.get_n_sampled()
+        self.assertEqual(n_sampled[0], 250)
+        self.assertTrue(400 < n_sampled[1] < 600)
+        self.assertEqual(n_sampled[2], 1000)
+        self.assertEqual(timers[0].n_unsampled, 750)
+        self.assertEqual(timers[0].get_cumulative_elapsed_time_ns(), 250000)
+        self.assertListEqual(
+            timers.get_cumulative_elapsed_time(), [datetime.timedelta(seconds=1e-3)] * 3
+        )
+        self.assertListEqual(
+            timers.get_mean_per_split(), [datetime.timedelta(microseconds=1)] * 3
+        )
+        statistics = timers.get_statistics()
+        self.assertListEqual(statistics["n_sampled"], n_sampled)
+        timers[0].reset()
+        self.assertEqual(timers[0].n_unsampled, 0)
+        with self.assertRaises(ValueError):
+            Stopwatch(sample_every=2, sample_rate=0.5)
+
+    def test_to_dataframe(self):
+        pytest.importorskip("pandas")
+        timers = MultiStopwatch(
+            [Stopwatch(verbose=False, name="a"), Stopwatch(verbose=False)]
+        )
+        for elapsed_time in (100, 200, 300):
+            timers[0].add_split(elapsed_time)
+        timers[1].add_split(400)
+        self.assertEqual(timers[0].to_numpy().tolist(), [100, 200, 300])
+        df = timers.to_dataframe()
+        self.assertEqual(df["name"].tolist(), ["a", "a", "a", 1])
+        self.assertEqual(df["split_index"].tolist(), [0, 1, 2, 0])
+        self.assertEqual(df["elapsed_time_ns"].tolist(), [100, 200, 300, 400])
+        self.assertEqual(str(df["elapsed_time_ns"].dtype), "int64")
+        self.assertEqual(
+            df.groupby("name", observed=True)["elapsed_time_ns"].sum().tolist(),
+            [600, 400],
+        )
+        self.assertEqual(df["elapsed_time"][3].value, 400)
+        self.assertEqual(len(MultiStopwatch().to_dataframe()), 0)
+
+        # duplicated names
+        timers.append(Stopwatch(verbose=False, name="a"))
+        timers[2].add_split(500)
+        df = timers.to_dataframe()
+        self.assertEqual(df["name"].tolist(), ["a", "a", "a", 1, "a"])
+        self.assertEqual(
+            df.groupby("name", observed=True)["elapsed_time_ns"].sum().tolist(),
+            [1100, 400],
+        )
+
+        # tuple keys
+        keyed = KeyedMultiStopwatch(verbose=False)
+        keyed["GET", "/"].add_split(100)
+        keyed["POST", "/"].add_split(200)
+        df = keyed.to_dataframe()
+        self.assertEqual(df["name"].tolist(), [("GET", "/"), ("POST", "/")])
+
+    def test_top_k(self):
+        timers = MultiStopwatch(3, verbose=False)
+        for stopwatch, elapsed_time in zip(timers, (2000, 3000, 1000)):
+            stopwatch.add_split(elapsed_time)
+        statistics = timers.get_statistics(top_k=2)
+        self.assertListEqual(statistics["n_splits"], [1, 1])
+        self.assertListEqual(
+            statistics["cumulative_elapsed_time"],
+            [datetime.timedelta(microseconds=3), datetime.timedelta(microseconds=2)],
+        )
+        self.assertListEqual(statistics["percentage"], [0.5, 2 / 6])
+
+    def test_cached_statistics(self):
+        timers = MultiStopwatch(2, verbose=False)
+        timers[0].add_split(1000)
+        timers[1].add_split(3000)
+        version = timers[0].version
+        statistics = timers.get_statistics()
+        table = timers.format_statistics()
+        row = timers._row_cache[id(timers[0])][3]
+        self.assertIs(timers.format_statistics(), table)
+        self.assertEqual(timers.get_statistics(), statistics)
+
+        # only the changed stopwatch is recomputed
+        timers[1].add_split(4000)
+        self.assertEqual(timers[0].version, version)
+        self.assertNotEqual(timers.format_statistics(), table)
+        self.assertIs(timers._row_cache[id(timers[0])][3], row)
+        self.assertListEqual(timers.get_statistics()["n_splits"], [1, 2])
+
+        # a running stopwatch is always recomputed
+        timers[0].start()
+        self.assertIsNone(timers[0].version)
+        table = timers.format_statistics()
+        self.assertIsNot(timers._row_cache[id(timers[0])][3], row)
+        self.assertIsNot(timers.format_statistics(), table)
+        timers[0].pause()
+
+        timers[0].reset()
+        self.assertNotEqual(timers[0].version, version)
+        self.assertListEqual(timers.get_statistics()["n_splits"], [0, 2])
+        del timers[0]
+        self.assertEqual(len(timers.get_statistics()["n_splits"]), 1)
+        self.assertEqual(len(timers._row_cache), 1)
+
+    def test_units(self):
+        timers = MultiStopwatch(2, verbose=False)
+        timers[0].add_split(2 * 10**9, units=1000)
+        timers[1].add_split(10**9)
+        statistics = timers.get_statistics()
+        self.assertListEqual(statistics["units"], [1000, 0])
+        self.assertListEqual(statistics["throughput"], [500.0, None])
+        self.assertListEqual(
+            statistics["time_per_unit"], [datetime.timedelta(milliseconds=2), None]
+        )
+        self.assertListEqual(timers.get_throughput(), [500.0, None])
+        self.assertNotIn("units", MultiStopwatch([timers[1]]).get_statistics())
+        self.assertIn("time_per_unit", timers.format_statistics())
+
+
+class TestKeyedMultiStopwatch(unittest.TestCase):
+    def test_keyed_multi_stopwatch(self):
+        clock = FakeClock()
+        timers = KeyedMultiStopwatch(verbose=False, clock=clock)
+        keys = ["parse", ("db", "users"), "parse"]
+        for key, elapsed_time in zip(keys, (100, 300, 100)):
+            with timers[key]:
+                clock.now += elapsed_time
+        self.assertEqual(len(timers), 2)
+        self.assertIs(timers["parse"], timers.data[0])
+        self.assertIn(("db", "users"), timers)
+        self.assertNotIn("render", timers)
+        self.assertListEqual(timers.keys(), ["parse", ("db", "users")])
+        self.assertListEqual(timers.get_names(), ["parse", ("db", "users")])
+        self.assertListEqual([s.splits.count for s in timers], [2, 1])
+        statistics = timers.get_statistics(top_k=1)
+        self.assertListEqual(statistics["key"], [("db", "users")])
+        self.assertListEqual(statistics["percentage"], [0.6])
+        self.assertIn("users", timers.format_statistics())
+        del timers["parse"]
+        self.assertListEqual(timers.keys(), [("db", "users")])
+        self.assertEqual(len(timers), 1)
+
+    def test_max_keys(self):
+        timers = KeyedMultiStopwatch(max_keys=2, verbose=False)
+        timers["a"].add_split(1)
+        timers["b"].add_split(2)
+        # "a" becomes the most recently used
+        timers["a"].add_split(3)
+        timers["c"].add_split(4)
+        self.assertListEqual(timers.keys(), ["a", "c"])
+        self.assertEqual(timers.n_evicted, 1)
+        self.assertListEqual([s.splits.count for s in timers], [2, 1])
+        # "b" is created again
+        self.assertEqual(timers["b"].splits.count, 0)
+        self.assertListEqual(timers.keys(), ["c", "b"])
+        with self.assertRaises(ValueError):
+            KeyedMultiStopwatch(max_keys=0)
+
+    def test_evict_many_keys(self):
+        timers = KeyedMultiStopwatch(max_keys=100, verbose=False)
+        for i in range(1000):
+            timers[i].add_split(i)
+            timers[i % 10]  # keep the first keys recently used
+        self.assertEqual(len(timers), 100)
+        self.assertEqual(timers.n_evicted, 900)
+        self.assertEqual(sorted(timers.keys())[:11], list(range(10)) + [910])
+        for key, stopwatch in timers.items():
+            self.assertIs(timers[key], stopwatch)
+        timers.data.reverse()
+        del timers[0]
+        self.assertNotIn(0, timers)
+        self.assertEqual(len(timers), 99)
+        for key, stopwatch in timers.items():
+            self.assertIs(timers[key], stopwatch)
+
+    def test_copy_and_snapshot(self):
+        timers = KeyedMultiStopwatch(max_keys=3, verbose=False)
+        timers["a"].add_split(100)
+        timers["b"].add_split(200)
+        # unkeyed stopwatches
+        timers.data.extend([Stopwatch(verbose=False), Stopwatch(verbose=False)])
+        copied = timers.copy()
+        self.assertListEqual(copied.keys(), ["a", "b", None, None])
+        self.assertListEqual(copied.items(), timers.items())
+        self.assertEqual(copied.max_keys, 3)
+        self.assertFalse(copied["c"].verbose_start)
+        self.assertNotIn("c", timers)
+        self.assertEqual(len(timers), 4)
+
+        restored = KeyedMultiStopwatch.from_snapshot(timers.snapshot(), verbose=False)
+        self.assertListEqual(restored.keys(), [0, 1, 2, 3])
+        self.assertListEqual(restored.get_n_splits(), [1, 1, 0, 0])
+        self.assertEqual(restored[1].get_cumulative_elapsed_time_ns(), 200)
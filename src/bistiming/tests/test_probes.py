@@ -0,0 +1,160 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import gc
+import os
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from bistiming import MultiStopwatch, Stopwatch, ThreadLocalStopwatch
+from bistiming.probes import Probe
+
+
+class CounterProbe(Probe):
+    fields = ("count",)
+    columns = (("total_count", "count", "sum"), ("max_count", "count", "max"))
+
+    def __init__(self):
+        self.value = 0
+
+    def start(self):
+        return self.value
+
+    def stop(self, state, values, offset):
+        values[offset] += self.value - state
+
+
+def test_custom_probe():
+    probe = CounterProbe()
+    stopwatch = Stopwatch(verbose=False)
+    stopwatch.probes = (probe,)
+    stopwatch.reset()
+    with stopwatch:
+        probe.value += 2
+    # pausing and starting again within a split
+    stopwatch.start()
+    probe.value += 1
+    stopwatch.pause()
+    probe.value += 100
+    stopwatch.start()
+    probe.value += 1
+    stopwatch.split()
+    probe.value += 3
+    stopwatch.split()
+    # not running
+    stopwatch.pause()
+    probe.value += 100
+    stopwatch.split()
+    assert stopwatch.measurements["count"].count == 4
+    assert stopwatch.measurements["count"].sum == 7
+    assert stopwatch.measurements["count"].max == 3
+
+    timers = MultiStopwatch([stopwatch, Stopwatch(verbose=False)])
+    statistics = timers.get_statistics()
+    assert statistics["total_count"] == [7, None]
+    assert statistics["max_count"] == [3, None]
+
+
+def test_track_memory_tracemalloc():
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        timers = MultiStopwatch(2, verbose=False, track_memory="tracemalloc")
+        kept = []
+        with timers[0]:
+            kept.append(bytearray(10**6))
+        with timers[1]:
+            temporary = bytearray(10**6)
+            del temporary
+        statistics = timers.get_statistics()
+        assert statistics["mean_memory_delta"][0] > 0.9 * 10**6
+        assert abs(statistics["mean_memory_delta"][1]) < 10**5
+        assert statistics["max_memory_peak"][1] > 0.9 * 10**6
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/statm"), reason="/proc/self/statm is required"
+)
+def test_track_memory_rss():
+    stopwatch = Stopwatch(verbose=False, track_memory="rss")
+    with stopwatch:
+        data = bytearray(50 * 10**6)
+        # touch the pages
+        data[::4096] = b"x" * len(data[::4096])
+    assert stopwatch.measurements["rss_delta"].sum > 40 * 10**6
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/statm"), reason="/proc/self/statm is required"
+)
+def test_track_memory_rss_after_fork():
+    stopwatch = Stopwatch(verbose=False, track_memory="rss")
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            child_stopwatch = Stopwatch(verbose=False, track_memory="rss")
+            with child_stopwatch:
+                data = bytearray(50 * 10**6)
+                data[::4096] = b"x" * len(data[::4096])
+            if child_stopwatch.measurements["rss_delta"].sum > 40 * 10**6:
+                exit_code = 0
+        finally:
+            os._exit(exit_code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    with stopwatch:
+        pass
+    assert stopwatch.measurements["rss_delta"].count == 1
+
+
+def test_track_gc():
+    timers = MultiStopwatch(2, verbose=False, track_gc=True)
+    with timers[0]:
+        gc.collect()
+    with timers[1]:
+        pass
+    statistics = timers.get_statistics()
+    assert statistics["gc_collections"][0] >= 1
+    assert statistics["gc_time"][0].total_seconds() > 0
+    assert statistics["gc_collections"][1] == 0
+
+
+def test_local_stopwatch_measurements():
+    stopwatch = ThreadLocalStopwatch(verbose=False, track_gc=True)
+
+    def run():
+        with stopwatch:
+            gc.collect()
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stopwatch.measurements["gc_collections"].count == 3
+    # a collection is skipped if another thread is collecting
+    assert MultiStopwatch([stopwatch]).get_statistics()["gc_collections"][0] >= 1
+
+
+def test_invalid_track_memory():
+    with pytest.raises(ValueError):
+        Stopwatch(track_memory="heap")
+
+
+def test_track_resources():
+    timers = MultiStopwatch(2, verbose=False, track_resources=True)
+    with timers[0]:
+        sum(range(10**6))
+    with timers[1]:
+        time.sleep(0.05)
+    statistics = timers.get_statistics()
+    assert statistics["cpu_utilization"][0] > statistics["cpu_utilization"][1]
+    assert statistics["cpu_utilization"][1] < 0.5
+    assert statistics["cpu_time"][1].total_seconds() < 0.025
+    assert statistics["voluntary_switches"][1] >= 1
+    assert timers[1].measurements["wall_time"].sum >= 50 * 10**6
@@ -0,0 +1,81 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import pytest
+
+from bistiming import Stopwatch
+from bistiming.progress import ProgressReporter
+from .utils import FakeClock
+
+
+class ListLogger(object):
+    def __init__(self):
+        self.messages = []
+
+    def log(self, level, message):
+        self.messages.append(message)
+
+
+def test_progress_every_splits():
+    clock = FakeClock()
+    logger = ListLogger()
+    stopwatch = Stopwatch(
+        "loop", logger=logger, clock=clock, progress_every_splits=10, total=40
+    )
+    stopwatch.progress.clock = clock
+    assert not stopwatch.verbose_start and not stopwatch.verbose_end
+    for i in range(25):
+        with stopwatch:
+            clock.now += 10**6 if i < 10 else 3 * 10**6
+    assert logger.messages == [
+        "...loop 10/40 splits (25.0%), 1000.0 splits/s, mean 0:00:00.001000, "
+        "recent mean 0:00:00.001000, ETA 0:00:00.030000",
+        "...loop 20/40 splits (50.0%), 333.3 splits/s, mean 0:00:00.002000, "
+        "recent mean 0:00:00.003000, ETA 0:00:00.040000",
+    ]
+
+    # restart from zero
+    stopwatch.reset()
+    for _ in range(10):
+        stopwatch.add_split(10**6)
+        clock.now += 10**6
+    assert len(logger.messages) == 3
+    assert logger.messages[-1].startswith("...loop 10/40 splits (25.0%), 1000.0 ")
+
+
+def test_progress_interval():
+    clock = FakeClock()
+    logger = ListLogger()
+    stopwatch = Stopwatch("loop", logger=logger, clock=clock, progress_interval=1)
+    stopwatch.progress.clock = clock
+    for _ in range(2500):
+        with stopwatch:
+            clock.now += 10**6
+    assert logger.messages == [
+        "...loop {} splits, 1000.0 splits/s, mean 0:00:00.001000, "
+        "recent mean 0:00:00.001000".format(n)
+        for n in (1000, 2000)
+    ]
+    stopwatch.progress.report(stopwatch)
+    assert logger.messages[-1].startswith("...loop 2500 splits, 1000.0 splits/s")
+
+
+def test_progress_sampling():
+    clock = FakeClock()
+    logger = ListLogger()
+    stopwatch = Stopwatch(
+        "loop", logger=logger, clock=clock, progress_every_splits=10, sample_every=10
+    )
+    stopwatch.progress.clock = clock
+    for _ in range(100):
+        with stopwatch:
+            clock.now += 10**6
+    # the 10th sampled with-block is the 91st one, and all the with-blocks (including
+    # the unsampled ones) are reported
+    assert logger.messages[0].startswith("...loop 91 splits, 1000.0 splits/s")
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        ProgressReporter()
+    with pytest.raises(ValueError):
+        ProgressReporter(every_splits=0)
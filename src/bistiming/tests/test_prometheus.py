@@ -0,0 +1,95 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import threading
+from urllib.request import urlopen
+
+import pytest
+
+from bistiming import MultiStopwatch, Stopwatch, ThreadLocalStopwatch, timed
+from bistiming.prometheus import (
+    CONTENT_TYPE,
+    format_metrics,
+    MetricsServer,
+    write_textfile,
+)
+
+
+NAME = "bistiming_split_duration_seconds"
+
+
+def make_timers():
+    timers = MultiStopwatch(
+        [
+            Stopwatch(verbose=False, name="parse", track_quantiles=True),
+            Stopwatch(verbose=False, name='say "hi"'),
+        ]
+    )
+    for i in range(1, 101):
+        timers[0].add_split(i * 10**6)
+    timers[1].add_split(2 * 10**9)
+    return timers
+
+
+def test_format_summary():
+    text = format_metrics(make_timers(), labels={"service": "api"})
+    lines = text.splitlines()
+    assert lines[0].startswith("# HELP {} ".format(NAME))
+    assert lines[1] == "# TYPE {} summary".format(NAME)
+    prefix = NAME + '{service="api",stopwatch="parse",'
+    (p50,) = [line for line in lines if line.startswith(prefix + 'quantile="0.5"}')]
+    assert float(p50.split()[-1]) == pytest.approx(0.05, rel=0.03)
+    assert NAME + '_sum{service="api",stopwatch="parse"} 5.05' in lines
+    assert NAME + '_count{service="api",stopwatch="parse"} 100' in lines
+    # no quantiles without a sketch, and the label value is escaped
+    assert NAME + '_count{service="api",stopwatch="say \\"hi\\""} 1' in lines
+    assert sum("quantile=" in line for line in lines) == 3
+
+
+def test_format_histogram():
+    text = format_metrics(make_timers(), metric_type="histogram", buckets=(0.01, 0.1))
+    lines = text.splitlines()
+    assert lines[1] == "# TYPE {} histogram".format(NAME)
+    assert NAME + '_bucket{stopwatch="parse",le="0.01"} 10' in lines
+    assert NAME + '_bucket{stopwatch="parse",le="0.1"} 100' in lines
+    assert NAME + '_bucket{stopwatch="parse",le="+Inf"} 100' in lines
+    assert NAME + '_bucket{stopwatch="say \\"hi\\"",le="+Inf"} 1' in lines
+    with pytest.raises(ValueError):
+        format_metrics(make_timers(), metric_type="gauge")
+
+
+def test_format_local_and_registry():
+    stopwatch = ThreadLocalStopwatch(verbose=False, name="local")
+    threads = [
+        threading.Thread(target=stopwatch.add_split, args=(10**9,)) for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text = format_metrics(MultiStopwatch([stopwatch]))
+    assert NAME + '_count{stopwatch="local"} 3' in text
+
+    @timed(name="handler", registry="test_format_local_and_registry")
+    def handler():
+        pass
+
+    handler()
+    text = format_metrics("test_format_local_and_registry")
+    assert NAME + '_count{stopwatch="handler"} 1' in text
+
+
+def test_write_textfile(tmp_path):
+    path = str(tmp_path / "bistiming.prom")
+    timers = make_timers()
+    write_textfile(path, timers, name="latency_seconds")
+    with open(path) as f:
+        assert f.read() == format_metrics(timers, name="latency_seconds")
+    assert [p.name for p in tmp_path.iterdir()] == ["bistiming.prom"]
+
+
+def test_metrics_server():
+    timers = make_timers()
+    with MetricsServer(timers, port=0, addr="127.0.0.1") as server:
+        response = urlopen("http://127.0.0.1:{}/metrics".format(server.port))
+        assert response.headers["Content-Type"] == CONTENT_TYPE
+        assert response.read().decode("utf-8") == format_metrics(timers)
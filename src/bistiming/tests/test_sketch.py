@@ -0,0 +1,73 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import random
+
+import pytest
+
+from bistiming.sketch import QuantileSketch
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("q", [0, 0.1, 0.5, 0.9, 0.95, 0.99, 1])
+def test_quantile_relative_error(q):
+    rng = random.Random(0)
+    values = [int(rng.lognormvariate(12, 2)) + 1 for _ in range(20000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    assert sketch.count == len(values)
+    assert sketch.quantile(q) == pytest.approx(exact_quantile(values, q), rel=0.01)
+
+
+def test_merge():
+    rng = random.Random(1)
+    values = [rng.randint(1, 10**9) for _ in range(10000)]
+    sketches = [QuantileSketch() for _ in range(4)]
+    for i, value in enumerate(values):
+        sketches[i % 4].add(value)
+    merged = sketches[0].copy()
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    assert sketches[0].count == len(values) // 4
+    for q in [0.5, 0.99]:
+        assert merged.quantile(q) == pytest.approx(exact_quantile(values, q), rel=0.01)
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+
+
+def test_zero_and_empty():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+    sketch.add(0, count=3)
+    sketch.add(100)
+    assert sketch.quantile(0.5) == 0
+    assert sketch.quantile(1) == pytest.approx(100, rel=0.01)
+    with pytest.raises(ValueError):
+        sketch.quantile(1.5)
+    sketch.clear()
+    assert sketch.count == 0
+
+
+def test_max_buckets():
+    sketch = QuantileSketch(relative_accuracy=0.01, max_buckets=10)
+    for i in range(1, 1000):
+        sketch.add(i * 1000)
+    assert len(sketch._buckets) <= 10
+    assert sketch.count == 999
+    assert sketch.quantile(1) == pytest.approx(999000, rel=0.01)
+
+
+def test_rank():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.add(0)
+    for i in range(1, 101):
+        sketch.add(i * 1000)
+    assert sketch.rank(-1) == 0
+    assert sketch.rank(0) == 1
+    assert sketch.rank(10**9) == 101
+    assert abs(sketch.rank(50000) - 51) <= 1
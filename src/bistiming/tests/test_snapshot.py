@@ -0,0 +1,127 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from concurrent.futures import ProcessPoolExecutor
+import pickle
+
+import pytest
+
+from bistiming import MultiStopwatch
+from bistiming.snapshot import SharedMemoryCollector
+from .utils import FakeClock
+
+
+def make_timers(worker_index):
+    clock = FakeClock()
+    timers = MultiStopwatch(2, verbose=False, clock=clock, track_quantiles=True)
+    for i in range(10):
+        with timers[0]:
+            clock.now += 1000 * (worker_index + 1)
+            timers[0].add_units(2)
+        with timers[1]:
+            clock.now += 100 * i
+    return timers
+
+
+def snapshot_worker(worker_index):
+    return make_timers(worker_index).snapshot()
+
+
+def collector_worker(args):
+    collector, worker_index = args
+    collector.publish(worker_index, make_timers(worker_index))
+    collector.close()
+
+
+def test_snapshot_pickle():
+    snapshot = make_timers(0).snapshot()
+    restored = pickle.loads(pickle.dumps(snapshot))
+    assert len(restored) == 2
+    assert restored[0].cumulative_elapsed_time_ns == 10000
+    assert restored[0].splits.count == 10
+    assert restored[0].units == 20
+    assert restored[1].units == 0
+    assert list(restored[1].splits) == [100 * i for i in range(10)]
+    assert restored[1].splits.sketch.count == 10
+
+
+def test_merge_process_pool():
+    with ProcessPoolExecutor(2) as executor:
+        snapshots = list(executor.map(snapshot_worker, range(4)))
+    snapshot = snapshots[0]
+    for other in snapshots[1:]:
+        snapshot.merge(other)
+    timers = MultiStopwatch.from_snapshot(snapshot, verbose=False)
+    assert timers.get_n_splits() == [40, 40]
+    assert timers[0].get_cumulative_elapsed_time_ns() == 10000 * (1 + 2 + 3 + 4)
+    assert timers[0].splits.min == 1000
+    assert timers[0].splits.max == 4000
+    assert timers[1].splits.sum == 4 * 4500
+    assert timers.get_percentage()[0] == pytest.approx(100000 / (100000 + 18000))
+    with pytest.raises(ValueError):
+        timers.merge(MultiStopwatch(3).snapshot())
+    with pytest.raises(ValueError):
+        snapshot.merge(MultiStopwatch(3).snapshot())
+
+
+def test_shared_memory_collector():
+    with SharedMemoryCollector(n_workers=3, n_stopwatches=2) as collector:
+        with ProcessPoolExecutor(3) as executor:
+            list(executor.map(collector_worker, [(collector, i) for i in range(3)]))
+        timers = MultiStopwatch.from_snapshot(collector.snapshot(), verbose=False)
+        expected = make_timers(0)
+        for i in [1, 2]:
+            expected.merge(make_timers(i).snapshot())
+        assert timers.get_n_splits() == expected.get_n_splits()
+        assert timers.get_cumulative_elapsed_time() == (
+            expected.get_cumulative_elapsed_time()
+        )
+        assert timers.get_std_per_split() == expected.get_std_per_split()
+        assert [stopwatch.n_units for stopwatch in timers] == [60, 0]
+        assert timers.get_throughput() == expected.get_throughput()
+        assert timers[0].splits.min == 1000
+        assert timers[0].splits.max == 3000
+        with pytest.raises(ValueError):
+            collector.publish(0, MultiStopwatch(3))
+
+
+def test_shared_memory_collector_large_sum_of_squares():
+    timers = MultiStopwatch(1, verbose=False)
+    for i in range(100000):
+        timers[0].add_split(10**9 + i % 3)
+    with SharedMemoryCollector(n_workers=2, n_stopwatches=1) as collector:
+        collector.publish(0, timers)
+        collector.publish(1, timers)
+        splits = collector.snapshot()[0].splits
+        assert splits.sum_of_squares == 2 * timers[0].splits.sum_of_squares
+        assert splits.std == pytest.approx(timers[0].splits.std, rel=1e-4)
+
+
+def test_shared_memory_collector_dead_worker():
+    with SharedMemoryCollector(n_workers=1, n_stopwatches=1) as collector:
+        # a worker died in the middle of publishing
+        collector._ints[0] = 1
+        with pytest.raises(RuntimeError):
+            collector.snapshot(timeout=0.01)
+
+
+def test_sampled_snapshot():
+    clock = FakeClock()
+    timers = MultiStopwatch(1, verbose=False, clock=clock, sample_every=10)
+    for _ in range(100):
+        with timers[0]:
+            clock.now += 1000
+    expected = timers[0].get_estimated_cumulative_elapsed_time_ns()
+    assert expected == 100000
+    restored = MultiStopwatch.from_snapshot(
+        pickle.loads(pickle.dumps(timers.snapshot())), verbose=False
+    )
+    assert restored[0].n_unsampled == 90
+    assert restored[0].get_estimated_cumulative_elapsed_time_ns() == expected
+    assert restored.get_n_splits() == [100]
+    with SharedMemoryCollector(n_workers=2, n_stopwatches=1) as collector:
+        collector.publish(0, timers)
+        collector.publish(1, timers)
+        snapshot = collector.snapshot()
+    assert snapshot[0].n_unsampled == 180
+    restored = MultiStopwatch.from_snapshot(snapshot, verbose=False)
+    assert restored[0].get_estimated_cumulative_elapsed_time_ns() == 2 * expected
@@ -0,0 +1,146 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import statistics
+
+import pytest
+
+from bistiming import MultiStopwatch, Stopwatch
+from bistiming.splits import SplitHistory
+
+
+def test_unbounded():
+    splits = SplitHistory()
+    values = [5, 3, 9, 1, 7]
+    for value in values:
+        splits.append(value)
+    assert list(splits) == values
+    assert len(splits) == 5
+    assert splits.count == 5
+    assert splits.sum == 25
+    assert splits.min == 1
+    assert splits.max == 9
+    assert splits.mean == 5
+    assert splits.variance == pytest.approx(statistics.variance(values))
+    assert splits.std == pytest.approx(statistics.stdev(values))
+
+
+def test_ring_buffer():
+    splits = SplitHistory(max_splits=3)
+    for value in range(10):
+        splits.append(value)
+        assert list(splits) == list(range(max(value - 2, 0), value + 1))
+    assert splits.count == 10
+    assert splits.min == 0
+    assert splits.max == 9
+    assert splits.mean == 4.5
+
+
+def test_no_storage():
+    splits = SplitHistory(max_splits=0)
+    splits.append(1)
+    splits.append(2)
+    assert list(splits) == []
+    assert splits.count == 2
+    assert splits.sum == 3
+
+
+def test_empty():
+    splits = SplitHistory()
+    assert splits.mean == 0
+    assert splits.variance == 0
+    assert splits.min is None
+    assert splits.max is None
+    with pytest.raises(ValueError):
+        SplitHistory(max_splits=-1)
+
+
+def test_clear():
+    splits = SplitHistory(max_splits=2)
+    for value in range(5):
+        splits.append(value)
+    splits.clear()
+    assert list(splits) == []
+    assert splits.count == 0
+    splits.append(3)
+    assert list(splits) == [3]
+    assert splits.min == splits.max == 3
+
+
+def test_merge():
+    splits1 = SplitHistory()
+    splits2 = SplitHistory(max_splits=2)
+    for value in [4, 2]:
+        splits1.append(value)
+    for value in [1, 8, 6]:
+        splits2.append(value)
+    merged = splits1.copy().merge(splits2)
+    assert list(merged) == [4, 2, 8, 6]
+    assert merged.count == 5
+    assert merged.sum == 21
+    assert (merged.min, merged.max) == (1, 8)
+    assert list(splits1) == [4, 2]  # not affected
+    merged = splits2.copy().merge(splits1)
+    assert list(merged) == [4, 2]
+    assert merged.count == 5
+    assert SplitHistory().merge(SplitHistory()).count == 0
+
+
+def test_merge_sketch():
+    tracked = Stopwatch(verbose=False, track_quantiles=True)
+    for elapsed_time in range(1000, 2000):
+        tracked.add_split(elapsed_time)
+    untracked = Stopwatch(verbose=False)
+    untracked.add_split(10**6)
+    untracked.merge(tracked.snapshot())
+    assert untracked.splits.sketch.count == 1001
+    assert untracked.splits.sketch is not tracked.splits.sketch
+    assert tracked.splits.sketch.count == 1000
+    timers = MultiStopwatch.from_snapshot(MultiStopwatch([tracked]).snapshot())
+    assert timers[0].splits.sketch.count == 1000
+    assert timers[0].splits.quantile(0.5) == tracked.splits.quantile(0.5)
+    # the splits not stored cannot be added to the sketch
+    splits = SplitHistory(max_splits=0)
+    splits.append(1)
+    splits.merge(tracked.splits)
+    assert splits.sketch is None
+
+
+def test_to_numpy():
+    np = pytest.importorskip("numpy")
+    splits = SplitHistory()
+    assert splits.to_numpy().dtype == np.int64
+    assert len(splits.to_numpy()) == 0
+    for i in range(5):
+        splits.append(i)
+    array = splits.to_numpy()
+    assert array.tolist() == [0, 1, 2, 3, 4]
+    # the copy doesn't block appending
+    splits.append(5)
+    view = splits.to_numpy(copy=False)
+    assert view.tolist() == [0, 1, 2, 3, 4, 5]
+    with pytest.raises(BufferError):
+        splits.append(6)
+    del view
+    splits.append(6)
+
+    ring = SplitHistory(max_splits=3)
+    for i in range(5):
+        ring.append(i)
+    assert ring.to_numpy(copy=False).tolist() == [2, 3, 4]
+
+
+def test_quantile_numpy():
+    pytest.importorskip("numpy")
+    from bistiming.splits import NUMPY_MIN_SPLITS
+
+    splits = SplitHistory()
+    for i in range(NUMPY_MIN_SPLITS + 1):
+        splits.append((i * 7919) % (NUMPY_MIN_SPLITS + 1))
+    values = sorted(splits)
+    for q in (0, 0.25, 0.5, 0.99, 1):
+        position = q * (len(values) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        expected = values[lower] + (values[upper] - values[lower]) * (position - lower)
+        assert splits.quantile(q) == pytest.approx(expected)
+        assert isinstance(splits.quantile(q), float)
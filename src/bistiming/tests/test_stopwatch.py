@@ -1,11 +1,16 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 
 import datetime
+import os
 from time import sleep
+import time
+
+import pytest
 
 from examples import stopwatch_examples
 from bistiming import Stopwatch
-from .utils import assert_timedelta_close_seconds
+from bistiming.stopwatch import CLOCKS
+from .utils import assert_timedelta_close_seconds, FakeClock
 
 
 def test_stopwatch_examples():
@@ -49,3 +54,160 @@ def test_low_level_api():
     timer.start()
     sleep(0.1)
     assert_timedelta_close_seconds(timer.get_elapsed_time(), 0.1)
+
+
+def test_custom_clock():
+    clock = FakeClock()
+    timer = Stopwatch(verbose=False, clock=clock)
+    with timer:
+        clock.now += 1500
+    assert timer.split_elapsed_time_ns == [1500]
+    assert timer.get_cumulative_elapsed_time_ns() == 1500
+    timer.start()
+    clock.now += 250
+    assert timer.get_elapsed_time_ns() == 250
+    assert timer.get_cumulative_elapsed_time_ns() == 1750
+    assert timer.split_elapsed_time == [datetime.timedelta(microseconds=1.5)]
+
+
+@pytest.mark.parametrize("clock", ["perf_counter", "process_time", "thread_time"])
+def test_builtin_clocks(clock):
+    if clock not in CLOCKS:
+        pytest.skip("{} is not supported on this platform".format(clock))
+    timer = Stopwatch(verbose=False, clock=clock)
+    with timer:
+        sum(range(1000))
+    assert isinstance(timer.split_elapsed_time_ns[0], int)
+    assert timer.split_elapsed_time_ns[0] >= 0
+
+
+def test_unknown_clock():
+    with pytest.raises(ValueError):
+        Stopwatch(clock="sundial")
+
+
+def test_calibrate():
+    overhead_ns = Stopwatch.calibrate(n=100)
+    assert isinstance(overhead_ns, int)
+    assert overhead_ns >= 0
+    assert Stopwatch.calibrate() == overhead_ns  # cached
+    assert Stopwatch(verbose=False, subtract_overhead=True).overhead_ns == overhead_ns
+
+
+def test_subtract_overhead():
+    clock = FakeClock()
+    timer = Stopwatch(verbose=False, clock=clock)
+    timer.overhead_ns = 100
+    with timer:
+        clock.now += 1000
+    with timer:
+        clock.now += 50
+    assert timer.split_elapsed_time_ns == [900, 0]
+    assert timer.get_cumulative_elapsed_time_ns() == 900
+
+
+def test_slots():
+    timer = Stopwatch()
+    with pytest.raises(AttributeError):
+        timer.unknown_attribute = 1
+
+
+def test_max_splits():
+    clock = FakeClock()
+    timer = Stopwatch(verbose=False, clock=clock, max_splits=2)
+    for elapsed_time in [10, 20, 30]:
+        with timer:
+            clock.now += elapsed_time
+    assert timer.split_elapsed_time_ns == [20, 30]
+    assert timer.splits.count == 3
+    assert timer.get_cumulative_elapsed_time_ns() == 60
+    timer.reset()
+    assert timer.split_elapsed_time_ns == []
+    assert timer.splits.count == 0
+    assert timer.splits.max_splits == 2
+
+
+class SlowLogger(object):
+    def __init__(self, delay):
+        self.delay = delay
+        self.messages = []
+
+    def log(self, level, message, **kwargs):
+        sleep(self.delay)
+        self.messages.append(message)
+
+
+def test_background_logging():
+    from bistiming.logwriter import get_background_log_writer
+
+    logger = SlowLogger(0.1)
+    timer = Stopwatch("Waiting", logger=logger, background_logging=True)
+    start_time = time.perf_counter()
+    for _ in range(3):
+        with timer:
+            pass
+    timer.log_elapsed_time()
+    assert time.perf_counter() - start_time < 0.1
+    assert timer.get_cumulative_elapsed_time() < datetime.timedelta(seconds=0.05)
+    get_background_log_writer().flush()
+    assert len(logger.messages) == 7
+    assert logger.messages[0] == "...Waiting"
+    assert logger.messages[1].startswith("...Waiting done in 0:00:00")
+    assert logger.messages[-1] == "Elapsed time: 0:00:00"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is required")
+def test_background_logging_after_fork():
+    from bistiming.logwriter import get_background_log_writer
+
+    logger = SlowLogger(0)
+    timer = Stopwatch("Waiting", logger=logger, background_logging=True)
+    with timer:
+        pass
+    get_background_log_writer().flush()
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            # the messages are written by a new thread in the child
+            with timer:
+                pass
+            get_background_log_writer().flush()
+            if len(logger.messages) == 4:
+                exit_code = 0
+        finally:
+            os._exit(exit_code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert len(logger.messages) == 2
+
+
+def test_background_logging_same_line(capsys):
+    from bistiming.logwriter import get_background_log_writer
+
+    with Stopwatch("Waiting", end_in_new_line=False, background_logging=True):
+        pass
+    get_background_log_writer().flush()
+    assert capsys.readouterr().out.startswith("...Waiting done in 0:00:00")
+
+
+def test_units():
+    clock = FakeClock()
+    timer = Stopwatch(verbose=False, clock=clock)
+    assert timer.get_throughput() is None
+    with timer:
+        clock.now += 10**9
+        timer.add_units(500)
+    timer.start()
+    clock.now += 10**9
+    timer.split(units=1000)
+    timer.pause()
+    timer.add_split(2 * 10**9, units=500)
+    assert timer.n_units == 2000
+    assert timer.get_throughput() == 500.0
+    snapshot = timer.snapshot()
+    assert snapshot.units == 2000
+    timer.merge(snapshot)
+    assert timer.n_units == 4000
+    timer.reset()
+    assert timer.n_units == 0
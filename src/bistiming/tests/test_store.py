@@ -0,0 +1,108 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import pytest
+
+from bistiming import MultiStopwatch, Stopwatch
+from bistiming.store import collect_metadata, compare, main, ResultStore, StoredResult
+from .utils import FakeClock
+
+
+def make_timers(clock, elapsed_times):
+    timers = MultiStopwatch(
+        [
+            Stopwatch(verbose=False, clock=clock, name="parse"),
+            Stopwatch(verbose=False, clock=clock, name="query"),
+        ]
+    )
+    for parse_time, query_time in elapsed_times:
+        timers[0].add_split(parse_time)
+        timers[1].add_split(query_time)
+    return timers
+
+
+def test_collect_metadata():
+    metadata = collect_metadata()
+    for key in ("timestamp", "python_version", "cpu", "cpu_count", "commit"):
+        assert key in metadata
+
+
+def test_collect_metadata_without_package_metadata(monkeypatch):
+    import bistiming
+
+    metadata = pytest.importorskip("importlib.metadata")  # Python >= 3.8
+
+    def version(name):
+        raise metadata.PackageNotFoundError(name)
+
+    monkeypatch.delattr(bistiming, "__version__", raising=False)
+    monkeypatch.setattr(metadata, "version", version)
+    assert collect_metadata()["bistiming_version"] is None
+
+
+def test_result_store(tmp_path):
+    clock = FakeClock()
+    store = ResultStore(str(tmp_path / "results.jsonl"))
+    assert store.load() == []
+    with pytest.raises(LookupError):
+        store.get_latest()
+
+    timers = make_timers(clock, [(100, 1000), (110, 1010), (90, 990)])
+    store.save(timers, label="baseline", metadata={"commit": "abc"})
+    store.save(make_timers(clock, [(100, 2000)]), label="new")
+    results = store.load()
+    assert [result.label for result in results] == ["baseline", "new"]
+    baseline = store.get_latest("baseline")
+    assert baseline.metadata == {"commit": "abc"}
+    assert baseline.names == ["parse", "query"]
+    assert baseline.snapshot[0].splits.count == 3
+    assert baseline.snapshot[0].splits.mean == 100
+    assert baseline.snapshot[1].splits.max == 1010
+    assert store.get_latest(offset=1).label == "baseline"
+    assert store.get_latest().metadata["commit"] == collect_metadata()["commit"]
+
+    sampled = Stopwatch(verbose=False, clock=clock, sample_every=4)
+    for _ in range(8):
+        with sampled:
+            clock.now += 100
+    store.save(MultiStopwatch([sampled]), label="sampled")
+    snapshot = store.get_latest("sampled").snapshot
+    assert snapshot[0].n_unsampled == 6
+    assert snapshot[0].splits.count == 2
+
+
+def test_compare():
+    clock = FakeClock()
+    baseline = make_timers(clock, [(100, 1000), (110, 1010), (90, 990), (100, 1000)])
+    baseline = StoredResult.from_multistopwatch(baseline, metadata={})
+    same = StoredResult.from_multistopwatch(
+        make_timers(clock, [(101, 1000), (99, 1010), (100, 990), (100, 1000)]),
+        metadata={},
+    )
+    slower = StoredResult.from_multistopwatch(
+        make_timers(clock, [(100, 1500), (110, 1510), (90, 1490), (100, 1500)]),
+        metadata={},
+    )
+    comparisons = compare(baseline, same)
+    assert [c.name for c in comparisons] == ["parse", "query"]
+    assert not any(c.is_regression for c in comparisons)
+    comparisons = compare(baseline, slower)
+    assert [c.is_regression for c in comparisons] == [False, True]
+    assert comparisons[1].ratio == pytest.approx(1.5)
+    assert comparisons[1].p_value < 1e-4
+    # the slowdown is smaller than the threshold
+    comparisons = compare(baseline, slower, threshold=0.6)
+    assert not any(c.is_regression for c in comparisons)
+
+
+def test_main(tmp_path, capsys):
+    clock = FakeClock()
+    path = str(tmp_path / "results.jsonl")
+    store = ResultStore(path)
+    store.save(make_timers(clock, [(100, 1000), (110, 1010), (90, 990)]), "main")
+    store.save(make_timers(clock, [(100, 1000), (110, 1010), (90, 990)]), "feature")
+    assert main([path]) == 0
+    store.save(make_timers(clock, [(200, 1000), (210, 1010), (190, 990)]), "feature")
+    assert main([path, "--baseline", "main", "--label", "feature"]) == 1
+    captured = capsys.readouterr()
+    assert "parse" in captured.out
+    assert "regression detected: parse" in captured.err
@@ -0,0 +1,117 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import asyncio
+import time
+
+import pytest
+
+from bistiming import MultiStopwatch, Stopwatch, TaskLocalStopwatch
+from bistiming.tasks import install_task_timer, task_time_ns
+from .utils import assert_timedelta_close_seconds, FakeClock
+
+
+def test_async_with():
+    timer = Stopwatch(verbose=False)
+
+    async def main():
+        async with timer:
+            await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert_timedelta_close_seconds(timer.split_elapsed_time[0], 0.1, epsilon=0.5)
+
+
+def test_task_local_stopwatch():
+    timer = TaskLocalStopwatch(verbose=False)
+
+    async def work(delay):
+        async with timer:
+            await asyncio.sleep(delay)
+
+    async def main():
+        await asyncio.gather(work(0.1), work(0.2), work(0.3))
+
+    asyncio.run(main())
+    # the stopwatches of the finished tasks are merged
+    assert len(timer.stopwatches) == 1
+    splits = sorted(timer.split_elapsed_time)
+    for split, delay in zip(splits, [0.1, 0.2, 0.3]):
+        assert_timedelta_close_seconds(split, delay, epsilon=0.5)
+
+
+def test_task_local_stopwatch_many_tasks():
+    clock = FakeClock()
+    timer = TaskLocalStopwatch(verbose=False, clock=clock, track_gc=True)
+
+    async def work():
+        await asyncio.sleep(0)  # make sure the tasks overlap
+        async with timer:
+            clock.now += 10
+            timer.add_units(1)
+
+    async def main():
+        for _ in range(10):
+            await asyncio.gather(*[work() for _ in range(100)])
+            await asyncio.sleep(0)  # run the done callbacks
+            assert len(timer.stopwatches) == 1
+        async with timer:
+            clock.now += 5
+            assert len(timer.stopwatches) == 2
+            assert timer.get_cumulative_elapsed_time_ns() == 10005
+
+    asyncio.run(main())
+    assert len(timer.stopwatches) == 1
+    assert timer.splits.count == 1001
+    assert timer.get_cumulative_elapsed_time_ns() == 10005
+    assert timer.n_units == 1000
+    assert timer.measurements["gc_time"].count == 1001
+
+
+def test_task_local_multi_stopwatch():
+    timers = MultiStopwatch(1, verbose=False, task_local=True)
+
+    async def work():
+        async with timers[0]:
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*[work() for _ in range(5)])
+
+    asyncio.run(main())
+    assert isinstance(timers[0], TaskLocalStopwatch)
+    assert timers.get_n_splits() == [5]
+
+
+def test_task_time():
+    wall_timer = TaskLocalStopwatch(verbose=False)
+    task_timer = TaskLocalStopwatch(verbose=False, clock="task_time")
+
+    async def work():
+        async with wall_timer, task_timer:
+            await asyncio.sleep(0.2)
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+    async def main():
+        install_task_timer()
+        await asyncio.gather(work(), work())
+
+    asyncio.run(main())
+    assert task_timer.splits.count == 2
+    for wall_time, task_time in zip(
+        wall_timer.split_elapsed_time_ns, task_timer.split_elapsed_time_ns
+    ):
+        assert wall_time >= 250000000
+        assert 50000000 <= task_time < 150000000
+
+
+def test_task_time_outside_timed_task():
+    with pytest.raises(RuntimeError):
+        task_time_ns()
+
+    async def main():
+        return task_time_ns()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
@@ -0,0 +1,70 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import json
+import threading
+
+from bistiming import Stopwatch, timed
+from bistiming.tracing import get_trace_recorder, merge_trace_files, TraceRecorder
+
+
+def load_events(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_trace_recorder(tmp_path):
+    path = str(tmp_path / "trace.json")
+    stopwatch = Stopwatch(verbose=False, name="work")
+    with TraceRecorder(path) as recorder:
+        assert get_trace_recorder() is recorder
+        with stopwatch:
+            pass
+        stopwatch.start()
+        stopwatch.split()
+        stopwatch.pause()
+        stopwatch.add_split(1000)
+        thread = threading.Thread(target=stopwatch.__enter__)
+        thread.start()
+        thread.join()
+    assert get_trace_recorder() is None
+    # not recorded after stopping
+    with stopwatch:
+        pass
+
+    events = load_events(path)
+    assert [event["ph"] for event in events] == ["B", "E", "B", "i", "E", "X", "B"]
+    assert {event["name"] for event in events} == {"work"}
+    assert events[3]["args"]["elapsed_time_ns"] >= 0
+    assert events[5]["dur"] == 1.0
+    assert events[0]["ts"] <= events[1]["ts"] <= events[2]["ts"]
+    assert events[-1]["tid"] != events[0]["tid"]
+    assert len({event["pid"] for event in events}) == 1
+
+
+def test_merge_trace_files(tmp_path):
+    paths = [str(tmp_path / "trace{}.json".format(i)) for i in range(2)]
+    for path in paths:
+        with TraceRecorder(path):
+            with Stopwatch(verbose=False):
+                pass
+    # an unfinished file, e.g., of a crashed process
+    paths.append(str(tmp_path / "unfinished.json"))
+    with open(paths[-1], "w") as f:
+        f.write('[\n{"name":"x","ph":"i","ts":0,"pid":1,"tid":1},\n')
+    output_path = str(tmp_path / "merged.json")
+    merge_trace_files(paths, output_path)
+    assert len(load_events(output_path)) == 5
+
+
+def test_trace_timed_function(tmp_path):
+    path = str(tmp_path / "trace.json")
+
+    @timed(registry="test_trace_timed_function")
+    def func():
+        pass
+
+    with TraceRecorder(path):
+        func()
+    (event,) = load_events(path)
+    assert event["ph"] == "X"
+    assert event["name"].endswith("func")
@@ -0,0 +1,104 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import threading
+import time
+
+import pytest
+
+from bistiming import StopwatchTree
+from .utils import FakeClock
+
+
+def test_stopwatch_tree():
+    clock = FakeClock()
+    timers = StopwatchTree(verbose=False, clock=clock)
+    for _ in range(2):
+        with timers("load"):
+            clock.now += 100
+            with timers("parse"):
+                clock.now += 300
+            with timers("transform"):
+                clock.now += 200
+                with timers("normalize"):
+                    clock.now += 50
+        with timers("write"):
+            clock.now += 150
+    assert [node.path for node in timers.iter_nodes()] == [
+        "load",
+        "load/parse",
+        "load/transform",
+        "load/transform/normalize",
+        "write",
+    ]
+    load = timers["load"]
+    assert load.get_inclusive_time_ns() == 1300
+    assert load.get_exclusive_time_ns() == 200
+    assert timers["load/transform"].get_exclusive_time_ns() == 400
+    assert timers.root.get_inclusive_time_ns() == 1600
+    assert timers.current is timers.root
+
+    statistics = timers.get_statistics()
+    assert statistics["path"][0] == "load"
+    assert statistics["n_splits"] == [2, 2, 2, 2, 2]
+    assert statistics["percentage"][0] == 1300 / 1600
+    assert statistics["exclusive_percentage"][0] == 200 / 1600
+    assert sum(statistics["exclusive_percentage"]) == pytest.approx(1)
+    assert "load/transform/normalize" in timers.format_statistics()
+
+
+def test_exception():
+    timers = StopwatchTree(verbose=False)
+    with pytest.raises(ValueError):
+        with timers("outer"):
+            with timers("inner"):
+                raise ValueError()
+    assert timers.current is timers.root
+    assert timers["outer/inner"].stopwatch.splits.count == 1
+
+
+def test_threads():
+    timers = StopwatchTree(verbose=False)
+    barrier = threading.Barrier(2)
+
+    def work(name):
+        with timers(name):
+            barrier.wait()
+            with timers("child"):
+                pass
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(node.path for node in timers.iter_nodes()) == [
+        "a",
+        "a/child",
+        "b",
+        "b/child",
+    ]
+
+
+def test_concurrent_entries():
+    timers = StopwatchTree(verbose=False)
+    barrier = threading.Barrier(4)
+
+    def work():
+        with timers("load"):
+            barrier.wait()  # make sure all the threads are in the node
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    splits = timers["load"].stopwatch.splits
+    assert splits.count == 4
+    assert splits.min >= 50000000
+    assert timers.get_statistics()["n_splits"] == [4]
+
+
+def test_empty():
+    with pytest.raises(ValueError):
+        StopwatchTree().get_statistics()
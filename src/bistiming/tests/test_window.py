@@ -0,0 +1,98 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import datetime
+import math
+
+import pytest
+
+from bistiming import MultiStopwatch, Stopwatch
+from bistiming.window import WindowedStatistics, format_window
+from .utils import FakeClock, isclose
+
+SECOND = 10**9
+
+
+def test_format_window():
+    assert format_window(60) == "1m"
+    assert format_window(900) == "15m"
+    assert format_window(7200) == "2h"
+    assert format_window(90) == "90s"
+    assert format_window(0.5) == "0.5s"
+
+
+def test_sliding_windows():
+    clock = FakeClock()
+    windowed = WindowedStatistics((60, 300), bucket_width=1, clock=clock)
+    assert windowed.get_window(60) == (0, 0, None, 0)
+    # one split per second for 10 minutes, and a spike in the last 30 seconds
+    for i in range(600):
+        clock.now += SECOND
+        windowed.append(5 * SECOND if i >= 570 else SECOND)
+    count, sum_, max_, duration = windowed.get_window(60)
+    assert count == 60
+    assert sum_ == 30 * SECOND + 30 * 5 * SECOND
+    assert max_ == 5 * SECOND
+    # the current bucket has just started
+    assert duration == 59 * SECOND
+    assert windowed.get_window(300)[0] == 300
+
+    statistics = windowed.get_statistics()
+    assert statistics["mean_1m"] == datetime.timedelta(seconds=3)
+    assert statistics["max_5m"] == datetime.timedelta(seconds=5)
+    assert isclose(statistics["rate_1m"], 1.0, rel_tol=0.02)
+    assert isclose(statistics["rate_5m"], 1.0, rel_tol=0.02)
+    # the EWMA follows the spike
+    assert statistics["ewma_mean"] > datetime.timedelta(seconds=1.5)
+    assert isclose(statistics["ewma_rate"], 1.0, rel_tol=0.02)
+
+    # the old buckets expire
+    clock.now += 120 * SECOND
+    assert windowed.get_window(60)[0] == 0
+    assert windowed.get_window(300)[0] == 180
+    clock.now += 1000 * SECOND
+    windowed.append(SECOND)
+    assert windowed.get_window(300)[:3] == (1, SECOND, SECOND)
+    assert windowed.get_ewma_mean() < 1.01 * SECOND
+
+
+def test_ewma_rate_at_start():
+    clock = FakeClock()
+    windowed = WindowedStatistics((60,), clock=clock)
+    for _ in range(10):
+        clock.now += SECOND // 10
+        windowed.append(1)
+    # not underestimated although the time constant is much longer
+    assert isclose(windowed.get_ewma_rate(), 10, rel_tol=0.01)
+    clock.now += 60 * SECOND
+    assert windowed.get_ewma_rate() < 10 / math.e
+
+
+def test_merge():
+    clock = FakeClock()
+    windowed = WindowedStatistics((60,), clock=clock)
+    other = WindowedStatistics((60,), clock=clock)
+    clock.now += SECOND
+    windowed.append(SECOND)
+    clock.now += 30 * SECOND
+    other.append(3 * SECOND)
+    merged = windowed.copy().merge(other)
+    assert merged.get_window(60)[:3] == (2, 4 * SECOND, 3 * SECOND)
+    assert windowed.get_window(60)[0] == 1
+    assert 1 * SECOND < merged.get_ewma_mean() < 3 * SECOND
+    with pytest.raises(ValueError):
+        merged.merge(WindowedStatistics((120,), clock=clock))
+
+
+def test_stopwatch_windows():
+    timers = MultiStopwatch(2, verbose=False)
+    timers[0] = Stopwatch(verbose=False, windows=(60, 300))
+    for stopwatch in timers:
+        with stopwatch:
+            pass
+    assert timers[0].version is None
+    statistics = timers.get_statistics()
+    assert statistics["rate_1m"][0] > 0
+    assert statistics["mean_5m"][1] is None
+    assert statistics["ewma_mean"][0] is not None
+    timers[0].reset()
+    assert timers[0].windowed.get_window(60)[0] == 0
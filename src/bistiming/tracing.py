@@ -0,0 +1,175 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import atexit
+import io
+import os
+import threading
+import time
+
+from . import stopwatch as _stopwatch_module
+
+if hasattr(threading, "get_native_id"):
+    _get_thread_id = threading.get_native_id
+else:
+    # Python < 3.8
+    _get_thread_id = threading.get_ident
+
+
+class TraceRecorder(object):
+    """Record the events of all the :class:`~bistiming.Stopwatch` as a trace file.
+
+    While the recorder is started, every :meth:`~bistiming.Stopwatch.start` (or
+    entering a with-block) and :meth:`~bistiming.Stopwatch.pause` (or exiting a
+    with-block) is written as a begin/end event, a
+    :meth:`~bistiming.Stopwatch.split` of a running stopwatch as an instant event,
+    and a :meth:`~bistiming.Stopwatch.add_split` (e.g., from :func:`~bistiming.timed`)
+    as a complete event, with the process and thread IDs. The file uses the
+    `Chrome Trace Event Format
+    <https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU>`_,
+    so it can be opened in `Perfetto <https://ui.perfetto.dev>`_ or
+    ``chrome://tracing``.
+
+    The events are streamed to the file instead of being kept in memory. The
+    timestamps are always taken from :func:`time.perf_counter_ns` (the system-wide
+    monotonic clock on Linux), regardless of the clocks of the stopwatches, so the
+    traces of different processes can be combined using :func:`merge_trace_files`.
+
+    >>> with TraceRecorder("trace.json"):
+    ...     run_pipeline()
+
+    Parameters
+    ----------
+    path : str
+        The path of the trace file. ``{pid}`` in the path is replaced with the
+        process ID, so each process (including the forked children) writes its own
+        file. Without ``{pid}``, the events in the forked children are dropped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._first_event = True
+
+    def _open(self):
+        self._pid = os.getpid()
+        self._file = io.open(self.path.format(pid=self._pid), "w", encoding="utf-8")
+        # the JSON Array Format, which can be parsed even if "]" is missing
+        self._file.write("[")
+        self._first_event = True
+
+    def start(self):
+        """Open the file and start recording the events of all the stopwatches.
+
+        Returns
+        -------
+        self : :class:`TraceRecorder`
+        """
+        with self._lock:
+            if self._file is None:
+                self._open()
+        _stopwatch_module._trace_recorder = self
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Stop recording and close the file."""
+        if _stopwatch_module._trace_recorder is self:
+            _stopwatch_module._trace_recorder = None
+        atexit.unregister(self.stop)
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.write("\n]\n")
+                self._file.close()
+            self._file = None
+
+    def _write(self, event):
+        import json  # not imported eagerly for a faster startup
+
+        line = json.dumps(event, separators=(",", ":"))
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked
+                if "{pid}" not in self.path:
+                    return
+                self._open()
+            if self._file is None:
+                return
+            self._file.write("\n" if self._first_event else ",\n")
+            self._file.write(line)
+            self._first_event = False
+
+    def record(self, phase, stopwatch, args=None, duration_ns=None):
+        """Write an event of a stopwatch.
+
+        Parameters
+        ----------
+        phase : str
+            The phase of the event in the Chrome Trace Event Format, e.g., ``"B"``
+            (begin), ``"E"`` (end), ``"i"`` (instant) or ``"X"`` (complete).
+        stopwatch : :class:`~bistiming.Stopwatch`
+            The stopwatch. Its name (or description) is used as the event name.
+        args : Optional[Dict[str, Any]]
+            The arguments of the event.
+        duration_ns : Optional[int]
+            The duration of a complete event in nanoseconds. The event is assumed to
+            end now.
+        """
+        now = time.perf_counter_ns()
+        event = {
+            "name": stopwatch.name or stopwatch.description or "stopwatch",
+            "cat": "bistiming",
+            "ph": phase,
+            "pid": os.getpid(),
+            "tid": _get_thread_id(),
+        }
+        if duration_ns is None:
+            event["ts"] = now / 1000
+        else:
+            event["ts"] = (now - duration_ns) / 1000
+            event["dur"] = duration_ns / 1000
+        if phase == "i":
+            event["s"] = "t"
+        if args:
+            event["args"] = args
+        self._write(event)
+
+    def __enter__(self):
+        """Call :meth:`start`."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        """Call :meth:`stop`."""
+        self.stop()
+
+
+def get_trace_recorder():
+    """Get the :class:`TraceRecorder` currently recording, or `None`."""
+    return _stopwatch_module._trace_recorder
+
+
+def merge_trace_files(paths, output_path):
+    """Merge the trace files (e.g., of different processes) into one file.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        The paths of the trace files written by :class:`TraceRecorder`. Unfinished
+        files (e.g., of a crashed process) are also supported.
+    output_path : str
+        The path of the merged trace file.
+    """
+    with io.open(output_path, "w", encoding="utf-8") as output:
+        output.write("[")
+        first_event = True
+        for path in paths:
+            with io.open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip().rstrip(",")
+                    if line in ("", "[", "]"):
+                        continue
+                    output.write("\n" if first_event else ",\n")
+                    output.write(line)
+                    first_event = False
+        output.write("\n]\n")
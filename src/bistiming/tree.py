@@ -0,0 +1,208 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from collections import OrderedDict
+import threading
+
+from .local import ThreadLocalStopwatch
+from .utils import ns_to_timedelta
+
+
+class StopwatchNode(object):
+    """A node in :class:`StopwatchTree`, which is a context manager.
+
+    Entering the node starts its :class:`Stopwatch` and makes it the parent of the
+    nodes created inside the with-block. Each thread entering the node has its own
+    :class:`Stopwatch`, so the same node can be entered by multiple threads at the
+    same time.
+
+    Attributes
+    ----------
+    name : str
+        The name of the node.
+    parent : Optional[:class:`StopwatchNode`]
+        The parent node. `None` for the root.
+    children : Dict[str, :class:`StopwatchNode`]
+        The child nodes keyed by their names.
+    stopwatch : Optional[:class:`ThreadLocalStopwatch`]
+        The stopwatch timing this node. `None` for the root.
+    """
+
+    def __init__(self, tree, name, parent=None):
+        self.tree = tree
+        self.name = name
+        self.parent = parent
+        self.children = OrderedDict()
+        if parent is None:
+            self.stopwatch = None
+        else:
+            self.stopwatch = ThreadLocalStopwatch(self.path, **tree._kwargs)
+
+    @property
+    def path(self):
+        """str: The names from the root to this node joined by ``tree.separator``."""
+        if self.parent is None:
+            return ""
+        if self.parent.parent is None:
+            return self.name
+        return self.parent.path + self.tree.separator + self.name
+
+    def get_child(self, name):
+        """Get the child node with `name`, and create it if it doesn't exist."""
+        try:
+            return self.children[name]
+        except KeyError:
+            with self.tree._lock:
+                if name not in self.children:
+                    self.children[name] = type(self)(self.tree, name, self)
+            return self.children[name]
+
+    def get_inclusive_time_ns(self):
+        """Get the cumulative elapsed time including the children in nanoseconds."""
+        if self.stopwatch is None:
+            return sum(child.get_inclusive_time_ns() for child in self._get_children())
+        return self.stopwatch.get_cumulative_elapsed_time_ns()
+
+    def get_exclusive_time_ns(self):
+        """Get the cumulative elapsed time excluding the children in nanoseconds.
+
+        This is the time spent in the node itself (self time).
+        """
+        return self.get_inclusive_time_ns() - sum(
+            child.get_inclusive_time_ns() for child in self._get_children()
+        )
+
+    def _get_children(self):
+        # copy to prevent the dict from being changed by other threads
+        return list(self.children.values())
+
+    def iter_nodes(self):
+        """Iterate over this node and all the descendants in pre-order."""
+        yield self
+        for child in self._get_children():
+            for node in child.iter_nodes():
+                yield node
+
+    def __enter__(self):
+        self.tree._get_stack().append(self)
+        self.stopwatch.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        try:
+            self.stopwatch.__exit__(exc_type, exc, exc_tb)
+        finally:
+            self.tree._get_stack().pop()
+
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__name__, self.path)
+
+
+class StopwatchTree(object):
+    """A registry of named :class:`Stopwatch` organized as a call tree.
+
+    Calling the tree with a name returns a :class:`StopwatchNode` under the node
+    that is currently entered (in the current thread), so the parent/child
+    relationship is recorded automatically by nesting the with-blocks:
+
+    >>> timers = StopwatchTree(verbose=False)
+    >>> with timers("load"):
+    ...     with timers("parse"):
+    ...         pass
+    ...     with timers("transform"):
+    ...         pass
+
+    The statistics report both the inclusive time (including the children) and
+    the exclusive time (self time, excluding the children) of each node, like a
+    call-graph profiler.
+
+    Parameters
+    ----------
+    separator : str
+        The separator used to join the names in the paths of the nodes.
+    **kwargs
+        Other keyword arguments will be passed to initialize :class:`Stopwatch`.
+        The path of the node is used as the `description`.
+
+    Attributes
+    ----------
+    root : :class:`StopwatchNode`
+        The root node without a stopwatch.
+    """
+
+    def __init__(self, separator="/", **kwargs):
+        self.separator = separator
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.root = StopwatchNode(self, "")
+
+    def _get_stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    @property
+    def current(self):
+        """:class:`StopwatchNode`: The node currently entered in this thread."""
+        stack = self._get_stack()
+        return stack[-1] if stack else self.root
+
+    def __call__(self, name):
+        """Get the child node with `name` of the currently entered node."""
+        return self.current.get_child(name)
+
+    def __getitem__(self, path):
+        """Get the node with `path` (names joined by `separator`)."""
+        node = self.root
+        for name in path.split(self.separator):
+            node = node.children[name]
+        return node
+
+    def iter_nodes(self):
+        """Iterate over all the nodes (excluding the root) in pre-order."""
+        nodes = self.root.iter_nodes()
+        next(nodes)  # skip the root
+        return nodes
+
+    def get_statistics(self):
+        """Get the statistics of each node in pre-order as a dictionary.
+
+        Returns
+        -------
+        statistics : Dict[str, List]
+            The keys are `path`, `inclusive_time`, `exclusive_time`, `percentage`
+            (of the inclusive time among the total time of the top-level nodes),
+            `exclusive_percentage`, `n_splits` and `mean_per_split`.
+        """
+        nodes = list(self.iter_nodes())
+        inclusive_time = [node.get_inclusive_time_ns() for node in nodes]
+        exclusive_time = [node.get_exclusive_time_ns() for node in nodes]
+        total_time = self.root.get_inclusive_time_ns()
+        if not total_time:
+            raise ValueError("cannot get percentage if there is no any elapsed time")
+        return {
+            "path": [node.path for node in nodes],
+            "inclusive_time": [ns_to_timedelta(t) for t in inclusive_time],
+            "exclusive_time": [ns_to_timedelta(t) for t in exclusive_time],
+            "percentage": [t / total_time for t in inclusive_time],
+            "exclusive_percentage": [t / total_time for t in exclusive_time],
+            "n_splits": [node.stopwatch.splits.count for node in nodes],
+            "mean_per_split": [
+                ns_to_timedelta(node.stopwatch.splits.mean) for node in nodes
+            ],
+        }
+
+    def format_statistics(self, tablefmt="fancy_grid"):
+        """Format the statistics using tabulate.
+
+        Parameters
+        ----------
+        tablefmt: str
+            See the available options in
+            `tabulate's documentation <https://github.com/astanin/python-tabulate#table-format>`_.
+        """
+        from tabulate import tabulate
+
+        return tabulate(self.get_statistics(), headers="keys", tablefmt=tablefmt)
@@ -1,6 +1,7 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 
 import datetime
+import math
 
 
 def div_timedelta_int(d, i):
@@ -14,3 +15,76 @@ def div_timedelta(d1, d2):
     d1_us = d1.microseconds + 1000000 * (d1.seconds + 86400 * d1.days)
     d2_us = d2.microseconds + 1000000 * (d2.seconds + 86400 * d2.days)
     return d1_us / d2_us
+
+
+def ns_to_timedelta(ns):
+    return datetime.timedelta(microseconds=ns / 1000)
+
+
+def estimate_total(sampled_total, n_sampled, n_unsampled):
+    if not n_unsampled or not n_sampled:
+        return sampled_total
+    return round(sampled_total * (n_sampled + n_unsampled) / n_sampled)
+
+
+def normal_cdf(x):
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+def normal_ppf(p):
+    # statistics.NormalDist is not available in Python 3.7
+    low, high = -40.0, 40.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if normal_cdf(mid) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def _beta_continued_fraction(a, b, x, max_iterations=300, epsilon=1e-15):
+    # modified Lentz's method
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, max_iterations + 1):
+        m2 = 2 * m
+        for numerator in (
+            m * (b - m) * x / ((a + m2 - 1) * (a + m2)),
+            -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            delta = c * d
+            result *= delta
+        if abs(delta - 1.0) < epsilon:
+            break
+    return result
+
+
+def regularized_incomplete_beta(a, b, x):
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    log_front = (
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1 - x) / b
+
+
+def student_t_sf(t, df):
+    """Compute the survival function (1 - CDF) of Student's t-distribution."""
+    tail = 0.5 * regularized_incomplete_beta(df / 2, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
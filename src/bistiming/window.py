@@ -0,0 +1,306 @@
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from array import array
+import math
+import time
+
+from .utils import ns_to_timedelta
+
+
+DEFAULT_WINDOWS = (60, 300, 900)
+"""The default lengths (in seconds) of the sliding windows: 1, 5 and 15 minutes."""
+
+
+def format_window(seconds):
+    """Format the length of a window for the column names, e.g., ``"5m"``.
+
+    Parameters
+    ----------
+    seconds : float
+
+    Returns
+    -------
+    label : str
+    """
+    if seconds >= 3600 and seconds % 3600 == 0:
+        return "{:g}h".format(seconds / 3600)
+    if seconds >= 60 and seconds % 60 == 0:
+        return "{:g}m".format(seconds / 60)
+    return "{:g}s".format(seconds)
+
+
+class WindowedStatistics(object):
+    """The statistics of the recent splits in sliding windows and with decay.
+
+    The splits are counted in rotating buckets of `bucket_width` seconds, which
+    cover the longest window. Each bucket keeps the count, the sum and the maximum
+    of its splits, so recording a split is O(1) and the memory doesn't grow with
+    the number of splits. A window is summarized from the latest buckets (including
+    the current partial one), so it covers between `window - bucket_width` and
+    `window` seconds.
+
+    The exponentially weighted moving average (EWMA) weights each split by
+    ``exp(-age / time_constant)``. The decayed mean and the decayed rate (splits
+    per second) react to a change within about `time_constant` seconds.
+
+    It is usually created by :class:`~bistiming.Stopwatch` using the argument
+    `windows`.
+
+    Parameters
+    ----------
+    windows : Iterable[float]
+        The lengths in seconds of the sliding windows.
+    bucket_width : Optional[float]
+        The width of the buckets in seconds. If `None`, use 1/12 of the shortest
+        window (5 seconds for 1 minute).
+    time_constant : Optional[float]
+        The time constant of the EWMA in seconds. If `None`, use the shortest
+        window.
+    clock : Callable[[], int]
+        The monotonic clock in nanoseconds which timestamps the splits.
+    """
+
+    __slots__ = (
+        "windows",
+        "bucket_width_ns",
+        "time_constant_ns",
+        "clock",
+        "_n_buckets",
+        "_counts",
+        "_sums",
+        "_maxes",
+        "_bucket_index",
+        "_start_time",
+        "_ewma_time",
+        "_ewma_sum",
+        "_ewma_weight",
+    )
+
+    def __init__(
+        self,
+        windows=DEFAULT_WINDOWS,
+        bucket_width=None,
+        time_constant=None,
+        clock=time.perf_counter_ns,
+    ):
+        self.windows = tuple(sorted(windows))
+        if not self.windows or self.windows[0] <= 0:
+            raise ValueError("windows should be positive numbers of seconds")
+        if bucket_width is None:
+            bucket_width = self.windows[0] / 12
+        if time_constant is None:
+            time_constant = self.windows[0]
+        self.bucket_width_ns = int(bucket_width * 1e9)
+        self.time_constant_ns = int(time_constant * 1e9)
+        if self.bucket_width_ns <= 0 or self.time_constant_ns <= 0:
+            raise ValueError("bucket_width and time_constant should be positive")
+        self.clock = clock
+        self._n_buckets = int(math.ceil(self.windows[-1] * 1e9 / self.bucket_width_ns))
+        self.clear()
+
+    def clear(self):
+        """Remove all the splits."""
+        self._counts = array("q", bytes(8 * self._n_buckets))
+        self._sums = array("q", bytes(8 * self._n_buckets))
+        self._maxes = array("q", bytes(8 * self._n_buckets))
+        self._start_time = now = self.clock()
+        self._bucket_index = now // self.bucket_width_ns
+        self._ewma_time = now
+        self._ewma_sum = 0.0
+        self._ewma_weight = 0.0
+
+    def _rotate(self, bucket_index):
+        # clear the buckets reused for the new time range
+        n_cleared = min(bucket_index - self._bucket_index, self._n_buckets)
+        for i in range(bucket_index - n_cleared + 1, bucket_index + 1):
+            slot = i % self._n_buckets
+            self._counts[slot] = 0
+            self._sums[slot] = 0
+            self._maxes[slot] = 0
+        self._bucket_index = bucket_index
+
+    def append(self, elapsed_time):
+        """Record a split.
+
+        Parameters
+        ----------
+        elapsed_time : int
+            The elapsed time of the split in nanoseconds.
+        """
+        now = self.clock()
+        bucket_index = now // self.bucket_width_ns
+        if bucket_index > self._bucket_index:
+            self._rotate(bucket_index)
+        slot = bucket_index % self._n_buckets
+        self._counts[slot] += 1
+        self._sums[slot] += elapsed_time
+        if elapsed_time > self._maxes[slot]:
+            self._maxes[slot] = elapsed_time
+        if now > self._ewma_time:
+            decay = math.exp((self._ewma_time - now) / self.time_constant_ns)
+            self._ewma_sum *= decay
+            self._ewma_weight *= decay
+            self._ewma_time = now
+        self._ewma_sum += elapsed_time
+        self._ewma_weight += 1.0
+
+    def merge(self, other):
+        """Add the splits of another :class:`WindowedStatistics` with the same setup.
+
+        Parameters
+        ----------
+        other : :class:`WindowedStatistics`
+
+        Returns
+        -------
+        self : :class:`WindowedStatistics`
+        """
+        if (
+            other.bucket_width_ns != self.bucket_width_ns
+            or other._n_buckets != self._n_buckets
+            or other.time_constant_ns != self.time_constant_ns
+        ):
+            raise ValueError("cannot merge windowed statistics with different setups")
+        if other._bucket_index > self._bucket_index:
+            self._rotate(other._bucket_index)
+        # the buckets of other which are still in the range of this object
+        first_index = self._bucket_index - self._n_buckets
+        for i in range(first_index + 1, other._bucket_index + 1):
+            slot = i % self._n_buckets
+            self._counts[slot] += other._counts[slot]
+            self._sums[slot] += other._sums[slot]
+            self._maxes[slot] = max(self._maxes[slot], other._maxes[slot])
+        # decay both to the later time
+        ewma_time = max(self._ewma_time, other._ewma_time)
+        self._ewma_sum = self._decay(self._ewma_sum, ewma_time) + other._decay(
+            other._ewma_sum, ewma_time
+        )
+        self._ewma_weight = self._decay(self._ewma_weight, ewma_time) + other._decay(
+            other._ewma_weight, ewma_time
+        )
+        self._ewma_time = ewma_time
+        self._start_time = min(self._start_time, other._start_time)
+        return self
+
+    def copy(self):
+        """Get a copy of this object."""
+        windowed = type(self).__new__(type(self))
+        for name in self.__slots__:
+            setattr(windowed, name, getattr(self, name))
+        windowed._counts = array("q", self._counts)
+        windowed._sums = array("q", self._sums)
+        windowed._maxes = array("q", self._maxes)
+        return windowed
+
+    def _decay(self, value, now):
+        return value * math.exp((self._ewma_time - now) / self.time_constant_ns)
+
+    def get_window(self, window, now=None):
+        """Summarize the splits in a sliding window.
+
+        Parameters
+        ----------
+        window : float
+            The length of the window in seconds.
+        now : Optional[int]
+            The current time of :attr:`clock`.
+
+        Returns
+        -------
+        count : int
+            The number of splits.
+        sum : int
+            The sum of the splits in nanoseconds.
+        max : Optional[int]
+            The maximum split in nanoseconds, or `None` if there is no split.
+        duration : int
+            The time covered by the window in nanoseconds, which is shorter than
+            `window` if the statistics were started or cleared recently.
+        """
+        if now is None:
+            now = self.clock()
+        current_index = now // self.bucket_width_ns
+        n_buckets = min(
+            int(math.ceil(window * 1e9 / self.bucket_width_ns)), self._n_buckets
+        )
+        # only read, so it is safe to call while another thread is appending
+        first_index = max(
+            current_index - n_buckets, self._bucket_index - self._n_buckets
+        )
+        count = 0
+        sum_ = 0
+        max_ = None
+        for i in range(first_index + 1, min(current_index, self._bucket_index) + 1):
+            slot = i % self._n_buckets
+            if self._counts[slot]:
+                count += self._counts[slot]
+                sum_ += self._sums[slot]
+                if max_ is None or self._maxes[slot] > max_:
+                    max_ = self._maxes[slot]
+        window_start = max(
+            (current_index - n_buckets + 1) * self.bucket_width_ns, self._start_time
+        )
+        return count, sum_, max_, now - window_start
+
+    def get_ewma_mean(self):
+        """Get the exponentially weighted moving average of the splits.
+
+        Returns
+        -------
+        ewma_mean : Optional[float]
+            In nanoseconds, or `None` if there is no split.
+        """
+        if not self._ewma_weight:
+            return None
+        return self._ewma_sum / self._ewma_weight
+
+    def get_ewma_rate(self, now=None):
+        """Get the exponentially decayed rate of the splits.
+
+        The decayed count is divided by the decayed length of time since the
+        statistics were started, so the rate is not underestimated at the start.
+
+        Parameters
+        ----------
+        now : Optional[int]
+            The current time of :attr:`clock`.
+
+        Returns
+        -------
+        ewma_rate : float
+            The number of splits per second.
+        """
+        if now is None:
+            now = self.clock()
+        age = now - self._start_time
+        if age <= 0:
+            return 0.0
+        decayed_time = self.time_constant_ns * -math.expm1(-age / self.time_constant_ns)
+        return self._decay(self._ewma_weight, now) / decayed_time * 1e9
+
+    def get_statistics(self):
+        """Get the statistics of all the windows and the EWMA.
+
+        Returns
+        -------
+        statistics : Dict[str, Any]
+            For each window (e.g., ``1m``), `mean_1m` and `max_1m` (as
+            :class:`datetime.timedelta`, `None` if there is no split) and `rate_1m`
+            (splits per second), and then `ewma_mean` and `ewma_rate`.
+        """
+        now = self.clock()
+        statistics = {}
+        for window in self.windows:
+            count, sum_, max_, duration = self.get_window(window, now)
+            label = format_window(window)
+            statistics["mean_" + label] = (
+                ns_to_timedelta(sum_ / count) if count else None
+            )
+            statistics["max_" + label] = None if max_ is None else ns_to_timedelta(max_)
+            statistics["rate_" + label] = count / duration * 1e9 if duration else 0.0
+        ewma_mean = self.get_ewma_mean()
+        statistics["ewma_mean"] = (
+            None if ewma_mean is None else ns_to_timedelta(ewma_mean)
+        )
+        statistics["ewma_rate"] = self.get_ewma_rate(now)
+        return statistics